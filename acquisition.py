@@ -0,0 +1,206 @@
+"""
+acquisition.py
+
+This module contains the leak rate acquisition pipeline for the Leakware application.
+A single long-lived worker thread per leak detector reads leak rate samples and pushes
+them into a preallocated, array-backed ring buffer. The GUI, the auto-stop logic and
+`create_table` read from that buffer instead of sharing Python lists with the worker.
+
+Single-writer / multi-reader contract:
+- Only the acquisition worker calls `LeakRateBuffer.push`.
+- Any thread may call `mark`, `latest`, `snapshot` and `max_since` without locking.
+- A sample becomes visible to readers only after both of its slots are written, because
+  the write counter is advanced last.
+- Readers copy the requested window and then re-check the write counter. Samples that the
+  writer overwrote during the copy are dropped from the front of the result, so a reader
+  never returns a torn or reordered window.
+- If a trace archive is attached, the worker also appends every sample to it, so the
+  complete trace of a measurement survives the ring buffer wrapping around.
+- A sample that could not be read is stored as NaN (leak_detector.MISSING_SAMPLE), so gaps
+  stay visible in the stream instead of stalling it.
+- "Clearing" the graph or the highest value never touches the buffer. Readers keep a
+  marker (the write counter at the time of the clear) and ask for samples since then.
+
+Key Classes:
+- LeakRateBuffer: Fixed-capacity ring buffer of (monotonic timestamp, leak rate) samples.
+  - read_since(self, since): Like snapshot, but also returns the marker of the first returned sample.
+- LeakRateAcquisition: Worker thread that reads samples and pushes them into the buffer.
+
+Dependencies:
+- threading
+- time
+- logging
+- numpy
+
+Usage:
+An instance of `LeakRateBuffer` is created together with a `LeakRateAcquisition` worker
+in `main_page`. The worker is resumed when a measurement starts and paused when it stops.
+"""
+import threading
+import time
+import logging
+
+import numpy as np
+
+# 2**18 samples cover more than an hour of sampling at 50 Hz (4 MiB per buffer)
+DEFAULT_CAPACITY = 2 ** 18
+
+
+class LeakRateBuffer:
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        """
+        Initialize the ring buffer with preallocated timestamp and value arrays.
+
+        :param capacity: Maximum number of samples kept before the oldest are overwritten
+        """
+        self.capacity = int(capacity)
+        self._timestamps = np.zeros(self.capacity, dtype=np.float64)
+        self._values = np.zeros(self.capacity, dtype=np.float64)
+        self._written = 0  # Total number of samples ever pushed; only the writer advances it
+
+    def push(self, timestamp, value):
+        """
+        Append a sample. Must only be called from the single writer thread.
+
+        :param timestamp: Monotonic timestamp of the sample (time.monotonic())
+        :param value: Leak rate in mbar*l/s
+        """
+        index = self._written % self.capacity
+        self._timestamps[index] = timestamp
+        self._values[index] = value
+        self._written += 1  # Publish the sample only after both slots are written
+
+    def mark(self):
+        """
+        Return a marker for "now". Samples pushed after this call are returned by
+        `snapshot(marker)`, which is how the graph and highest value are cleared.
+        """
+        return self._written
+
+    def latest(self):
+        """
+        Return the most recent sample.
+
+        :return: Tuple (count, timestamp, value) or None if nothing was pushed yet
+        """
+        written = self._written
+        if written == 0:
+            return None
+        index = (written - 1) % self.capacity
+        return written, float(self._timestamps[index]), float(self._values[index])
+
+    def snapshot(self, since=0):
+        """
+        Copy all samples pushed at or after marker `since`.
+
+        :param since: Marker returned by `mark`, 0 for everything still in the buffer
+        :return: Tuple of numpy arrays (timestamps, values)
+        """
+        _, timestamps, values = self.read_since(since)
+        return timestamps, values
+
+    def read_since(self, since=0):
+        """
+        Copy all samples pushed at or after marker `since`, e.g. to forward them to another process.
+
+        :param since: Marker returned by `mark`
+        :return: Tuple (marker of the first returned sample, timestamps, values); the first marker is
+                 larger than `since` if older samples were already overwritten
+        """
+        end = self._written
+        begin = max(since, end - self.capacity)
+        if begin >= end:
+            return begin, np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64)
+
+        start_index = begin % self.capacity
+        stop_index = end % self.capacity
+        if start_index < stop_index:
+            timestamps = self._timestamps[start_index:stop_index].copy()
+            values = self._values[start_index:stop_index].copy()
+        else:
+            timestamps = np.concatenate((self._timestamps[start_index:], self._timestamps[:stop_index]))
+            values = np.concatenate((self._values[start_index:], self._values[:stop_index]))
+
+        # Drop samples the writer may have overwritten while we were copying
+        overwritten = self._written - self.capacity - begin
+        if overwritten > 0:
+            timestamps = timestamps[overwritten:]
+            values = values[overwritten:]
+            begin += overwritten
+        return begin, timestamps, values
+
+    def max_since(self, since=0, default=0.0):
+        """
+        Return the highest leak rate pushed at or after marker `since`, ignoring missing samples.
+
+        :param since: Marker returned by `mark`
+        :param default: Value returned when there are no valid samples
+        """
+        _, values = self.snapshot(since)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return default
+        return float(values.max())
+
+
+class LeakRateAcquisition(threading.Thread):
+    def __init__(self, read_function, buffer: LeakRateBuffer, name="LeakRateAcquisition", archive=None):
+        """
+        Initialize the acquisition worker. The worker starts paused.
+
+        :param read_function: Callable returning one leak rate sample (float) or None
+        :param buffer: Ring buffer the samples are pushed into
+        :param name: Thread name, used in log messages
+        :param archive: Optional trace_archive.TraceArchiveWriter every sample is appended to
+        """
+        super().__init__(name=name, daemon=True)
+        self.read_function = read_function
+        self.buffer = buffer
+        self.archive = archive
+        self._active = threading.Event()
+        self._closed = threading.Event()
+        self._io_lock = threading.Lock()  # Held while a read is in progress
+
+    def run(self):
+        logging.info(f"{self.name} started")
+        while not self._closed.is_set():
+            if not self._active.wait(timeout=0.2):
+                continue
+            with self._io_lock:
+                if not self._active.is_set():
+                    continue
+                try:
+                    value = self.read_function()
+                except Exception as e:
+                    logging.error(f"Error occurred in {self.name} while reading leak rate: {str(e)}")
+                    value = None
+                # Stored under the lock, so no sample is added after pause() returned
+                if value is not None:
+                    timestamp = time.monotonic()
+                    self.buffer.push(timestamp, value)
+                    if self.archive is not None:
+                        self.archive.append(timestamp, value)
+        logging.info(f"{self.name} stopped")
+
+    def resume(self):
+        """Start pushing samples. Starts the thread on first use."""
+        if not self.is_alive():
+            self.start()
+        self._active.set()
+
+    def pause(self):
+        """Stop pushing samples and wait until a read in progress has finished."""
+        self._active.clear()
+        with self._io_lock:
+            pass
+
+    def close(self, timeout=2):
+        """Stop the worker thread."""
+        self._active.clear()
+        self._closed.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    @property
+    def active(self):
+        return self._active.is_set()
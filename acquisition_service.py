@@ -0,0 +1,519 @@
+"""
+acquisition_service.py
+
+This module runs the leak rate acquisition in its own process, separate from the Tk GUI. The
+service owns the serial port of the leak detector, the `LeakRatePoller`, the acquisition worker
+and the trace archive of the running session. Rendering, PDF reports and dialogs in the GUI
+process can therefore no longer delay a sample (they do not share the GIL with the measurement
+loop any more).
+
+The service listens on a local socket (`multiprocessing.connection`, authenticated with
+`authkey`). The connection unpickles every message, so the key must stay secret: a spawned
+service gets a random key that is written to its stdin and known only to the GUI that started it.
+A client opens two connections:
+- a command connection: request/reply messages (dicts) for open_port, start, stop, vent,
+  power_on_time, calibrate, calibration_factor, set_sample_rate, status and shutdown;
+- a stream connection: the service pushes the new samples every `STREAM_INTERVAL` seconds as
+  (first sample number, timestamps, values, achieved rate).
+
+The client mirrors the stream into a local `LeakRateBuffer`, so the GUI keeps reading the samples
+with `mark`/`latest`/`snapshot`/`max_since`, as before. Every sample is streamed in order, so a
+marker of the local buffer maps to a record of the session's trace archive (`archive_index`). The
+GUI reads the trace of a stopped measurement from the archive file (`trace_archive.read_trace`).
+
+Key Functions:
+- serve(address, authkey, exit_on_disconnect): Runs the service until it is shut down.
+- connect_or_spawn(address, authkey): Connects to the service with `authkey`, or starts it as a child process with
+  a new random key.
+- environment_authkey(): Returns the key of a service started on its own (LEAKWARE_SERVICE_KEY).
+
+Key Classes:
+- AcquisitionServiceError: Raised by the client if a command fails or the service is unreachable.
+- AcquisitionService: The service (runs in the service process).
+- AcquisitionClient: Thin client used by `main_page`.
+
+Dependencies:
+- os
+- sys
+- time
+- secrets
+- logging
+- argparse
+- threading
+- subprocess
+- multiprocessing
+- multiprocessing.connection
+- serial
+- acquisition
+- leak_detector
+- trace_archive
+- instrumentation
+- log_pipeline
+
+Usage:
+`main_page` calls `connect_or_spawn()` once and uses the returned client. The service can also be
+started on its own (run from the application directory, so it uses the same trace archive); the key is
+then taken from the environment variable LEAKWARE_SERVICE_KEY (hex), which the GUI must have as well:
+    python acquisition_service.py [--port 47615]
+"""
+import os
+import sys
+import time
+import secrets
+import logging
+import argparse
+import threading
+import subprocess
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+import serial
+
+from acquisition import LeakRateBuffer, LeakRateAcquisition
+from leak_detector import LeakRatePoller, DEFAULT_SAMPLE_RATE
+from trace_archive import TraceArchiveWriter, TRACE_ARCHIVE_DIR
+import instrumentation
+from log_pipeline import setup_logging
+
+DEFAULT_ADDRESS = ("127.0.0.1", 47615)
+AUTHKEY_VARIABLE = "LEAKWARE_SERVICE_KEY"  # Key (hex) of a service that is started on its own
+AUTHKEY_BYTES = 32
+STREAM_INTERVAL = 0.05  # Seconds between two sample batches
+SPAWN_TIMEOUT = 15  # Seconds to wait for a spawned service to accept connections
+SYNC_TIMEOUT = 2  # Seconds stop() waits for the last samples of a measurement
+LOG_FILE = "log_acquisition.txt"
+INSTRUMENTATION_FILE = "instrumentation_acquisition.json"
+
+# Commands the GUI may send; each is a method of AcquisitionService
+COMMANDS = ("open_port", "start", "stop", "vent", "power_on_time", "calibrate", "calibration_factor",
+            "set_sample_rate", "status", "shutdown")
+
+
+class AcquisitionServiceError(Exception):
+    pass
+
+
+class AcquisitionService:
+    def __init__(self, address, authkey, archive_directory=TRACE_ARCHIVE_DIR, exit_on_disconnect=False):
+        """
+        Initialize the service. Call serve_forever() to accept clients.
+
+        :param address: (host, port) of the local socket
+        :param authkey: Key clients must authenticate with (bytes)
+        :param archive_directory: Directory of the trace archive files
+        :param exit_on_disconnect: Shut down when a command connection closes, e.g. because the GUI that
+                                   started the service exited without shutting it down
+        """
+        self.address = address
+        self.authkey = authkey
+        self.exit_on_disconnect = exit_on_disconnect
+        self.archive_directory = archive_directory
+        self.buffer = LeakRateBuffer()
+        self.poller = LeakRatePoller()
+        self.acquisition = LeakRateAcquisition(self.read, self.buffer)
+        self.port = None
+        self.port_name = None
+        self.port_settings = None
+        self.archive = None
+        self.start_time = None
+        self._lock = threading.Lock()  # One command at a time touches the port
+        self._closed = threading.Event()
+        self._listener = None
+
+    @instrumentation.timed("leak_detector.read")
+    def read(self):
+        # Bounded retries; a sample that cannot be read in time becomes MISSING_SAMPLE (NaN)
+        return self.poller.read_sample()
+
+    # --- Connections ---
+    def serve_forever(self):
+        self._listener = Listener(self.address, authkey=self.authkey)
+        logging.info(f"Acquisition service listening on {self.address[0]}:{self.address[1]}")
+        try:
+            while not self._closed.is_set():
+                try:
+                    connection = self._listener.accept()
+                except Exception as e:
+                    logging.error(f"Error occurred while accepting a client: {str(e)}")
+                    continue
+                if self._closed.is_set():
+                    connection.close()  # Wake-up connection from shutdown()
+                    break
+                threading.Thread(target=self._serve_connection, args=(connection,), daemon=True).start()
+        finally:
+            self._listener.close()
+            self._close_devices()
+            logging.info("Acquisition service stopped")
+
+    def _serve_connection(self, connection):
+        kind = None
+        try:
+            kind = connection.recv()
+            if kind == "stream":
+                self._stream(connection)
+            else:
+                self._commands(connection)
+        except (EOFError, OSError):
+            pass  # Client disconnected
+        finally:
+            connection.close()
+        if kind == "commands" and self.exit_on_disconnect:
+            self.shutdown()
+
+    def _commands(self, connection):
+        while not self._closed.is_set():
+            message = connection.recv()
+            name = message.pop("command", None)
+            if name not in COMMANDS:
+                connection.send({"ok": False, "error": f"Unknown command: {name}"})
+                continue
+            try:
+                with self._lock:
+                    reply = getattr(self, name)(**message) or {}
+                reply["ok"] = True
+            except Exception as e:
+                logging.error(f"Error occurred in acquisition service command {name}: {str(e)}")
+                reply = {"ok": False, "error": str(e)}
+            connection.send(reply)
+
+    def _stream(self, connection):
+        sent = self.buffer.mark()
+        connection.send(("hello", sent))
+        while not self._closed.wait(STREAM_INTERVAL):
+            if self.buffer.mark() == sent:
+                continue
+            first, timestamps, values = self.buffer.read_since(sent)
+            connection.send(("samples", first, timestamps, values, self.poller.achieved_rate))
+            sent = first + len(timestamps)
+
+    # --- Commands ---
+    def open_port(self, port, settings):
+        """Open the serial port of the leak detector; a port that is open with the same settings is kept."""
+        if self.port is not None and self.port.is_open and port == self.port_name and settings == self.port_settings:
+            return {}
+        if self.acquisition.active:
+            raise ValueError("The port cannot be changed while a measurement is running")
+        self._close_port()
+        self.port = serial.Serial(port=port)
+        self.port.apply_settings(settings)
+        self.port_name, self.port_settings = port, settings
+        logging.info(f"Leak detector opened on {port}")
+        return {}
+
+    def start(self, leakware_id, sample_rate=DEFAULT_SAMPLE_RATE):
+        """
+        Start a measurement.
+
+        :return: start_time (monotonic, t = 0 of the archived trace) and base (buffer marker minus archive record)
+        """
+        port = self._require_port()
+        self.acquisition.pause()
+        if self.archive is None or self.archive.leakware_id != leakware_id:
+            if self.archive is not None:
+                self.archive.flush()
+            self.archive = TraceArchiveWriter(leakware_id, self.archive_directory)
+            self.acquisition.archive = self.archive
+        self.poller.set_sample_rate(sample_rate)
+
+        port.flushInput()  # Flush the input buffer of the serial port for the leak detector
+        port.write("*start\r".encode())  # Start the measurement
+        time.sleep(0.05)
+        port.flushOutput()
+        self.poller.set_port(port)
+
+        self.start_time = time.monotonic()
+        self.archive.start_segment(self.start_time)
+        base = self.buffer.mark() - self.archive.count  # Both receive every sample from here on
+        self.acquisition.resume()
+        return {"start_time": self.start_time, "base": base}
+
+    def stop(self):
+        """
+        Stop the measurement, send *stop and vent the leak detector.
+
+        :return: mark (buffer marker after the last sample), count (archive records) and base
+        """
+        self.acquisition.pause()
+        self.poller.cancel()  # The late response to an outstanding *read? must not follow *stop
+        count = 0
+        if self.archive is not None:
+            self.archive.flush()  # The GUI reads the trace from the file
+            count = self.archive.count
+        reply = {"mark": self.buffer.mark(), "count": count, "base": self.buffer.mark() - count}
+        if self.port is not None:
+            # The measurement is stopped either way; the client needs the reply to save the trace
+            try:
+                self.port.write("*stop\r".encode())
+                time.sleep(0.75)
+                self.vent()
+                time.sleep(0.5)
+                self.vent()
+            except serial.SerialException as e:
+                logging.info(f"Serial communication error occurred during the stop sequence: {str(e)}")
+        return reply
+
+    def vent(self):
+        port = self._require_port()
+        port.write("*vent\r".encode())
+        time.sleep(0.05)
+        port.flushOutput()
+
+    def power_on_time(self):
+        """Return the power-on time of the leak detector in minutes."""
+        port = self._require_idle_port()
+        port.flushInput()
+        port.write("*hour:pow?\r".encode())
+        time.sleep(0.05)
+        minutes = int(port.readline().decode())
+        port.flushOutput()
+        return {"minutes": minutes}
+
+    def calibrate(self):
+        """Start the internal calibration; the factor is available after about 40 s."""
+        port = self._require_idle_port()
+        port.write("*cal\r".encode())
+        time.sleep(0.05)
+        port.flushOutput()
+
+    def calibration_factor(self):
+        port = self._require_idle_port()
+        port.flushInput()
+        port.write("*stat:calh 1?\r".encode())
+        time.sleep(0.05)
+        port.flushOutput()
+        time.sleep(1)
+        return {"factor": port.readline().decode().split()[-1]}
+
+    def set_sample_rate(self, sample_rate):
+        self.poller.set_sample_rate(sample_rate)
+
+    def status(self):
+        return {"active": self.acquisition.active, "port": self.port_name, "mark": self.buffer.mark(),
+                "achieved_rate": self.poller.achieved_rate,
+                "leakware_id": self.archive.leakware_id if self.archive is not None else None}
+
+    def shutdown(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        # Closing the listener does not interrupt accept() on every platform, so connect once to wake it
+        Client(self.address, authkey=self.authkey).close()
+
+    # --- Helpers ---
+    def _require_port(self):
+        if self.port is None or not self.port.is_open:
+            raise serial.SerialException("Leak detector port is not open")
+        return self.port
+
+    def _require_idle_port(self):
+        if self.acquisition.active:
+            raise ValueError("Not possible while a measurement is running")
+        return self._require_port()
+
+    def _close_port(self):
+        if self.port is not None:
+            try:
+                self.port.close()
+            except serial.SerialException as e:
+                logging.info(f"Serial Exception Occurred: {str(e)}. Unable to close Serial Connection")
+        self.port = None
+
+    def _close_devices(self):
+        self.acquisition.close()
+        if self.archive is not None:
+            self.archive.flush()
+        self._close_port()
+        if instrumentation.enabled:
+            instrumentation.dump(INSTRUMENTATION_FILE)
+
+
+class AcquisitionClient:
+    def __init__(self, address, authkey, process=None):
+        """
+        Connect to a running acquisition service.
+
+        :param address: (host, port) of the service
+        :param authkey: Key of the service (bytes)
+        :param process: subprocess.Popen of the service if this client started it; close() then shuts it down
+        """
+        self.process = process
+        self.buffer = LeakRateBuffer()  # Local mirror of the service buffer; the stream thread is its only writer
+        self.achieved_rate = 0.0
+        self._base = None
+        self._lock = threading.Lock()
+        self._synced = threading.Condition()
+        self._commands = Client(address, authkey=authkey)
+        self._commands.send("commands")
+        self._stream = Client(address, authkey=authkey)
+        self._stream.send("stream")
+        _, self._offset = self._stream.recv()  # Service marker = local marker + offset
+        self._receiver = threading.Thread(target=self._receive, name="AcquisitionStream", daemon=True)
+        self._receiver.start()
+
+    def _receive(self):
+        try:
+            while True:
+                _, first, timestamps, values, achieved_rate = self._stream.recv()
+                expected = self.buffer.mark() + self._offset
+                if first != expected:
+                    logging.warning(f"{first - expected} sample(s) lost in the acquisition stream")
+                    self._offset = first - self.buffer.mark()
+                for timestamp, value in zip(timestamps.tolist(), values.tolist()):
+                    self.buffer.push(timestamp, value)
+                self.achieved_rate = achieved_rate
+                with self._synced:
+                    self._synced.notify_all()
+        except (EOFError, OSError):
+            logging.info("Acquisition stream closed")
+
+    def call(self, command, **arguments):
+        """
+        Send a command to the service and return its reply.
+
+        :raises AcquisitionServiceError: If the command failed or the service is unreachable
+        """
+        try:
+            with self._lock:
+                self._commands.send(dict(arguments, command=command))
+                reply = self._commands.recv()
+        except (EOFError, OSError) as e:
+            raise AcquisitionServiceError(f"Acquisition service not reachable: {str(e)}")
+        if not reply.pop("ok"):
+            raise AcquisitionServiceError(reply["error"])
+        return reply
+
+    def open_port(self, port, settings):
+        self.call("open_port", port=port, settings=settings)
+
+    def start(self, leakware_id, sample_rate):
+        """Start a measurement; returns its start time (time.monotonic() of the service)."""
+        reply = self.call("start", leakware_id=leakware_id, sample_rate=float(sample_rate))
+        self._base = reply["base"]
+        return reply["start_time"]
+
+    def stop(self):
+        """
+        Stop the measurement and wait until all of its samples arrived in the local buffer.
+
+        :return: Number of records in the trace archive of the session
+        """
+        reply = self.call("stop")
+        self._base = reply["base"]
+        with self._synced:
+            if not self._synced.wait_for(lambda: self.buffer.mark() + self._offset >= reply["mark"], SYNC_TIMEOUT):
+                logging.warning("Not all samples of the measurement arrived from the acquisition service")
+        return reply["count"]
+
+    def archive_index(self, mark):
+        """Return the trace archive record of local buffer marker `mark` (valid after start or stop)."""
+        return mark + self._offset - (self._base or 0)
+
+    def vent(self):
+        self.call("vent")
+
+    def power_on_time(self):
+        return self.call("power_on_time")["minutes"]
+
+    def calibrate(self):
+        self.call("calibrate")
+
+    def calibration_factor(self):
+        return self.call("calibration_factor")["factor"]
+
+    def set_sample_rate(self, sample_rate):
+        self.call("set_sample_rate", sample_rate=float(sample_rate))
+
+    def status(self):
+        return self.call("status")
+
+    def close(self, timeout=5):
+        """Disconnect; a service started by this client is shut down."""
+        if self.process is not None:
+            try:
+                self.call("shutdown")
+            except AcquisitionServiceError as e:
+                logging.info(f"Acquisition service could not be shut down: {str(e)}")
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self._commands.close()
+        self._stream.close()
+
+
+def environment_authkey():
+    """Return the key of LEAKWARE_SERVICE_KEY (hex) as bytes, or None if the variable is not set."""
+    value = os.environ.get(AUTHKEY_VARIABLE)
+    return bytes.fromhex(value) if value else None
+
+
+def _connect(address, authkey, process=None):
+    try:
+        return AcquisitionClient(address, authkey, process)
+    except AuthenticationError:
+        raise AcquisitionServiceError(f"Another service is listening on {address[0]}:{address[1]} and rejected the "
+                                      f"key; stop it (e.g. an acquisition service left over from a previous run) "
+                                      f"and try again")
+
+
+def connect_or_spawn(address=DEFAULT_ADDRESS, authkey=None):
+    """
+    Connect to the acquisition service. Without a key (argument or LEAKWARE_SERVICE_KEY), or if no
+    service is running, a new service is started as a child process with a random key.
+
+    :param address: (host, port) of the service
+    :param authkey: Key of a service that was started on its own (bytes)
+    :return: AcquisitionClient
+    :raises AcquisitionServiceError: If the service cannot be started or another service uses the port
+    """
+    authkey = authkey or environment_authkey()
+    if authkey is not None:
+        try:
+            return _connect(address, authkey)
+        except ConnectionRefusedError:
+            pass
+    authkey = secrets.token_bytes(AUTHKEY_BYTES)
+    # A separate interpreter, not multiprocessing: the GUI entry script has no __main__ guard.
+    # The key goes through stdin, so it is neither on the command line nor in the environment.
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--host", address[0],
+                                "--port", str(address[1]), "--exit-on-disconnect", "--authkey-stdin"],
+                               cwd=os.getcwd(), stdin=subprocess.PIPE)
+    process.stdin.write(authkey.hex().encode() + b"\n")
+    process.stdin.close()
+    deadline = time.monotonic() + SPAWN_TIMEOUT
+    while True:
+        try:
+            return _connect(address, authkey, process)
+        except AcquisitionServiceError:
+            process.kill()  # Could not bind, the port belongs to the other service
+            raise
+        except ConnectionRefusedError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise AcquisitionServiceError("The acquisition service could not be started")
+            time.sleep(0.1)
+
+
+def serve(address, authkey, exit_on_disconnect=False):
+    AcquisitionService(address, authkey, exit_on_disconnect=exit_on_disconnect).serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leakware acquisition service")
+    parser.add_argument("--host", default=DEFAULT_ADDRESS[0])
+    parser.add_argument("--port", type=int, default=DEFAULT_ADDRESS[1])
+    parser.add_argument("--exit-on-disconnect", action="store_true", help="Stop when a client disconnects")
+    parser.add_argument("--authkey-stdin", action="store_true", help="Read the key (hex) from the first line of stdin")
+    args = parser.parse_args()
+    if args.authkey_stdin:
+        authkey = bytes.fromhex(sys.stdin.readline().strip())
+    else:
+        authkey = environment_authkey()
+        if authkey is None:
+            parser.error(f"set {AUTHKEY_VARIABLE} to a secret key (hex), e.g. {secrets.token_hex(AUTHKEY_BYTES)}")
+    setup_logging(LOG_FILE)
+    serve((args.host, args.port), authkey, exit_on_disconnect=args.exit_on_disconnect)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+commit_latency.py
+
+Benchmark of the SQLite commit latency with the default settings (rollback journal,
+synchronous=FULL) and with the pragmas applied by `db_model.make_engine` (WAL,
+synchronous=NORMAL, larger cache, mmap, busy timeout).
+
+Every commit inserts one telemetry row through a session, the way sensor readings were stored
+before they were batched, while a second thread keeps reading the table like the GUI does.
+
+Key Functions:
+- measure(engine, commits): Returns the commit latencies (seconds) and the reader's error count.
+- run(commits): Runs the benchmark for both configurations and prints a summary.
+
+Dependencies:
+- sqlalchemy
+- db_model
+
+Usage:
+Run from the application directory:
+    python -m benchmarks.commit_latency [commits]
+"""
+import os
+import sys
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from db_model import Base, PressureGaugeData, make_engine
+
+DEFAULT_COMMITS = 500
+
+
+def measure(engine, commits=DEFAULT_COMMITS):
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    stop = threading.Event()
+    reader_errors = []
+
+    def reader():
+        with engine.connect() as connection:
+            while not stop.is_set():
+                try:
+                    connection.execute(select(func.count()).select_from(PressureGaugeData.__table__)).scalar()
+                    connection.rollback()
+                except OperationalError as e:
+                    reader_errors.append(e)
+                    connection.rollback()
+
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    reader_thread.start()
+    latencies = []
+    try:
+        for i in range(commits):
+            started = time.perf_counter()
+            session.add(PressureGaugeData(pressure=30.0 + i % 10, temperature=21.5))
+            session.commit()
+            latencies.append(time.perf_counter() - started)
+    finally:
+        stop.set()
+        reader_thread.join()
+        session.close()
+        engine.dispose()
+    return latencies, len(reader_errors)
+
+
+def summary(name, latencies, reader_errors):
+    ordered = sorted(latencies)
+    p95 = ordered[int(0.95 * (len(ordered) - 1))]
+    return (f"{name:<10} mean {statistics.mean(ordered) * 1000:7.3f} ms   "
+            f"p50 {statistics.median(ordered) * 1000:7.3f} ms   p95 {p95 * 1000:7.3f} ms   "
+            f"reader errors {reader_errors}")
+
+
+def run(commits=DEFAULT_COMMITS):
+    with tempfile.TemporaryDirectory() as directory:
+        default_url = "sqlite:///" + os.path.join(directory, "default.db")
+        tuned_url = "sqlite:///" + os.path.join(directory, "tuned.db")
+        results = [
+            ("default", *measure(create_engine(default_url), commits)),
+            ("tuned", *measure(make_engine(tuned_url), commits)),
+        ]
+    print(f"{commits} single-row commits with a concurrent reader")
+    for name, latencies, reader_errors in results:
+        print(summary(name, latencies, reader_errors))
+    return results
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COMMITS)
@@ -0,0 +1,370 @@
+"""
+suite.py
+
+Reproducible benchmark suite for the measurement pipeline. Every scenario has a fixed size and
+random seed, runs in a fresh temporary working directory (own database, trace archive and report
+files) and is repeated a fixed number of times. The results are written as JSON, so the runs of
+two releases can be compared with `--compare`.
+
+Scenarios:
+- sampling_throughput: leak rate samples per second through the acquisition path (LeakRatePoller ->
+  LeakRateAcquisition -> ring buffer and trace archive), against an emulated UL1000 without latency.
+- create_table_commit: latency of saving one measurement with its specimen trace reference, as done by
+  `main_page.create_table`.
+- create_pdf_10 / _100 / _1000: end-to-end `create_pdf` time for sessions with 10, 100 and 1000
+  measurements (one trace of 600 samples each).
+- compare_graph_50: time to build and render (Agg) the comparison figure with 50 specimens of 6000
+  samples each. The Tk embedding is not included, so the scenario also runs without a display.
+- repository_1m_*: latency of the hot `Repository` queries on a synthetic database with 1 million
+  measurements (1000 sessions of 1000 measurements).
+
+Key Functions:
+- run(names, quick): Runs the scenarios and returns the results (dict).
+- compare(old, new, threshold): Prints the change of the median per scenario and returns the regressions.
+
+Dependencies:
+- json
+- argparse
+- statistics
+- tempfile
+- numpy
+- sqlalchemy
+- matplotlib
+- the application modules (imported inside the temporary working directory)
+
+Usage:
+Run from the application directory:
+    python -m benchmarks.suite [--only create_pdf_10 ...] [--quick] [--output results.json]
+    python -m benchmarks.suite --compare old.json new.json [--threshold 0.1]
+`--compare` exits with 1 if a scenario got slower than the threshold (10 % by default).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+from unittest import mock
+
+import numpy as np
+import matplotlib
+
+matplotlib.use("Agg")
+
+APP_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSETS = ("Fonts", "PEM.png", "PROFIL.png")
+SEED = 1234
+
+SCENARIOS = {}
+
+
+def scenario(name, unit="s", higher_is_better=False):
+    """Register a benchmark function; it returns a list of measured values, one per run."""
+    def register(function):
+        SCENARIOS[name] = (function, unit, higher_is_better)
+        return function
+    return register
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - started
+
+
+def summary(values):
+    ordered = sorted(values)
+    return {
+        "runs": len(ordered),
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": statistics.mean(ordered),
+        "p95": ordered[round(0.95 * (len(ordered) - 1))],
+        "max": ordered[-1],
+    }
+
+
+# --- Synthetic data ---
+def create_session(repository, measurements, samples, archive):
+    from db_model import Leakware, Measurements, Specimens, Report
+    rng = np.random.default_rng(SEED)
+    with repository.unit_of_work() as session:
+        leakware = Leakware(mode_of_measurement="PROFIL", measurement_type="Vacuum")
+        session.add(leakware)
+        session.flush()
+        session.add(Report(leakware_id=leakware.leakware_id, test_medium="He", rate_unit="Mbar*L/s"))
+    writer = archive(leakware.leakware_id)
+    with repository.unit_of_work() as session:
+        for number in range(measurements):
+            offset = writer.count
+            for t, value in zip(np.arange(samples) * 0.1, rng.lognormal(-18, 0.5, samples)):
+                writer.append(t, value)
+            measurement = Measurements(leakware_id=leakware.leakware_id, serial_number=number + 1,
+                                       time_in_seconds=samples * 0.1, value_mbarl_second=float(rng.lognormal(-18, 0.5)),
+                                       max_value=float(rng.lognormal(-17, 0.5)), average_temperature=22.0, active=True)
+            session.add(measurement)
+            session.flush()
+            session.add(Specimens(measerment_Id=measurement.measerment_Id, leakware_id=leakware.leakware_id,
+                                  trace_offset=offset, trace_length=samples))
+    writer.flush()
+    return leakware.leakware_id
+
+
+# --- Scenarios ---
+@scenario("sampling_throughput", unit="samples/s", higher_is_better=True)
+def sampling_throughput(quick):
+    from device_simulator import UL1000Emulator, SimulationProfile, make_transport
+    from leak_detector import LeakRatePoller
+    from acquisition import LeakRateBuffer, LeakRateAcquisition
+    from trace_archive import TraceArchiveWriter
+
+    duration = 1.0 if quick else 3.0
+    results = []
+    for run_number in range(3):
+        emulator = UL1000Emulator(make_transport("loopback"), SimulationProfile(latency=0, jitter=0, seed=SEED))
+        emulator.start()
+        poller = LeakRatePoller(emulator.transport.host, sample_rate=100000)
+        buffer = LeakRateBuffer()
+        archive = TraceArchiveWriter(1000 + run_number)
+        acquisition = LeakRateAcquisition(poller.read_sample, buffer, archive=archive)
+        archive.start_segment(time.monotonic())
+        acquisition.resume()
+        time.sleep(duration)
+        acquisition.pause()
+        results.append(buffer.mark() / duration)
+        acquisition.close()
+        emulator.close()
+    return results
+
+
+@scenario("create_table_commit", unit="s")
+def create_table_commit(quick):
+    from repository import Repository
+    from db_model import Measurements, Specimens
+
+    repository = Repository()
+    leakware_id = repository.create_leakware(datetime.now(), "PROFIL", "Vacuum").leakware_id
+    results = []
+    for number in range(50 if quick else 200):
+        started = time.perf_counter()
+        with repository.unit_of_work():
+            measurement = Measurements(leakware_id=leakware_id, serial_number=number, time_in_seconds=12.3,
+                                       value_mbarl_second=1.5e-9, max_value=2.5e-9, average_temperature=22.0,
+                                       active=True)
+            measurement_id = repository.insert_measurement(measurement).measerment_Id
+            repository.insert_specimens(Specimens(measerment_Id=measurement_id, leakware_id=leakware_id,
+                                                  trace_offset=number * 600, trace_length=600))
+        results.append(time.perf_counter() - started)
+    return results
+
+
+def create_pdf_scenario(measurements):
+    def benchmark(quick):
+        import matplotlib.pyplot as plt
+        from repository import Repository
+        from trace_archive import TraceArchiveWriter
+        from create_pdf import create_pdf
+        from db_model import Report
+
+        os.makedirs(".\\Data\\", exist_ok=True)  # Report directory of create_pdf, part of the installation
+        repository = Repository()
+        leakware_id = create_session(repository, measurements, 600, TraceArchiveWriter)
+        report = repository.session.get(Report, leakware_id)
+        results = []
+        # os.startfile opens the PDF viewer on Windows; it is not part of the measured work
+        with mock.patch.object(os, "startfile", lambda path: None, create=True):
+            for _ in range(1 if quick and measurements >= 1000 else 3):
+                results.append(timed(create_pdf, leakware_id, repository, report, "PROFIL"))
+                plt.close("all")
+        return results
+    return benchmark
+
+
+for size in (10, 100, 1000):
+    scenario(f"create_pdf_{size}")(create_pdf_scenario(size))
+
+
+@scenario("compare_graph_50", unit="s")
+def compare_graph_50(quick):
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import compare_graph
+
+    rng = np.random.default_rng(SEED)
+    compare_graph.element_listx = [np.arange(6000) * 0.1 for _ in range(50)]
+    compare_graph.element_listy = [rng.lognormal(-18, 0.5, 6000) for _ in range(50)]
+
+    def render():
+        figure = compare_graph.comparison_figure(list(range(50)))
+        FigureCanvasAgg(figure).draw()
+        plt.close(figure)
+
+    return [timed(render) for _ in range(3 if quick else 10)]
+
+
+def repository_1m():
+    # Built once and shared by the repository_1m_* scenarios
+    from db_model import engine
+    sessions, per_session = 1000, 1000
+    rng = np.random.default_rng(SEED)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO leakware (leakware_id, start_time) VALUES " +
+                                   ",".join(f"({i}, CURRENT_TIMESTAMP)" for i in range(1, sessions + 1)))
+        values = rng.lognormal(-18, 0.5, sessions * per_session)
+        rows = ((leakware_id, number, 10.0, float(values[(leakware_id - 1) * per_session + number]), 1e-8,
+                 number // 100 + 1, number % 100 + 1)
+                for leakware_id in range(1, sessions + 1) for number in range(per_session))
+        connection.exec_driver_sql(
+            "INSERT INTO measurements (leakware_id, serial_number, time_in_seconds, value_mbarl_second, max_value, "
+            "panel_no, location_no, autostop, active, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, 0, 1, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)", list(rows))
+        connection.exec_driver_sql("ANALYZE")
+    return sessions
+
+
+def repository_query_scenario(name, query):
+    def benchmark(quick):
+        from repository import Repository
+        sessions = repository_1m()
+        repository = Repository()
+        rng = np.random.default_rng(SEED)
+        results = []
+        for leakware_id in rng.integers(1, sessions + 1, 20 if quick else 100):
+            results.append(timed(query, repository, int(leakware_id)))
+            repository.session.expunge_all()  # Measure the query, not the identity map
+        return results
+    scenario(name)(benchmark)
+
+
+repository_query_scenario("repository_1m_measurements_page",
+                          lambda repository, leakware_id: repository.get_measurements_page(leakware_id, 0, 100))
+repository_query_scenario("repository_1m_all_measurements",
+                          lambda repository, leakware_id: repository.get_all_measurements_data(leakware_id))
+repository_query_scenario("repository_1m_panel_and_location",
+                          lambda repository, leakware_id: repository.get_panel_and_location_number(leakware_id))
+
+
+# --- Runner ---
+def run_scenario(name, quick):
+    """Run one scenario in a fresh process and working directory, so databases and module state do not leak."""
+    with tempfile.TemporaryDirectory(prefix="leakware_bench_") as directory:
+        for asset in ASSETS:
+            source = os.path.join(APP_DIRECTORY, asset)
+            if os.path.isdir(source):
+                shutil.copytree(source, os.path.join(directory, asset))
+            elif os.path.exists(source):
+                shutil.copy(source, directory)
+        command = [sys.executable, "-m", "benchmarks.suite", "--scenario", name] + (["--quick"] if quick else [])
+        environment = dict(os.environ, PYTHONPATH=APP_DIRECTORY + os.pathsep + os.environ.get("PYTHONPATH", ""))
+        completed = subprocess.run(command, cwd=directory, env=environment, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=APP_DIRECTORY, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names=None, quick=False):
+    """
+    Run the scenarios.
+
+    :param names: Names of the scenarios to run, None for all
+    :param quick: Fewer repetitions, for a smoke test
+    :return: Dict with the metadata of the run and the results per scenario
+    """
+    results = {}
+    for name in names or SCENARIOS:
+        _, unit, higher_is_better = SCENARIOS[name]
+        print(f"Running {name} ...", file=sys.stderr)
+        result = run_scenario(name, quick)
+        if "values" in result:
+            result = dict(summary(result["values"]), unit=unit, higher_is_better=higher_is_better)
+        results[name] = result
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+def compare(old, new, threshold=0.1):
+    """
+    Print the change of the median of every scenario contained in both runs.
+
+    :param old: Results of the baseline run (dict as returned by run)
+    :param new: Results of the new run
+    :param threshold: Relative change counted as a regression
+    :return: List of the names of the scenarios that got worse by more than the threshold
+    """
+    regressions = []
+    for name, new_result in new["results"].items():
+        old_result = old["results"].get(name)
+        if not old_result or "median" not in old_result or "median" not in new_result:
+            continue
+        change = new_result["median"] / old_result["median"] - 1
+        worse = -change if new_result.get("higher_is_better") else change
+        flag = "REGRESSION" if worse > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<36} {old_result['median']:12.6g} -> {new_result['median']:12.6g} "
+              f"{new_result['unit']:<10} {change:+8.1%} {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leakware measurement pipeline benchmarks")
+    parser.add_argument("--only", nargs="+", choices=sorted(SCENARIOS), help="Scenarios to run")
+    parser.add_argument("--quick", action="store_true", help="Fewer repetitions, for a smoke test")
+    parser.add_argument("--output", help="JSON file for the results (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)  # Worker mode, used by run_scenario
+    args = parser.parse_args()
+
+    if args.scenario:
+        function, _, _ = SCENARIOS[args.scenario]
+        print(json.dumps({"values": function(args.quick)}))
+        return 0
+
+    if args.compare:
+        with open(args.compare[0]) as file:
+            old = json.load(file)
+        with open(args.compare[1]) as file:
+            new = json.load(file)
+        return 1 if compare(old, new, args.threshold) else 0
+
+    results = run(args.only, args.quick)
+    output = args.output or os.path.join(APP_DIRECTORY, "benchmarks", "results",
+                                         datetime.now().strftime("%Y%m%dT%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(results, file, indent=2)
+    for name, result in results["results"].items():
+        if "median" in result:
+            print(f"{name:<36} median {result['median']:12.6g} {result['unit']:<10} "
+                  f"p95 {result['p95']:12.6g}  ({result['runs']} runs)")
+        else:
+            print(f"{name:<36} {result}")
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,6 +10,7 @@ Key Functions:
 - check_serial_ports(root, repository): Main function to check and manage serial ports and devices.
 - stop_gas_flow(port): Function to stop gas flow through the Mass Flow Controller.
 - get_serial_devices(): Function to retrieve a list of available serial devices.
+- describe_ports(ports): Function to format the details of serial ports for the log file.
 
 Dependencies:
 - time
@@ -19,6 +20,7 @@ Dependencies:
 - tkinter.ttk
 - denkovi_relay
 - logging
+- log_pipeline
 
 Usage:
 This module is typically imported and the `check_serial_ports` function is called during the
@@ -31,12 +33,33 @@ import tkinter as tk
 from tkinter import ttk
 from denkovi_relay import RelaySwitch
 import logging
+from log_pipeline import CONSOLE
 
 INFICON_LEAK_DETECTOR_VID = 1240
 HELIUM_ANALYZER_VID = 42496
 SERIAL_PORT_VID = 1027
 
 
+def describe_ports(ports):
+    # One log record for all ports instead of eleven per port
+    lines = []
+    for port in ports:
+        lines += [
+            f"Port: {port.device}",
+            f"Name: {port.name}",
+            f"Description: {port.description}",
+            f"Serial Number: {port.serial_number}",
+            f"Hardware ID: {port.hwid}",
+            f"Vendor ID: {port.vid}, Data type is: {type(port.vid)}",
+            f"Location: {port.location}",
+            f"Manufacturer: {port.manufacturer}",
+            f"Product: {port.product}",
+            f"Interface: {port.interface}",
+            "-" * 80,
+        ]
+    return "\n".join(lines)
+
+
 def check_serial_ports(root, repository):
 
     def stop_gas_flow(port):
@@ -62,46 +85,30 @@ def check_serial_ports(root, repository):
             if response == "OK":  # Assuming 'OK' is the expected response
                 logging.info(f"Mass flow Controller: {port}")
 
-                logging.info("Gas flow stopped successfully")
-                print("Gas flow stopped successfully.")
+                logging.info("Gas flow stopped successfully", extra=CONSOLE)
                 return True
             else:
-                logging.info(f"Failed to stop gas flow. Device Response is: {response}.")
-                print(f"Failed to stop gas flow. Device Response is: {response}")
+                logging.info(f"Failed to stop gas flow. Device Response is: {response}.", extra=CONSOLE)
                 return False
         except serial.SerialException as e:
-            logging.info(f"Serial Exception, Failed to stop gas flow: {str(e)}")
-            print(f"Serial Exception, Failed to stop gas flow: {str(e)}")
+            logging.info(f"Serial Exception, Failed to stop gas flow: {str(e)}", extra=CONSOLE)
             return False
 
     def get_serial_devices():
-        print("get serial devices")
-        logging.info("=======================Check Serial Devices==========================")
+        logging.info("=======================Check Serial Devices==========================", extra=CONSOLE)
         devices = []
         ports = serial.tools.list_ports.comports()
 
         # Scan for Relay Switch first
         relay_switch = None
-        logging.info("----------------Scan for Relay-----------------")
+        logging.info("----------------Scan for Relay-----------------\n" + describe_ports(ports))
         for port in ports:
-            logging.info(f"Port: {port.device}")
-            logging.info(f"Name: {port.name}")
-            logging.info(f"Description: {port.description}")
-            logging.info(f"Serial Number: {port.serial_number}")
-            logging.info(f"Hardware ID: {port.hwid}")
-            logging.info(f"Vendor ID: {port.vid}, Data type is: {type(port.vid)}")
-            logging.info(f"Location: {port.location}")
-            logging.info(f"Manufacturer: {port.manufacturer}")
-            logging.info(f"Product: {port.product}")
-            logging.info(f"Interface: {port.interface}")
-            logging.info("-" * 80)
             if str(port.vid) == SERIAL_PORT_VID:
                 relay_switch = RelaySwitch(repository)
                 if relay_switch.connect(port.device):
                     relay_switch.config.port = port.device.strip()
                     relay_switch.config.is_available = True
-                    logging.info(f"Relay Switch Connected via: {port.device.strip()}")
-                    print("Relay Switch Connected via:", port.device.strip())
+                    logging.info(f"Relay Switch Connected via: {port.device.strip()}", extra=CONSOLE)
                     break
 
         # Turn on devices using Relay Switch
@@ -109,56 +116,39 @@ def check_serial_ports(root, repository):
             device_status = relay_switch.turn_on_devices()
             for device, status in device_status.items():
                 if status:
-                    logging.info(f"{device} turned on successfully")
-                    print(f"{device} turned on successfully")
+                    logging.info(f"{device} turned on successfully", extra=CONSOLE)
                 else:
                     logging.error(f"Failed to turn on {device}")
-                    print(f"Failed to turn on {device}")
 
             # Wait for devices to stabilize after turning on
             time.sleep(10)  # Adjust the delay as needed
 
         # Scan for remaining devices
-        logging.info("--------- Scan for remaining devices ---------")
+        logging.info("--------- Scan for remaining devices ---------\n" + describe_ports(ports))
         for port in ports:
             devices.append({
                 "name": port.description,
                 "port": port.device,
             })
-            logging.info(f"Port: {port.device}")
-            logging.info(f"Name: {port.name}")
-            logging.info(f"Description: {port.description}")
-            logging.info(f"Serial Number: {port.serial_number}")
-            logging.info(f"Hardware ID: {port.hwid}")
-            logging.info(f"Vendor ID: {port.vid}, Data type is: {type(port.vid)}")
-            logging.info(f"Location: {port.location}")
-            logging.info(f"Manufacturer: {port.manufacturer}")
-            logging.info(f"Product: {port.product}")
-            logging.info(f"Interface: {port.interface}")
-            logging.info("-" * 80)
 
             if port.vid == INFICON_LEAK_DETECTOR_VID:
                 leak_detector_config = repository.get_device_info_by("Leak Detector")
                 leak_detector_config.port = port.device.strip()
                 leak_detector_config.is_available = True
-                logging.info(f"Inficon Unit Connected via : {port.device.strip()}")
-                print("Inficon Unit Connected via : ", port.device.strip())
+                logging.info(f"Inficon Unit Connected via : {port.device.strip()}", extra=CONSOLE)
             elif port.vid == HELIUM_ANALYZER_VID:
                 helium_analyzer_config = repository.get_device_info_by("Helium Analyzer")
                 helium_analyzer_config.port = port.device.strip()
                 helium_analyzer_config.is_available = True
-                logging.info(f"Helium Analyzer Connected via : {port.device.strip()}")
-                print("Helium Analyzer Connected via : ", port.device.strip())
+                logging.info(f"Helium Analyzer Connected via : {port.device.strip()}", extra=CONSOLE)
             elif port.vid == SERIAL_PORT_VID:
                 if stop_gas_flow(port.device):
                     mass_flow_config = repository.get_device_info_by("Mass Flow Controller")
                     mass_flow_config.port = port.device.strip()
                     mass_flow_config.is_available = True
-                    logging.info(f"Mass Flow Controller Connected via : {port.device.strip()}")
-                    print("Mass Flow Controller Connected via : ", port.device.strip())
+                    logging.info(f"Mass Flow Controller Connected via : {port.device.strip()}", extra=CONSOLE)
                 else:
-                    logging.info(f"Pressure Gauge Connected via : {port.device.strip()}")
-                    print("Pressure Gauge Connected via : ", port.device.strip())
+                    logging.info(f"Pressure Gauge Connected via : {port.device.strip()}", extra=CONSOLE)
         repository.update_device_info()
         logging.info("======================= End Check Serial Devices ==========================")
         return devices
@@ -8,6 +8,7 @@ multiple measurement graphs side by side.
 Key Functions:
 - compare(leakware_id, mode_of_measurement, root, repository): Main function to create the comparison window.
 - comparison_graph(window, selected_index): Function to plot the selected measurement graphs.
+- comparison_figure(selected_index): Function to create the figure with the selected measurement graphs.
 - create_checkboxes(list_frame, compare_chart_frame): Function to create checkboxes for selecting measurements.
 - on_checkbox_change(window): Function to handle checkbox state changes and update the comparison graph.
 - load_data_from_database(repository, leakware_id): Function to load measurement data from the database.
@@ -17,7 +18,7 @@ Dependencies:
 - matplotlib.animation
 - matplotlib.pyplot
 - matplotlib.backends.backend_tkagg
-- json
+- downsample
 
 Usage:
 This module is typically imported and the `compare` function is called when the user requests
@@ -27,7 +28,7 @@ import tkinter as tk
 import matplotlib.animation as animation
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import json
+from downsample import minmax_downsample, axes_pixel_width
 
 ### compare method
 def compare(leakware_id, mode_of_measurement, root, repository):
@@ -59,13 +60,21 @@ def compare(leakware_id, mode_of_measurement, root, repository):
 
 ### Create Compare Graph
 def comparison_graph(window, selected_index):
-    global element_listx
-    global element_listy
     global Checkboxes
 
     for widget in window.winfo_children():
         widget.destroy()
 
+    fig3 = comparison_figure(selected_index)
+
+    canvas = FigureCanvasTkAgg(fig3, master=window)
+    canvas.draw()
+    canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
+
+def comparison_figure(selected_index):
+    global element_listx
+    global element_listy
+
     fig3 = plt.figure(figsize=(10,7))
     compare_graph = fig3.add_subplot(1,1,1)
 
@@ -81,14 +90,12 @@ def comparison_graph(window, selected_index):
         element_no_in_listx = element_listx[i]
         if i in selected_index:
             i+=1
-            compare_graph.plot(element_no_in_listx[:-1], element_no_in_listy[:-1], label="specimen "+str(i))
+            x, y = minmax_downsample(element_no_in_listx[:-1], element_no_in_listy[:-1], axes_pixel_width(compare_graph))
+            compare_graph.plot(x, y, label="specimen "+str(i))
         else:
             i+=1
     fig3.legend()
-
-    canvas = FigureCanvasTkAgg(fig3, master=window)
-    canvas.draw()
-    canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
+    return fig3
 
 ### Checkbox and onchange 
 def create_checkboxes(list_frame, compare_chart_frame):
@@ -135,7 +142,6 @@ def load_data_from_database(repository, leakware_id):
 
     element_listx = []
     element_listy = []
-    specimens = repository.get_all_specimens(leakware_id)
-    for specimen in specimens:
-        element_listx.append(json.loads(specimen.x_value))
-        element_listy.append(json.loads(specimen.y_value))
\ No newline at end of file
+    for x_values, y_values in repository.get_specimen_traces(leakware_id):
+        element_listx.append(x_values)
+        element_listy.append(y_values)
\ No newline at end of file
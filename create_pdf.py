@@ -21,7 +21,6 @@ Key Functions:
 Dependencies:
 - base64
 - datetime
-- json
 - os
 - datetime
 - io
@@ -30,6 +29,7 @@ Dependencies:
 - fpdf
 - copy
 - db_model
+- downsample
 
 Usage:
 This module is typically imported and the `create_pdf` function is called when the user requests
@@ -37,7 +37,6 @@ to generate a PDF report for a specific leak test session.
 """
 import base64
 import datetime
-import json
 import os
 from datetime import datetime
 from io import BytesIO
@@ -46,7 +45,8 @@ import matplotlib.pyplot as plt
 from PIL import Image
 from fpdf import FPDF
 import copy
-from db_model import Report
+from db_model import Report, format_leak_rate
+from downsample import minmax_downsample, axes_pixel_width
 
 ETA_HE = 19.6  # Viscosity of helium (in μPa·s)
 ETA_AIR = 18.19  # Viscosity of air (in μPa·s)
@@ -81,10 +81,9 @@ def create_pdf(leakware_id, repository, report_data: Report, mode_of_measurement
         global element_listy
         element_listx = []
         element_listy = []
-        specimens = repository.get_all_specimens(leakware_id)
-        for specimen in specimens:
-            element_listx.append(json.loads(specimen.x_value))
-            element_listy.append(json.loads(specimen.y_value))
+        for x_values, y_values in repository.get_specimen_traces(leakware_id):
+            element_listx.append(x_values)
+            element_listy.append(y_values)
 
     def create_graphs():
         global ys
@@ -106,7 +105,8 @@ def create_pdf(leakware_id, repository, report_data: Report, mode_of_measurement
         for element_no_in_listy in element_listy:
             element_no_in_listx = element_listx[i]
             i += 1
-            ax_pdf.plot(element_no_in_listx[:-1], element_no_in_listy[:-1], label="specimen " + str(i))
+            x, y = minmax_downsample(element_no_in_listx[:-1], element_no_in_listy[:-1], axes_pixel_width(ax_pdf))
+            ax_pdf.plot(x, y, label="specimen " + str(i))
         fig2.legend()  # loc='upper right'
         # fig2.show()
 
@@ -173,6 +173,10 @@ def create_pdf(leakware_id, repository, report_data: Report, mode_of_measurement
 
         return air_leakrate
 
+    # Blank leak rates are stored as NULL (migration 5); they are shown blank and not converted
+    def convert_leak_rate(leak_rate, convert):
+        return None if leak_rate is None else convert(leak_rate)
+
     col_width = [32, 46, 32, 48]
     date = datetime.now()
     formatted_date = date.strftime("%d %b %Y")
@@ -273,12 +277,14 @@ def create_pdf(leakware_id, repository, report_data: Report, mode_of_measurement
     flag = True
     for measurement in measurements_list:
         if report_data.rate_unit == "cm³/min":
-            measurement.max_value = measurement.max_value * 60
-            measurement.value_mbarl_second = measurement.value_mbarl_second * 60
+            measurement.max_value = convert_leak_rate(measurement.max_value, lambda value: value * 60)
+            measurement.value_mbarl_second = convert_leak_rate(measurement.value_mbarl_second, lambda value: value * 60)
             flag = False
         if report_data.test_medium == "Air":
-            measurement.max_value = convert_he_to_air(measurement.max_value, measurement.average_temperature)
-            measurement.value_mbarl_second = convert_he_to_air(measurement.value_mbarl_second, measurement.average_temperature)
+            measurement.max_value = convert_leak_rate(
+                measurement.max_value, lambda value: convert_he_to_air(value, measurement.average_temperature))
+            measurement.value_mbarl_second = convert_leak_rate(
+                measurement.value_mbarl_second, lambda value: convert_he_to_air(value, measurement.average_temperature))
             flag = False
         if flag:
             break
@@ -296,8 +302,8 @@ def create_pdf(leakware_id, repository, report_data: Report, mode_of_measurement
         for measurement in measurements_list:
             df_list.append(
                 [measurement.panel_no, measurement.location_no, round(measurement.time_in_seconds, 1),
-                 "{:10.1e}".format(float(measurement.value_mbarl_second)),
-                 "{:10.1e}".format(float(measurement.max_value))])
+                 format_leak_rate(measurement.value_mbarl_second),
+                 format_leak_rate(measurement.max_value)])
 
     load_data_from_database_pdf()
 
@@ -0,0 +1,331 @@
+"""
+data_export.py
+
+This module exports leak test data to columnar files (Apache Parquet, or Arrow IPC/Feather) for
+analysis outside of Leakware, e.g. with pandas, DuckDB or Spark, instead of querying
+`leak_ware_db.db` and decoding the specimen rows by hand.
+
+Every export writes one file per table into a sub-directory of the output directory, so each
+sub-directory can be read as one dataset (e.g. `pyarrow.dataset.dataset("export/traces")`):
+- sessions:  the Leakware rows
+- measurements: the active Measurements rows
+- traces: the traces of the active specimens in long format (leakware_id, measerment_Id, t, leak_rate)
+- pressure_gauge_data, helium_analyzer_data, mass_flow_sensor_data: the raw telemetry
+
+Rows are read with a server-side cursor and written in row groups of `row_group_size` rows,
+so memory stays flat regardless of the size of the database.
+
+Exports of all sessions are incremental: `export_state.json` in the output directory stores the
+last exported id of every table, and the next export only writes the rows added since then as new
+part files. Rows that were changed after they were exported (e.g. edited in the results table) are
+only picked up by a full export (`full=True`), which writes all tables into a staging directory and
+then replaces the table sub-directories, so no row is exported twice. `export_state.json` also stores
+the file format, and an incremental export in a different format is refused, so a dataset never mixes
+Parquet and Feather parts; a full export may switch the format.
+
+Exports of selected sessions are always complete and do not touch the stored state. They are written
+to their own sub-directory `sessions-<ids>/<table>/` (e.g. `export/sessions-12-13/traces`), which is
+replaced on every export of the same sessions, so their rows are never added to the datasets of all
+sessions.
+
+Key Functions:
+- export_data(engine, directory, leakware_ids, file_format, full, row_group_size): Exports the tables and
+  returns the number of rows written per table.
+
+Dependencies:
+- os
+- json
+- shutil
+- argparse
+- datetime
+- sqlalchemy
+- pyarrow
+- db_model
+- trace_codec
+- trace_archive
+
+Usage:
+From Python:
+    export_data(engine, "export")
+From the command line (run from the application directory):
+    python data_export.py export [--session 12 --session 13] [--format feather] [--full]
+"""
+import os
+import json
+import shutil
+import argparse
+from datetime import datetime
+
+from sqlalchemy import select, Boolean, DateTime, Float, Integer
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from db_model import engine, Leakware, Measurements, Specimens, PressureGaugeData, HeliumAnalyzerData, MassFlowSensorData
+from trace_codec import decode_trace
+from trace_archive import TraceArchiveReader, archive_path
+
+DEFAULT_ROW_GROUP_SIZE = 65536
+STATE_FILE = "export_state.json"
+SESSIONS_PREFIX = "sessions-"
+FILE_FORMATS = {"parquet": ".parquet", "feather": ".arrow"}
+PARQUET_COMPRESSION = "zstd"
+
+# Exported tables: name -> (ORM model, id column, filtered by session, only active rows)
+# Deleted measurements stay in the database as inactive rows; like the traces, they are not exported.
+TABLES = {
+    "sessions": (Leakware, Leakware.leakware_id, True, False),
+    "measurements": (Measurements, Measurements.measerment_Id, True, True),
+    "pressure_gauge_data": (PressureGaugeData, PressureGaugeData.pressure_gauge_data_id, False, False),
+    "helium_analyzer_data": (HeliumAnalyzerData, HeliumAnalyzerData.helium_analyzer_data_id, False, False),
+    "mass_flow_sensor_data": (MassFlowSensorData, MassFlowSensorData.mass_flow_sensor_data_id, False, False),
+}
+
+TRACE_SCHEMA = pa.schema([
+    ("leakware_id", pa.int64()),
+    ("measerment_Id", pa.int64()),
+    ("specimen_id", pa.int64()),
+    ("t", pa.float64()),
+    ("leak_rate", pa.float64()),
+])
+
+
+def arrow_type(column):
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    return pa.string()
+
+
+def to_float(value):
+    # Float columns of databases from before migration 5 may still hold text
+    return None if value is None or value == "" else float(value)
+
+
+def to_string(value):
+    return None if value is None else str(value)
+
+
+def table_schema(model):
+    return pa.schema([(column.key, arrow_type(column)) for column in model.__table__.columns])
+
+
+def rows_to_table(schema, rows):
+    arrays = []
+    for index, field in enumerate(schema):
+        values = [row[index] for row in rows]
+        if pa.types.is_floating(field.type):
+            values = [to_float(value) for value in values]
+        elif pa.types.is_string(field.type):
+            values = [to_string(value) for value in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+class PartWriter:
+    """
+    Writes row groups into one new part file of a table. The file is only created when the
+    first row group arrives, so exports without new rows leave no empty files behind.
+    """
+    def __init__(self, directory, table, schema, file_format, part_name):
+        """
+        :param directory: Output directory of the export
+        :param table: Table name, used as sub-directory
+        :param schema: pyarrow schema of the table
+        :param file_format: "parquet" or "feather"
+        :param part_name: File name of the part without extension
+        """
+        self.path = os.path.join(directory, table, part_name + FILE_FORMATS[file_format])
+        self.schema = schema
+        self.file_format = file_format
+        self.rows = 0
+        self._writer = None
+
+    def write(self, table):
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            if self.file_format == "parquet":
+                self._writer = pq.ParquetWriter(self.path, self.schema, compression=PARQUET_COMPRESSION)
+            else:
+                self._writer = pa.ipc.new_file(self.path, self.schema)
+        if self.file_format == "parquet":
+            self._writer.write_table(table, row_group_size=table.num_rows)
+        else:
+            self._writer.write_table(table, max_chunksize=table.num_rows)
+        self.rows += table.num_rows
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def load_state(directory):
+    path = os.path.join(directory, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_state(directory, state):
+    path = os.path.join(directory, STATE_FILE)
+    with open(path + ".tmp", "w") as file:
+        json.dump(state, file, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def replace_tables(directory, staging, tables):
+    # Swap in the table sub-directories of a full or session export; a table without rows ends up without files
+    os.makedirs(directory, exist_ok=True)
+    for table in tables:
+        target = os.path.join(directory, table)
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        if os.path.isdir(os.path.join(staging, table)):
+            os.replace(os.path.join(staging, table), target)
+
+
+def export_table(connection, writer, model, id_column, after_id, leakware_ids, active_only, row_group_size):
+    columns = list(model.__table__.columns)
+    stmt = select(*columns).where(id_column > after_id).order_by(id_column)
+    if active_only:
+        stmt = stmt.where(model.__table__.c.active == True)
+    if leakware_ids is not None:
+        stmt = stmt.where(model.__table__.c.leakware_id.in_(leakware_ids))
+    last_id = after_id
+    result = connection.execution_options(yield_per=row_group_size).execute(stmt)
+    id_index = [column.key for column in columns].index(id_column.key)
+    for rows in result.partitions():
+        writer.write(rows_to_table(writer.schema, rows))
+        last_id = rows[-1][id_index]
+    return last_id
+
+
+def export_traces(connection, writer, after_id, leakware_ids, row_group_size):
+    stmt = select(Specimens.specimen_id, Specimens.leakware_id, Specimens.measerment_Id,
+                  Specimens.trace_offset, Specimens.trace_length,
+                  Specimens.x_data, Specimens.y_data, Specimens.x_value, Specimens.y_value)\
+        .where(Specimens.specimen_id > after_id, Specimens.active == True).order_by(Specimens.specimen_id)
+    if leakware_ids is not None:
+        stmt = stmt.where(Specimens.leakware_id.in_(leakware_ids))
+    last_id = after_id
+    pending = []
+    pending_rows = 0
+    archives = {}
+    # Specimen rows are small in number but large in samples, so fetch a few at a time
+    result = connection.execution_options(yield_per=16).execute(stmt)
+    for specimen_id, leakware_id, measurement_id, trace_offset, trace_length, x_data, y_data, x_value, y_value in result:
+        if trace_length is not None:
+            if leakware_id not in archives:
+                archives[leakware_id] = TraceArchiveReader(archive_path(leakware_id))
+            t, leak_rate = archives[leakware_id].trace(trace_offset, trace_length)
+        else:
+            t = decode_trace(x_data if x_data is not None else x_value)
+            leak_rate = decode_trace(y_data if y_data is not None else y_value)
+        count = min(len(t), len(leak_rate))
+        if count:
+            pending.append(pa.Table.from_arrays([
+                pa.array([leakware_id] * count, type=pa.int64()),
+                pa.array([measurement_id] * count, type=pa.int64()),
+                pa.array([specimen_id] * count, type=pa.int64()),
+                pa.array(t[:count]),
+                pa.array(leak_rate[:count]),
+            ], schema=TRACE_SCHEMA))
+            pending_rows += count
+        if pending_rows >= row_group_size:
+            writer.write(pa.concat_tables(pending).combine_chunks())
+            pending, pending_rows = [], 0
+        last_id = specimen_id
+    if pending:
+        writer.write(pa.concat_tables(pending).combine_chunks())
+    return last_id
+
+
+def export_data(engine, directory, leakware_ids=None, file_format="parquet", full=False,
+                row_group_size=DEFAULT_ROW_GROUP_SIZE):
+    """
+    Export the leak test data to columnar files.
+
+    :param engine: SQLAlchemy engine of the Leakware database
+    :param directory: Output directory (created if it does not exist)
+    :param leakware_ids: Ids of the sessions to export, None for all sessions (incremental)
+    :param file_format: "parquet" or "feather" (Arrow IPC file)
+    :param full: Export all rows again instead of only the rows added since the last export
+    :param row_group_size: Number of rows per row group / record batch
+    :return: Dict with the number of rows written per table
+    """
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f"Unsupported export format: {file_format}")
+    os.makedirs(directory, exist_ok=True)
+    incremental = leakware_ids is None and not full
+    state = load_state(directory) if incremental else {}
+    if incremental and state.get("format", file_format) != file_format:
+        raise ValueError(f"{directory} holds a {state['format']} export; export incrementally as {state['format']} "
+                         f"or run a full export to switch to {file_format}")
+    part_name = "part-" + datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    target = directory
+    if leakware_ids is not None:
+        target = os.path.join(directory, SESSIONS_PREFIX + "-".join(str(leakware_id) for leakware_id in leakware_ids))
+    # Full exports and exports of selected sessions replace the previous files; until they are complete
+    # the previous files stay untouched
+    replace = not incremental
+    output = os.path.join(directory, ".staging-" + part_name) if replace else directory
+
+    written = {}
+    new_state = dict(state)
+    writers = []
+    try:
+        with engine.connect() as connection:
+            for table, (model, id_column, per_session, active_only) in TABLES.items():
+                if leakware_ids is not None and not per_session:
+                    continue
+                writer = PartWriter(output, table, table_schema(model), file_format, part_name)
+                writers.append(writer)
+                new_state[table] = export_table(connection, writer, model, id_column, state.get(table, 0),
+                                                leakware_ids, active_only, row_group_size)
+                written[table] = writer.rows
+
+            writer = PartWriter(output, "traces", TRACE_SCHEMA, file_format, part_name)
+            writers.append(writer)
+            new_state["traces"] = export_traces(connection, writer, state.get("traces", 0),
+                                                leakware_ids, row_group_size)
+            written["traces"] = writer.rows
+        for writer in writers:
+            writer.close()
+        if replace:
+            replace_tables(target, output, written)
+    finally:
+        for writer in writers:
+            writer.close()
+        if replace:
+            shutil.rmtree(output, ignore_errors=True)
+
+    if leakware_ids is None:  # Selected sessions do not move the incremental state
+        new_state["format"] = file_format
+        save_state(directory, new_state)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Leakware data to Parquet or Arrow IPC (Feather) files.")
+    parser.add_argument("directory", help="Output directory")
+    parser.add_argument("--session", type=int, action="append", dest="leakware_ids",
+                        help="Id of a session to export (can be repeated); default: all sessions, incremental")
+    parser.add_argument("--format", choices=sorted(FILE_FORMATS), default="parquet", dest="file_format")
+    parser.add_argument("--full", action="store_true", help="Export all rows instead of only the new ones")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE)
+    args = parser.parse_args()
+
+    written = export_data(engine, args.directory, args.leakware_ids, args.file_format, args.full, args.row_group_size)
+    for table, rows in written.items():
+        print(f"{table:<24} {rows} row(s)")
+
+
+if __name__ == "__main__":
+    main()
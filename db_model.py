@@ -25,6 +25,24 @@ Key Classes:
 - MassFlowSensorData: Stores values received from the Mass Flow Controller.
 - HeliumAnalyzerData: Stores values received from the Helium Analyzer.
 - PressureGaugeData: Stores values received from the Pressure Gauge.
+- SensorSnapshot: Stores the latest reading of each sensor (one row per device).
+- TelemetryMinute / TelemetryHour: Store 1-minute and 1-hour min/mean/max aggregates of old telemetry.
+
+Key Functions:
+- make_engine(url, pragmas): Creates an engine that applies the SQLite performance pragmas to every connection.
+- run_migrations(engine): Applies pending schema migrations to an existing database.
+- format_leak_rate(leak_rate): Formats a stored leak rate for the results table and the PDF report.
+
+The module-level `engine` (and its `Session` factory) is shared by every module of the application,
+so all threads use one connection pool with the same SQLite settings:
+- journal_mode=WAL: readers no longer block the writer and vice versa.
+- synchronous=NORMAL: in WAL mode a commit no longer waits for an fsync (the database stays consistent,
+  only the last transactions may be lost on a power failure).
+- cache_size / mmap_size: larger page cache and memory-mapped reads.
+- busy_timeout: a locked database is retried for a while instead of failing immediately.
+- auto_vacuum=INCREMENTAL: pages freed by the telemetry retention can be returned to the file system
+  in small steps (applies to new databases; existing ones are converted offline with
+  `python telemetry_retention.py --enable-incremental-vacuum`).
 
 Dependencies:
 - sqlalchemy
@@ -37,11 +55,36 @@ create and retrieve data models, and define relationships between entities.
 # -----------------------------------------------------
 # Import Necessary Modules
 # -----------------------------------------------------
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, JSON, Float, Boolean, func, Text
+from sqlalchemy import create_engine, event, Column, Integer, String, DateTime, ForeignKey, JSON, Float, Boolean, func, LargeBinary, Index
 from sqlalchemy.orm import relationship, DeclarativeBase, sessionmaker
 
 # Data base connection
-engine = create_engine("sqlite:///leak_ware_db.db")
+DATABASE_URL = "sqlite:///leak_ware_db.db"
+SQLITE_PRAGMAS = (
+    ("auto_vacuum", "INCREMENTAL"),  # Must come first, it only takes effect before the first table is created
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16000),  # Negative values are KiB, i.e. 16 MB
+    ("mmap_size", 256 * 1024 * 1024),
+    ("busy_timeout", 5000),  # Milliseconds
+)
+
+
+# Creates an engine that applies the pragmas on every new DBAPI connection of its pool
+def make_engine(url=DATABASE_URL, pragmas=SQLITE_PRAGMAS):
+    engine = create_engine(url)
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return engine
+
+
+engine = make_engine()
 Session = sessionmaker(bind=engine)
 
 # --- Base Class for Common Behavior ---
@@ -147,6 +190,9 @@ class Measurements(Base, TimestampMixin):
     Includes timestamps and the ability to track multiple readings.
     """
     __tablename__ = 'measurements'
+    __table_args__ = (
+        Index("ix_measurements_leakware_active_id", "leakware_id", "active", "measerment_Id"),
+    )
 
     measerment_Id = Column(Integer, primary_key=True, autoincrement=True)
     leakware_id = Column(Integer, ForeignKey('leakware.leakware_id'), nullable=False)
@@ -169,17 +215,32 @@ class Measurements(Base, TimestampMixin):
     specimens = relationship('Specimens', back_populates='measurements')
 
 
+# Leak rates are stored at full precision and only rounded for display; blank ones are NULL (migration 5)
+def format_leak_rate(leak_rate):
+    return "" if leak_rate is None else "{:10.1e}".format(leak_rate)
+
+
 class Specimens(Base, TimestampMixin):
     """
     Stores X & Y coordinate data likely related to the location of a leak 
     or specific measurement points on a tested element.
+    trace_offset/trace_length reference the trace in the memory-mapped trace archive of
+    the session (see trace_archive). x_data/y_data hold the trace as binary blobs (see trace_codec)
+    for rows written before that; x_value/y_value are the legacy JSON columns of even older rows.
     """
     __tablename__ = 'specimens'
+    __table_args__ = (
+        Index("ix_specimens_leakware_measurement", "leakware_id", "measerment_Id"),
+    )
 
     specimen_id = Column(Integer, primary_key=True, autoincrement=True)
     measerment_Id = Column(Integer, ForeignKey('measurements.measerment_Id'), nullable=True)
     x_value = Column(JSON, default=None)
     y_value = Column(JSON, default=None)
+    x_data = Column(LargeBinary, default=None)
+    y_data = Column(LargeBinary, default=None)
+    trace_offset = Column(Integer, default=None)
+    trace_length = Column(Integer, default=None)
     leakware_id = Column(Integer, ForeignKey('leakware.leakware_id'), nullable=False)
     active = Column(Boolean, default=True)
 
@@ -204,6 +265,7 @@ class Devices(Base, TimestampMixin):
     sccm_value = Column(Float, default=None)
     is_default = Column(Boolean, default=True)
     is_available = Column(Boolean, default=False)
+    sample_rate = Column(Float, default=10)
 
 class Report(Base, TimestampMixin):
     """
@@ -225,6 +287,9 @@ class MassFlowSensorData(Base, TimestampMixin):
     """
 
     __tablename__ = "mass_flow_sensor_data"
+    __table_args__ = (
+        Index("ix_mass_flow_sensor_data_created_at", "created_at"),
+    )
 
     device_id = Column(Integer, ForeignKey('devices.device_id'), nullable=True)
     mass_flow_sensor_data_id = Column(Integer, primary_key=True, autoincrement=True)
@@ -239,6 +304,9 @@ class HeliumAnalyzerData(Base, TimestampMixin):
     """
 
     __tablename__ = "helium_analyzer_data"
+    __table_args__ = (
+        Index("ix_helium_analyzer_data_created_at", "created_at"),
+    )
 
     device_id = Column(Integer, ForeignKey('devices.device_id'), nullable=True)
     helium_analyzer_data_id = Column(Integer, primary_key=True, autoincrement=True)
@@ -252,11 +320,120 @@ class PressureGaugeData(Base, TimestampMixin):
     """
 
     __tablename__ = "pressure_gauge_data"
+    __table_args__ = (
+        Index("ix_pressure_gauge_data_created_at", "created_at"),
+    )
 
     pressure_gauge_data_id = Column(Integer, primary_key=True, autoincrement=True)
     pressure = Column(Float, default=0)
     temperature = Column(Float, default=0)
 
+class SensorSnapshot(Base):
+    """
+    Stores the latest reading of each sensor, one row per device name, so the main window
+    can show the last known values on startup without scanning the telemetry tables.
+    data holds the values of the reading, e.g. {"pressure": 30.1, "temperature": 21.5}
+    """
+
+    __tablename__ = "sensor_snapshots"
+
+    name = Column(String(45), primary_key=True)
+    data = Column(JSON, default=None)
+    updated_at = Column(DateTime, nullable=False, server_default=func.now())
+
+class TelemetryAggregateMixin:
+    """
+    Columns of the telemetry aggregate tables: one row per source table, metric (column)
+    and time bucket, with the number of readings and their min/mean/max.
+    """
+    source = Column(String(45), primary_key=True)
+    metric = Column(String(45), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    sample_count = Column(Integer, nullable=False, default=0)
+    min_value = Column(Float, default=None)
+    mean_value = Column(Float, default=None)
+    max_value = Column(Float, default=None)
+
+class TelemetryMinute(TelemetryAggregateMixin, Base):
+    """
+    Stores 1-minute aggregates of telemetry readings older than the raw retention window
+    """
+
+    __tablename__ = "telemetry_1m"
+
+class TelemetryHour(TelemetryAggregateMixin, Base):
+    """
+    Stores 1-hour aggregates of telemetry older than the 1-minute retention window
+    """
+
+    __tablename__ = "telemetry_1h"
+
+# --- Schema Migrations ---
+# create_all only creates missing tables, so changes to existing tables are applied here.
+# Each step runs once; SQLite's 'PRAGMA user_version' stores the last applied step.
+def add_column(connection, table, column, ddl):
+    columns = [row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+def create_index(connection, name, table, columns):
+    connection.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+
+
+def migration_1_device_sample_rate(connection):
+    add_column(connection, "devices", "sample_rate", "FLOAT DEFAULT 10")
+
+
+def migration_2_specimen_blobs(connection):
+    add_column(connection, "specimens", "x_data", "BLOB")
+    add_column(connection, "specimens", "y_data", "BLOB")
+
+
+# Indexes for the per-session queries of the repository (filter by leakware_id/active,
+# order by id) and for time range queries on the telemetry tables.
+# Must match the Index definitions in __table_args__, which cover newly created databases.
+def migration_3_query_indexes(connection):
+    create_index(connection, "ix_measurements_leakware_active_id", "measurements",
+                 ["leakware_id", "active", "measerment_Id"])
+    create_index(connection, "ix_specimens_leakware_measurement", "specimens", ["leakware_id", "measerment_Id"])
+    for table in ("mass_flow_sensor_data", "helium_analyzer_data", "pressure_gauge_data"):
+        create_index(connection, f"ix_{table}_created_at", table, ["created_at"])
+    connection.exec_driver_sql("ANALYZE")
+
+
+def migration_4_specimen_trace_archive(connection):
+    add_column(connection, "specimens", "trace_offset", "INTEGER")
+    add_column(connection, "specimens", "trace_length", "INTEGER")
+
+
+# Leak rates used to be written as formatted strings ("{:10.2e}"). SQLite already stored the
+# well-formed ones as REAL; rows that stayed text are converted here, blank values become NULL.
+def migration_5_measurement_values_as_real(connection):
+    for column in ("value_mbarl_second", "max_value"):
+        connection.exec_driver_sql(
+            f"UPDATE measurements SET {column} = CAST(NULLIF(TRIM({column}), '') AS REAL) "
+            f"WHERE typeof({column}) = 'text'"
+        )
+
+
+MIGRATIONS = [
+    (1, migration_1_device_sample_rate),
+    (2, migration_2_specimen_blobs),
+    (3, migration_3_query_indexes),
+    (4, migration_4_specimen_trace_archive),
+    (5, migration_5_measurement_values_as_real),
+]
+
+
+def run_migrations(engine):
+    with engine.begin() as connection:
+        version = connection.exec_driver_sql("PRAGMA user_version").scalar()
+        for step, migration in MIGRATIONS:
+            if step > version:
+                migration(connection)
+                connection.exec_driver_sql(f"PRAGMA user_version = {step}")
+
 # Define a function to insert default data
 def insert_default_data():
     session = Session()
@@ -270,4 +447,5 @@ def insert_default_data():
     session.close()
 
 Base.metadata.create_all(engine)
+run_migrations(engine)
 insert_default_data()
@@ -18,6 +18,7 @@ Dependencies:
 - serial
 - time
 - logging
+- log_pipeline
 
 Usage:
 This module is typically imported and an instance of the RelaySwitch class is created,
@@ -27,6 +28,7 @@ the power state of connected devices through the relay switch.
 import serial
 import time
 import logging
+from log_pipeline import CONSOLE
 
 # Dictionary mapping device names to their corresponding relay channels
 DEVICES = {
@@ -61,16 +63,13 @@ class RelaySwitch:
             response = self.relay.read(5)
             relay_states = response[1:5]  # Byte 1-4 indicate relay states
 
-            # Print the status of each relay channel
-            for i in range(4):
-                state = 'ON' if relay_states[i] == 0x01 else 'OFF'
-                logging.info(f"Relay Channel {i + 1}: {state}")
-                print(f"Relay Channel {i + 1}: {state}")
+            # Log the status of all relay channels as one message
+            logging.info(", ".join(f"Relay Channel {i + 1}: {'ON' if relay_states[i] == 0x01 else 'OFF'}"
+                                   for i in range(4)), extra=CONSOLE)
 
             return True
         except serial.SerialException:
             logging.error("Failed to read relay status. Check serial connection.")
-            print("Failed to read relay status. Check serial connection.")
             return False
 
     def set_relay_state(self, device, state):
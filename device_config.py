@@ -0,0 +1,116 @@
+"""
+device_config.py
+
+This module keeps an in-memory copy of the `devices` table, so hot paths (the sensor threads,
+the relay check, the Helium Analyzer reader) look up device configuration without a SQL query.
+
+The cache holds immutable `DeviceConfig` snapshots keyed by device name. It loads the whole
+table once and is only reloaded after device configuration was written (`Repository.update_device_info`,
+used by `Settings.save_all_settings`, `check_serial_ports` and `load_cfg`). After a reload every
+subscriber is notified once per device whose configuration changed, so open serial connections
+can reconfigure themselves.
+
+Snapshots are read-only and can be shared between threads. Code that changes a device still
+loads the ORM object with `Repository.get_device_info_by`, modifies it and calls
+`Repository.update_device_info`.
+
+Key Classes:
+- DeviceConfig: Named tuple with the columns of the devices table.
+- DeviceConfigCache:
+  - __init__(self, session_factory): Initializes the cache (loaded on first use).
+  - get(self, name): Returns the DeviceConfig of a device, or None if there is no such device.
+  - reload(self): Reloads the table and notifies subscribers about changed devices.
+  - subscribe(self, callback): Registers callback(name, old, new) for configuration changes.
+  - unsubscribe(self, callback): Removes a callback.
+
+Dependencies:
+- threading
+- logging
+- collections
+- sqlalchemy
+- db_model
+
+Usage:
+`repository` creates one shared `DeviceConfigCache`. It is read through
+`Repository.get_device_config` and `Repository.get_device_serial_info_by`.
+"""
+import threading
+import logging
+from collections import namedtuple
+
+from sqlalchemy import select
+
+from db_model import Devices
+
+DeviceConfig = namedtuple("DeviceConfig", [column.key for column in Devices.__table__.columns])
+
+
+class DeviceConfigCache:
+    def __init__(self, session_factory):
+        """
+        Initialize the cache. The devices table is loaded on first use.
+
+        :param session_factory: Callable returning a new SQLAlchemy session
+        """
+        self.session_factory = session_factory
+        self._configs = None
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    def get(self, name):
+        """
+        Return the configuration of a device.
+
+        :param name: Device name, e.g. "Helium Analyzer"
+        :return: DeviceConfig, or None if there is no such device
+        """
+        configs = self._configs
+        if configs is None:
+            with self._lock:
+                if self._configs is None:
+                    self._configs = self._load()
+                configs = self._configs
+        return configs.get(name)
+
+    def reload(self):
+        """
+        Reload the devices table and notify the subscribers about every changed device.
+
+        :return: List of the names of the changed devices
+        """
+        with self._lock:
+            old_configs = self._configs or {}
+            self._configs = self._load()
+            new_configs = self._configs
+            subscribers = list(self._subscribers)
+
+        changed = [name for name in new_configs.keys() | old_configs.keys()
+                   if new_configs.get(name) != old_configs.get(name)]
+        if old_configs:  # Nothing to reconfigure before the first load
+            for name in changed:
+                for callback in subscribers:
+                    try:
+                        callback(name, old_configs.get(name), new_configs.get(name))
+                    except Exception as e:
+                        logging.error(f"Error occurred while applying configuration change of {name}: {str(e)}")
+        return changed
+
+    def subscribe(self, callback):
+        """Register callback(name, old, new), called after the configuration of a device changed."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """Remove a callback registered with subscribe."""
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _load(self):
+        session = self.session_factory()
+        try:
+            devices = session.scalars(select(Devices)).all()
+            return {device.name: DeviceConfig(*(getattr(device, field) for field in DeviceConfig._fields))
+                    for device in devices}
+        finally:
+            session.close()
@@ -0,0 +1,586 @@
+"""
+device_simulator.py
+
+This module emulates the devices Leakware talks to, so the acquisition, telemetry and UI paths can be
+run, load-tested and regression-tested without hardware, e.g. on a headless Linux machine.
+
+Serial devices are emulated behind a transport:
+- PtyTransport: a pseudo terminal (Linux/macOS). `transport.port` is a device path that the unchanged
+  application code opens with `serial.Serial(port=...)`, exactly like a COM port.
+- LoopbackTransport: an in-process pair of buffers. `transport.host` is a `LoopbackSerial`, an object with
+  the subset of the pyserial API Leakware uses. It works on every platform and needs no file descriptors.
+
+Emulated devices and protocols:
+- UL1000Emulator: Inficon UL1000 leak detector (`*read?`, `*start`, `*stop`, `*vent`, `*cal`,
+  `*hour:pow?`, `*stat:calh 1?`). After `*start` the leak rate decays from the vented level towards
+  the leak rate of the specimen.
+- MassFlowControllerEmulator: FMA-2619 mass flow controller (`*@=A` status frames, `*@=B` stop,
+  `*<counts>` set point).
+- HeliumAnalyzerEmulator: DiveSoft Helium Analyzer, which streams one status line per period.
+- RelaySwitchEmulator: Denkovi relay switch (`[01]` status, `[11<channel><state>]` switching).
+- SimulatedEsiLibrary: Replacement for the ESI-USB-API DLL of the GD4200 pressure gauge; pass it as
+  `PressureGauge(library=...)`, or set the environment variable LEAKWARE_SIMULATE_ESI=1 so
+  `pressure_gauge.load_library` returns it.
+
+Every emulator takes a `SimulationProfile` with the response latency, jitter, measurement noise and
+fault injection rates (dropped responses, corrupted responses, failing DLL calls).
+
+Key Classes:
+- SimulationProfile: Latency, jitter, noise and fault injection settings of an emulator.
+- PtyTransport / LoopbackTransport: Device ends of an emulated serial connection.
+- LoopbackSerial: pyserial-like host end of a LoopbackTransport.
+- SerialDeviceEmulator: Base thread answering the commands received on a transport.
+- UL1000Emulator, MassFlowControllerEmulator, HeliumAnalyzerEmulator, RelaySwitchEmulator: Device emulators.
+- SimulatedEsiLibrary: Fake ESI-USB-API library.
+
+Key Functions:
+- make_transport(kind): Creates a "pty" or "loopback" transport.
+- start_simulators(kind, profile): Starts one emulator per serial device and returns them by device name.
+- configure_devices(repository, emulators): Points the device configuration at the emulated ports.
+
+Dependencies:
+- os
+- select
+- threading
+- time
+- random
+- math
+- ctypes
+- argparse
+- logging
+- datetime
+- serial
+
+Usage:
+Run all serial emulators on pseudo terminals and print their ports (Linux/macOS):
+    python device_simulator.py [--latency 0.01] [--jitter 0.005] [--noise 0.05] [--drop-rate 0.01] [--configure]
+In Python, e.g. for a test of the leak rate poller:
+    emulator = UL1000Emulator(make_transport("loopback"))
+    emulator.start()
+    poller = LeakRatePoller(emulator.transport.host)
+"""
+import os
+import select
+import threading
+import time
+import random
+import math
+import ctypes
+import argparse
+import logging
+from datetime import datetime
+
+import serial
+
+TERMINATOR = b"\r"
+RELAY_CHANNELS = 4
+
+
+class SimulationProfile:
+    def __init__(self, latency=0.005, jitter=0.002, noise=0.02, drop_rate=0.0, garbage_rate=0.0, seed=None):
+        """
+        Behaviour of an emulated device.
+
+        :param latency: Mean delay before a response is sent, in seconds
+        :param jitter: Standard deviation of the delay, in seconds
+        :param noise: Relative standard deviation of measured values (0.02 = 2 %)
+        :param drop_rate: Probability that a response (or DLL call) is lost / fails
+        :param garbage_rate: Probability that a response is replaced by corrupted bytes
+        :param seed: Seed of the random generator, for reproducible runs
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.noise = noise
+        self.drop_rate = drop_rate
+        self.garbage_rate = garbage_rate
+        self.random = random.Random(seed)
+
+    def delay(self):
+        return max(0.0, self.random.gauss(self.latency, self.jitter))
+
+    def noisy(self, value):
+        return value * (1 + self.random.gauss(0, self.noise))
+
+    def drop(self):
+        return self.random.random() < self.drop_rate
+
+    def garble(self, response):
+        if self.random.random() >= self.garbage_rate:
+            return response
+        corrupted = bytes(self.random.randrange(33, 127) for _ in range(max(1, len(response) - 1)))
+        return corrupted + response[-1:]
+
+
+# --- Transports ---
+class PtyTransport:
+    """Pseudo terminal; the application opens `port`, the emulator uses the master end."""
+    def __init__(self):
+        import tty  # Not available on Windows, use LoopbackTransport there
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)  # No line discipline: \r must not become \n, no echo
+        os.set_blocking(self._master, False)  # A port nobody reads must not block the emulator
+        self.port = os.ttyname(self._slave)
+
+    def recv(self, timeout):
+        readable, _, _ = select.select([self._master], [], [], timeout)
+        if not readable:
+            return b""
+        try:
+            return os.read(self._master, 4096)
+        except OSError:
+            return b""  # No process has the port open (EIO)
+
+    def send(self, data):
+        try:
+            os.write(self._master, data)
+        except (BlockingIOError, OSError):
+            pass  # Output queue full or port closed; the data is lost like on a real line
+
+    def close(self):
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class LoopbackTransport:
+    """In-process connection; the application uses `host`, a pyserial-like LoopbackSerial."""
+    def __init__(self):
+        self._to_device = bytearray()
+        self._to_host = bytearray()
+        self._condition = threading.Condition()
+        self.port = "loop://"
+        self.host = LoopbackSerial(self)
+
+    def recv(self, timeout):
+        with self._condition:
+            self._condition.wait_for(lambda: self._to_device, timeout)
+            data = bytes(self._to_device)
+            self._to_device.clear()
+        return data
+
+    def send(self, data):
+        with self._condition:
+            self._to_host.extend(data)
+            self._condition.notify_all()
+
+    def close(self):
+        self.host.close()
+
+
+class LoopbackSerial:
+    """
+    Host end of a LoopbackTransport with the parts of the pyserial API used by Leakware.
+    Reads honour `timeout` like pyserial (None blocks, 0 returns immediately).
+    """
+    def __init__(self, transport):
+        self._transport = transport
+        self.timeout = 1
+        self.is_open = True
+        self.port = transport.port
+
+    def apply_settings(self, settings):
+        if "timeout" in settings:
+            self.timeout = settings["timeout"]
+
+    def write(self, data):
+        if not self.is_open:
+            raise serial.SerialException("Port is closed")
+        transport = self._transport
+        with transport._condition:
+            transport._to_device.extend(data)
+            transport._condition.notify_all()
+        return len(data)
+
+    @property
+    def in_waiting(self):
+        return len(self._transport._to_host)
+
+    def read(self, size=1):
+        return self._read(lambda line: len(line) >= size, size)
+
+    def read_until(self, expected=b"\n", size=None):
+        # Same comparison as pyserial, so a str terminator never matches and the read times out
+        return self._read(lambda line: line[-len(expected):] == expected or (size is not None and len(line) >= size),
+                          size)
+
+    def readline(self, size=None):
+        return self.read_until(b"\n", size)
+
+    def _read(self, complete, size):
+        if not self.is_open:
+            raise serial.SerialException("Port is closed")
+        transport = self._transport
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        line = bytearray()
+        with transport._condition:
+            while True:
+                while transport._to_host and not complete(line):
+                    line.append(transport._to_host.pop(0))
+                if complete(line):
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                transport._condition.wait(remaining)
+        return bytes(line)
+
+    def reset_input_buffer(self):
+        with self._transport._condition:
+            self._transport._to_host.clear()
+
+    def reset_output_buffer(self):
+        pass  # Written data is delivered immediately
+
+    flushInput = reset_input_buffer
+    flushOutput = reset_output_buffer
+
+    def close(self):
+        self.is_open = False
+
+
+def make_transport(kind="pty"):
+    """
+    Create the device end of an emulated serial connection.
+
+    :param kind: "pty" (pseudo terminal, Linux/macOS) or "loopback" (in-process)
+    """
+    if kind == "pty":
+        return PtyTransport()
+    if kind == "loopback":
+        return LoopbackTransport()
+    raise ValueError(f"Unknown transport: {kind}")
+
+
+# --- Serial device emulators ---
+class SerialDeviceEmulator(threading.Thread):
+    def __init__(self, transport, profile=None, name="SerialDeviceEmulator"):
+        """
+        Initialize the emulator. Call start() to begin answering commands.
+
+        :param transport: PtyTransport or LoopbackTransport
+        :param profile: SimulationProfile (defaults to a quiet, fault-free profile)
+        :param name: Thread name, used in log messages
+        """
+        super().__init__(name=name, daemon=True)
+        self.transport = transport
+        self.profile = profile or SimulationProfile()
+        self.commands = 0
+        self._buffer = b""
+        self._closed = threading.Event()
+
+    @property
+    def port(self):
+        return self.transport.port
+
+    def run(self):
+        while not self._closed.is_set():
+            data = self.transport.recv(0.05)
+            if data:
+                self._buffer += data
+                commands, self._buffer = self.split_commands(self._buffer)
+                for command in commands:
+                    self.commands += 1
+                    self.respond(self.handle(command))
+            self.tick(time.monotonic())
+
+    def split_commands(self, buffer):
+        """Split received bytes into complete commands; returns (commands, remaining bytes)."""
+        *commands, rest = buffer.split(TERMINATOR)
+        return [command.strip() for command in commands if command.strip()], rest
+
+    def respond(self, response):
+        if response is None:
+            return
+        if self.profile.drop():
+            logging.debug(f"{self.name}: response dropped")
+            return
+        time.sleep(self.profile.delay())
+        self.transport.send(self.profile.garble(response))
+
+    def handle(self, command):
+        """Return the response (bytes) to a command, or None if the device does not answer."""
+        return None
+
+    def tick(self, now):
+        """Called about every 50 ms, for devices that send data on their own."""
+
+    def close(self, timeout=1):
+        self._closed.set()
+        if self.is_alive():
+            self.join(timeout)
+        self.transport.close()
+
+
+class UL1000Emulator(SerialDeviceEmulator):
+    def __init__(self, transport, profile=None, leak_rate=2e-9, vented_leak_rate=1e-3, pump_down_time=3.0,
+                 power_on_minutes=30, calibration_factor=1.02):
+        """
+        Emulate an Inficon UL1000 leak detector.
+
+        :param leak_rate: Leak rate of the specimen (mbar*l/s) reached after pumping down
+        :param vented_leak_rate: Leak rate reported while vented / in standby
+        :param pump_down_time: Time constant of the decay after *start, in seconds
+        :param power_on_minutes: Answer to *hour:pow?
+        :param calibration_factor: Answer to *stat:calh 1?
+        """
+        super().__init__(transport, profile, name="UL1000Emulator")
+        self.leak_rate = leak_rate
+        self.vented_leak_rate = vented_leak_rate
+        self.pump_down_time = pump_down_time
+        self.power_on_minutes = power_on_minutes
+        self.calibration_factor = calibration_factor
+        self.started_at = None
+
+    def current_leak_rate(self):
+        if self.started_at is None:
+            level = self.vented_leak_rate
+        else:
+            elapsed = time.monotonic() - self.started_at
+            level = self.leak_rate + (self.vented_leak_rate - self.leak_rate) * math.exp(-elapsed / self.pump_down_time)
+        return abs(self.profile.noisy(level))
+
+    def handle(self, command):
+        command = command.lower()
+        if command == b"*read?":
+            return f"{self.current_leak_rate():.2E}".encode() + TERMINATOR
+        if command == b"*start":
+            self.started_at = time.monotonic()
+        elif command in (b"*stop", b"*vent"):
+            self.started_at = None
+        elif command == b"*cal":
+            self.started_at = None
+        elif command == b"*hour:pow?":
+            return f"{self.power_on_minutes}\r\n".encode()
+        elif command == b"*stat:calh 1?":
+            return f"calh 1 {self.calibration_factor:.2f}\r\n".encode()
+        else:
+            logging.info(f"{self.name}: unknown command {command!r}")
+        return None
+
+
+class MassFlowControllerEmulator(SerialDeviceEmulator):
+    FULL_SCALE_COUNTS = 64000
+    FULL_SCALE_SCCM = 500
+
+    def __init__(self, transport, profile=None, pressure=14.7, temperature=25.0, setpoint_sccm=71.5):
+        """
+        Emulate an FMA-2619 mass flow controller.
+
+        :param pressure: Pressure reported in the status frame, in psia
+        :param temperature: Gas temperature reported in the status frame, in °C
+        :param setpoint_sccm: Initial set point in sccm
+        """
+        super().__init__(transport, profile, name="MassFlowControllerEmulator")
+        self.pressure = pressure
+        self.temperature = temperature
+        self.setpoint_sccm = setpoint_sccm
+        self.flowing = True
+
+    def handle(self, command):
+        if command == b"*@=A":
+            flow = self.profile.noisy(self.setpoint_sccm) if self.flowing else 0.0
+            frame = (f"A {self.profile.noisy(self.pressure):+07.2f} {self.profile.noisy(self.temperature):+07.2f} "
+                     f"{flow:+07.2f} {flow:+07.2f} He")
+            return frame.encode() + TERMINATOR
+        if command == b"*@=B":
+            self.flowing = False
+            return b"OK\r\n"
+        try:
+            counts = float(command[1:])
+        except ValueError:
+            logging.info(f"{self.name}: unknown command {command!r}")
+            return None
+        self.setpoint_sccm = counts * self.FULL_SCALE_SCCM / self.FULL_SCALE_COUNTS
+        self.flowing = True
+        return None
+
+
+class HeliumAnalyzerEmulator(SerialDeviceEmulator):
+    def __init__(self, transport, profile=None, helium=98.5, oxygen=0.3, temperature=23.0, pressure=1013.0, period=1.0):
+        """
+        Emulate a DiveSoft Helium Analyzer, which sends one status line per period.
+
+        :param helium: Helium concentration in %
+        :param oxygen: Oxygen concentration in %
+        :param temperature: Temperature in °C
+        :param pressure: Ambient pressure in hPa
+        :param period: Seconds between two lines
+        """
+        super().__init__(transport, profile, name="HeliumAnalyzerEmulator")
+        self.helium = helium
+        self.oxygen = oxygen
+        self.temperature = temperature
+        self.pressure = pressure
+        self.period = period
+        self._next_line = 0.0
+
+    def tick(self, now):
+        if now < self._next_line:
+            return
+        self._next_line = now + self.period
+        helium = min(100.0, self.profile.noisy(self.helium))
+        line = (f"He {helium:.2f} % O2 {self.profile.noisy(self.oxygen):.2f} % Ti {self.profile.noisy(self.temperature):.2f} ~C "
+                f"{self.profile.noisy(self.pressure):.2f} hPa {datetime.now():%Y/%m/%d %H:%M:%S}\r\n")
+        self.respond(line.encode())
+
+
+class RelaySwitchEmulator(SerialDeviceEmulator):
+    def __init__(self, transport, profile=None):
+        """Emulate a 4 channel Denkovi relay switch; commands are framed as [..]."""
+        super().__init__(transport, profile, name="RelaySwitchEmulator")
+        self.states = [0] * RELAY_CHANNELS
+
+    def split_commands(self, buffer):
+        commands = []
+        while b"]" in buffer:
+            frame, buffer = buffer.split(b"]", 1)
+            start = frame.rfind(b"[")
+            if start >= 0:
+                commands.append(frame[start + 1:])
+        return commands, buffer
+
+    def handle(self, command):
+        if command == b"\x01":
+            return b"[" + bytes(self.states)
+        if command[:1] == b"\x11" and len(command) == 4:
+            channel, state = int(command[1:3]), int(command[3:4])
+            if 1 <= channel <= RELAY_CHANNELS and state in (0, 1):
+                self.states[channel - 1] = state
+                return b"[\x11" + bytes([channel, state]) + b"]"
+        logging.info(f"{self.name}: unknown command {command!r}")
+        return None
+
+
+# --- ESI-USB-API (pressure gauge DLL) ---
+class SimulatedEsiLibrary:
+    """
+    Fake ESI-USB-API library with the functions used by pressure_gauge.PressureGauge.
+    Output arguments are passed with ctypes.byref, like to the real DLL.
+    """
+    OK = 0
+    FAIL = -1
+
+    def __init__(self, profile=None, pressure=30.0, temperature=22.0, sensors=1, serial_number="SIM-GD4200"):
+        """
+        :param profile: SimulationProfile; drop_rate is the probability that Read fails, latency applies per call
+        :param pressure: Pressure in bar
+        :param temperature: Temperature in °C
+        :param sensors: Number of connected sensors
+        :param serial_number: Serial number reported by GetSensorInfo
+        """
+        self.profile = profile or SimulationProfile()
+        self.pressure = pressure
+        self.temperature = temperature
+        self.sensors = sensors
+        self.serial_number = serial_number
+        self.used = set()
+
+    def FindSensors(self, count):
+        count._obj.value = self.sensors
+        return self.OK
+
+    def GetSensorInfo(self, index, port_number, serial_number, length):
+        if index >= self.sensors:
+            return self.FAIL
+        port_number._obj.value = index + 1
+        ctypes.memmove(serial_number, self.serial_number.encode()[:length - 1], min(len(self.serial_number), length - 1))
+        return self.OK
+
+    def UseSensor(self, index):
+        if index >= self.sensors:
+            return self.FAIL
+        self.used.add(index)
+        return self.OK
+
+    def Read(self, index, unit, mode, timeout, pressure):
+        time.sleep(self.profile.delay())
+        if index not in self.used or self.profile.drop():
+            return self.FAIL
+        pressure._obj.value = self.profile.noisy(self.pressure)
+        return self.OK
+
+    def ReadTemperature(self, index, unit, temperature):
+        if index not in self.used:
+            return self.FAIL
+        temperature._obj.value = self.profile.noisy(self.temperature)
+        return self.OK
+
+    def ReleaseSensor(self, index):
+        self.used.discard(index)
+        return self.OK
+
+    def CleanUp(self):
+        self.used.clear()
+        return self.OK
+
+
+# Device name (as in the devices table) -> emulator class
+EMULATORS = {
+    "Leak Detector": UL1000Emulator,
+    "Mass Flow Controller": MassFlowControllerEmulator,
+    "Helium Analyzer": HeliumAnalyzerEmulator,
+    "Relay Switch": RelaySwitchEmulator,
+}
+
+
+def start_simulators(kind="pty", profile=None):
+    """
+    Start one emulator per serial device.
+
+    :param kind: Transport, "pty" or "loopback"
+    :param profile: SimulationProfile shared by the emulators
+    :return: Dict device name -> running emulator
+    """
+    emulators = {}
+    for name, emulator_class in EMULATORS.items():
+        emulator = emulator_class(make_transport(kind), profile)
+        emulator.start()
+        emulators[name] = emulator
+    return emulators
+
+
+def configure_devices(repository, emulators):
+    """Point the device configuration at the emulated ports and mark the devices as available."""
+    for name, emulator in emulators.items():
+        device = repository.get_device_info_by(name)
+        if device is None:
+            continue
+        device.port = emulator.port
+        device.is_available = True
+    repository.update_device_info()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate the Leakware serial devices on pseudo terminals.")
+    parser.add_argument("--latency", type=float, default=0.005, help="Mean response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.002, help="Standard deviation of the delay in seconds")
+    parser.add_argument("--noise", type=float, default=0.02, help="Relative noise of measured values")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Probability of a lost response")
+    parser.add_argument("--garbage-rate", type=float, default=0.0, help="Probability of a corrupted response")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--configure", action="store_true", help="Store the emulated ports in the devices table")
+    args = parser.parse_args()
+
+    profile = SimulationProfile(args.latency, args.jitter, args.noise, args.drop_rate, args.garbage_rate, args.seed)
+    emulators = start_simulators("pty", profile)
+    for name, emulator in emulators.items():
+        print(f"{name:<22} {emulator.port}")
+    if args.configure:
+        from repository import Repository
+        repository = Repository()
+        configure_devices(repository, emulators)
+        repository.close_session()
+        print("Device configuration updated")
+    print("Press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for emulator in emulators.values():
+            emulator.close()
+
+
+if __name__ == "__main__":
+    main()
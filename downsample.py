@@ -0,0 +1,70 @@
+"""
+downsample.py
+
+This module reduces long leak rate traces to a number of points bounded by the width of the
+plot in pixels, so rendering cost no longer grows with test length. The trace is split into
+equal-sized buckets (about one per pixel column) and the minimum and the maximum of each bucket
+are kept in their original order. Leak spikes therefore survive downsampling, unlike with
+plain decimation.
+
+Missing samples (NaN) are ignored when picking the minimum and maximum. The first missing sample
+of a bucket is kept as well, so gaps in the trace stay visible.
+
+Key Functions:
+- minmax_downsample(x, y, buckets): Returns the min/max-preserving subset of a trace.
+- axes_pixel_width(axes): Returns the width of matplotlib axes in pixels.
+
+Dependencies:
+- numpy
+
+Usage:
+This module is typically imported by the plotting code (live plot, comparison window and PDF
+report), which calls `minmax_downsample(x, y, axes_pixel_width(axes))` before plotting.
+"""
+import numpy as np
+
+DEFAULT_BUCKETS = 700  # Roughly the width of the graph canvas in pixels
+
+
+def minmax_downsample(x, y, buckets=DEFAULT_BUCKETS):
+    """
+    Return the subset of a trace that keeps the minimum and maximum of every bucket.
+
+    :param x: Sample times (sequence or numpy array)
+    :param y: Leak rates, NaN for missing samples (sequence or numpy array)
+    :param buckets: Number of buckets, typically the plot width in pixels
+    :return: Tuple of numpy arrays (x, y) with at most about 3 * buckets points
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    count = y.size
+    buckets = int(buckets)
+    if buckets <= 0 or count <= 2 * buckets:
+        return x, y
+
+    size = -(-count // buckets)  # Samples per bucket, rounded up
+    buckets = -(-count // size)
+    padding = buckets * size - count
+    blocks = np.concatenate((y, np.full(padding, np.nan))).reshape(buckets, size)
+    missing = np.isnan(blocks)
+
+    offsets = np.arange(buckets) * size
+    lowest = np.where(missing, np.inf, blocks).argmin(axis=1)
+    highest = np.where(missing, -np.inf, blocks).argmax(axis=1)
+
+    if padding:
+        missing[-1, size - padding:] = False  # Padding is not a gap in the trace
+    gaps = missing.any(axis=1)
+    first_gap = missing.argmax(axis=1)[gaps] + offsets[gaps]
+
+    indices = np.unique(np.concatenate((lowest + offsets, highest + offsets, first_gap)))
+    return x[indices], y[indices]
+
+
+def axes_pixel_width(axes):
+    """
+    Return the width of matplotlib axes in pixels (at least 1).
+
+    :param axes: Matplotlib axes
+    """
+    return max(1, int(axes.bbox.width))
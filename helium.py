@@ -1,72 +1,149 @@
 """
 helium.py
 
-This module provides functionality to read and process data from the Helium Analyzer.
-It likely interacts with the Helium Analyzer device through serial communication or
-other appropriate interfaces.
+This module provides functionality to read and process data from the DiveSoft Helium Analyzer.
+The analyzer streams one line per reading over a serial port, e.g.
+"He 99.5 % O2 0.1 % Ti 23.4 ~C 1013.2 hPa 2024/05/01 12:00:00".
+
+A long-lived `HeliumAnalyzerReader` thread keeps the port open, parses every line with a
+precompiled regular expression and publishes the latest reading into a thread-safe cache.
+Consumers such as `main_page.poll_helium` read that cache in O(1) instead of blocking on the device.
+
+Key Classes:
+- HeliumReading: Named tuple with helium, oxygen, temperature, pressure, device_time, received_at.
+- HeliumAnalyzerReader:
+  - __init__(self, port, baudrate): Initializes the reader for the given serial port.
+  - latest(self, max_age=None): Returns the latest reading (or None if none / too old).
+  - close(self): Stops the reader thread and closes the port.
 
 Key Functions:
-- read_data_from_helium(repository, root): Function to read and process data from the Helium Analyzer.
+- parse_data(data): Parses one line from the analyzer into a HeliumReading.
 
 Dependencies:
-- The specific dependencies for this module are not provided, but it may rely on libraries
-  for serial communication, data processing, and potentially tkinter for GUI-related functionality.
+- serial
+- re
+- threading
+- time
+- logging
+- log_pipeline
+- collections
 
 Usage:
-This module is typically imported, and the `read_data_from_helium` function is called
-when the application needs to read and process data from the Helium Analyzer.
-The function likely takes the Repository object and the root Tkinter window as arguments
-for database interaction and potential GUI updates.
+`main_page.poll_helium`, the poll function of the Helium Analyzer task of the `SensorScheduler`,
+starts one `HeliumAnalyzerReader` when the Helium Analyzer is available and reads `latest()` on
+every poll.
 """
-import serial.tools.list_ports
-from tkinter import messagebox
 import serial
 import re
+import threading
+import time
 import logging
+from collections import namedtuple
+
+from log_pipeline import CONSOLE
+
+HELIUM_PATTERN = re.compile(
+    r"He\s+(\d+\.\d+)\s*%\s*O2\s+(\d+\.\d+)\s*%\s*Ti\s+(\d+\.\d+)\s*~C\s+(\d+\.\d+)\s*hPa\s+"
+    r"(\d{4}/\d{2}/\d{2}\s+\d{2}:\d{2}:\d{2})"
+)
+RECONNECT_DELAY = 2  # Seconds to wait before reopening the port after an error
+DEFAULT_MAX_AGE = 5  # Readings older than this (seconds) are considered stale
+
+HeliumReading = namedtuple(
+    "HeliumReading",
+    ["helium", "oxygen", "temperature", "pressure", "device_time", "received_at"]
+)
+
+
+def parse_data(data):
+    """
+    Parse one line received from the Helium Analyzer.
+
+    :param data: Decoded line
+    :return: HeliumReading, or None if the line does not match the expected format
+    """
+    match = HELIUM_PATTERN.search(data)
+    if not match:
+        return None
+    return HeliumReading(
+        helium=float(match.group(1)),
+        oxygen=float(match.group(2)),
+        temperature=float(match.group(3)),
+        pressure=float(match.group(4)),
+        device_time=match.group(5),
+        received_at=time.monotonic()
+    )
+
+
+class HeliumAnalyzerReader(threading.Thread):
+    def __init__(self, port, baudrate):
+        """
+        Initialize the Helium Analyzer reader. Call start() to begin reading.
+
+        :param port: Serial port of the Helium Analyzer
+        :param baudrate: Baudrate of the Helium Analyzer
+        """
+        super().__init__(name="HeliumAnalyzerReader", daemon=True)
+        self.port = port
+        self.baudrate = int(baudrate)
+        self._latest = None
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._serial = None
+
+    def run(self):
+        if not self.port:
+            logging.warning("No COM Port specified for Helium Analyzer, reader not started")
+            return
+        while not self._closed.is_set():
+            try:
+                self._serial = serial.Serial(self.port, self.baudrate, timeout=1)
+                logging.info(f"Helium Analyzer opened on {self.port}")
+                self._read_lines()
+            except serial.SerialException as e:
+                logging.info(f"Serial Exception Occurred: {str(e)}, while reading Helium Analyzer", extra=CONSOLE)
+            finally:
+                self._close_port()
+            self._closed.wait(RECONNECT_DELAY)
+
+    def _read_lines(self):
+        while not self._closed.is_set():
+            line = self._serial.readline()  # Returns b"" after the 1 s timeout, so close() is noticed
+            if not line:
+                continue
+            data = line.decode(errors="replace").strip()
+            reading = parse_data(data)
+            if reading is None:
+                logging.info(f"Invalid data format received from Helium Analyzer: {data}")
+                continue
+            with self._lock:
+                self._latest = reading
+
+    def latest(self, max_age=DEFAULT_MAX_AGE):
+        """
+        Return the latest reading.
+
+        :param max_age: Maximum age in seconds, None to accept any age
+        :return: HeliumReading, or None if there is no reading or it is older than max_age
+        """
+        with self._lock:
+            reading = self._latest
+        if reading is None:
+            return None
+        if max_age is not None and time.monotonic() - reading.received_at > max_age:
+            return None
+        return reading
+
+    def close(self, timeout=2):
+        """Stop the reader thread and close the port."""
+        self._closed.set()
+        if self.is_alive():
+            self.join(timeout)
 
-def read_data_from_helium(repository, root):
-    logging.info("Enter into read data from helium")
-
-    def read_from_serial(ser):
-        try:
-            if ser.in_waiting > 0:
-                data = ser.readline().decode().strip()
-                parse_data(data, root)
-            read_from_serial(ser)
-        except serial.SerialException as e:
-            logging.info(f"Serial Exception Occurred: {str(e)}, while reading Helium Analyzer")
-            print(f"Serial Exception Occurred: {str(e)}, while reading Helium Analyzer")
-            messagebox.showerror("Error", "Helium Analyzer Port disconnected.", parent=root)
-
-    helium_analyzer_config = repository.get_device_info_by('Helium Analyzer')
-    port = helium_analyzer_config.port
-    if port:
-        try:
-            baud_rate = helium_analyzer_config.baudrate
-            ser = serial.Serial(port, baud_rate)
-            read_from_serial(ser)
-        except serial.SerialException as e:
-            logging.info(f"Serial Exception Occurred: {str(e)}, while reading Helium Analyzer")
-            print(f"Serial Exception Occurred: {str(e)}, while reading Helium Analyzer")
-            messagebox.showerror("Error", "Failed to open Helium Analyzer.", parent=root)
-    else:
-        messagebox.showwarning("Warning", "Please specify a COM Port for Helium Analyzer.", parent=root)
-
-    def parse_data(self, data, root):
-        # Define regular expression pattern to match required values
-        pattern = r"He\s+(\d+\.\d+)\s*%\s*O2\s+(\d+\.\d+)\s*%\s*Ti\s+(\d+\.\d+)\s*~C\s+(\d+\.\d+)\s*hPa\s+(\d{4}/\d{2}/\d{2}\s+\d{2}:\d{2}:\d{2})"
-
-        # Match the pattern in the data string
-        match = re.search(pattern, data)
-        if match:
-            # Extract values from the matched groups
-            he_value = match.group(1)
-            O2_value = match.group(2)
-            Ti_value = match.group(3)
-            hPa_value = match.group(4)
-            timestamp = match.group(5)
-            logging.info("Received: {}\n".format(data))
-            return he_value
-        else:
-            messagebox.showwarning("Warning", "Invalid data format.", parent=root)
-            return 0
\ No newline at end of file
+    def _close_port(self):
+        if self._serial is not None:
+            try:
+                self._serial.close()
+            except serial.SerialException as e:
+                logging.info(f"Serial Exception Occurred: {str(e)}, while closing Helium Analyzer")
+            self._serial = None
@@ -0,0 +1,290 @@
+"""
+instrumentation.py
+
+This module measures where the time goes during a measurement. Named stages (serial round trip,
+database commit, results table, live plot frames, sensor polls) are timed with a context manager,
+a decorator or an explicit `record` call, and every stage feeds a log-bucketed histogram.
+
+The histograms work like HDR histograms: each power of two of the duration (in nanoseconds) is
+split into `SUB_BUCKETS` linear buckets, so every recorded value is kept with a relative error
+below 1 / SUB_BUCKETS (about 3 %) at constant memory, no matter how many samples are recorded.
+
+Instrumentation is off by default and costs one flag check per call when off: `stage` then returns
+a shared no-op context manager and `record` returns at once. It is switched on with the environment
+variable `LEAKWARE_INSTRUMENTATION=1`, with `enable()`, or by opening the debug window.
+
+Key Functions:
+- enable(), disable(): Switches recording on or off.
+- stage(name): Context manager timing the enclosed block.
+- timed(name): Decorator timing every call of a function.
+- record(name, seconds): Records a duration that was measured elsewhere.
+- snapshot(): Returns count, min, mean, p50, p95, p99 and max (ms) per stage.
+- format_snapshot(stats): Formats a snapshot as a text table.
+- dump(path): Writes a snapshot to a JSON file.
+- reset(): Clears all histograms.
+- show_window(tk, root): Opens a debug window with the live statistics.
+
+Key Classes:
+- Histogram: Log-bucketed latency histogram of one stage.
+
+Dependencies:
+- os
+- json
+- math
+- time
+- threading
+- functools
+- contextlib
+- datetime
+
+Usage:
+    with instrumentation.stage("db.create_table_commit"):
+        ...
+
+    @instrumentation.timed("leak_detector.read")
+    def read():
+        ...
+`main_page` opens the debug window with F12 and dumps the statistics to `DUMP_FILE` when it is closed.
+"""
+import os
+import json
+import math
+import time
+import threading
+import functools
+from contextlib import nullcontext
+from datetime import datetime
+
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS  # Linear buckets per power of two
+PERCENTILES = (50, 95, 99)
+DUMP_FILE = "instrumentation.json"
+WINDOW_REFRESH_MS = 1000
+
+enabled = os.environ.get("LEAKWARE_INSTRUMENTATION", "") not in ("", "0")
+
+_NULL_STAGE = nullcontext()
+_histograms = {}
+_registry_lock = threading.Lock()
+
+
+def bucket_index(nanoseconds):
+    if nanoseconds < 1:
+        return 0
+    mantissa, exponent = math.frexp(nanoseconds)  # nanoseconds = mantissa * 2 ** exponent, 0.5 <= mantissa < 1
+    return exponent * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+
+
+def bucket_value(index):
+    # Midpoint of the bucket, in nanoseconds
+    exponent, sub_bucket = divmod(index, SUB_BUCKETS)
+    return math.ldexp(0.5 + (sub_bucket + 0.5) / (2 * SUB_BUCKETS), exponent)
+
+
+class Histogram:
+    def __init__(self, name):
+        """
+        Initialize an empty histogram.
+
+        :param name: Name of the stage
+        """
+        self.name = name
+        self.counts = {}  # Bucket index -> number of values
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self._lock = threading.Lock()
+
+    def record(self, nanoseconds):
+        """
+        Add a duration.
+
+        :param nanoseconds: Duration in nanoseconds
+        """
+        index = bucket_index(nanoseconds)
+        with self._lock:
+            self.counts[index] = self.counts.get(index, 0) + 1
+            self.count += 1
+            self.total += nanoseconds
+            if self.min is None or nanoseconds < self.min:
+                self.min = nanoseconds
+            if nanoseconds > self.max:
+                self.max = nanoseconds
+
+    def percentile(self, percent):
+        """Return the duration (ns) below which `percent` % of the values lie."""
+        with self._lock:
+            counts = sorted(self.counts.items())
+            count, low, high = self.count, self.min, self.max
+        if not count:
+            return 0
+        rank = max(1, math.ceil(count * percent / 100))
+        seen = 0
+        for index, bucket_count in counts:
+            seen += bucket_count
+            if seen >= rank:
+                return min(max(bucket_value(index), low), high)
+        return high
+
+    def stats(self):
+        """Return count, min, mean, percentiles and max in milliseconds."""
+        with self._lock:
+            count, total, low, high = self.count, self.total, self.min, self.max
+        result = {"count": count, "min_ms": (low or 0) / 1e6, "mean_ms": total / count / 1e6 if count else 0.0}
+        for percent in PERCENTILES:
+            result[f"p{percent}_ms"] = self.percentile(percent) / 1e6
+        result["max_ms"] = high / 1e6
+        return result
+
+
+class _Stage:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.record(time.perf_counter_ns() - self.started)
+        return False
+
+
+def histogram(name):
+    """Return the histogram of a stage, created on first use."""
+    found = _histograms.get(name)
+    if found is None:
+        with _registry_lock:
+            found = _histograms.setdefault(name, Histogram(name))
+    return found
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def stage(name):
+    """
+    Time the enclosed block as one value of stage `name` (a no-op while disabled).
+
+    :param name: Name of the stage, e.g. "db.create_table_commit"
+    """
+    if not enabled:
+        return _NULL_STAGE
+    return _Stage(histogram(name))
+
+
+def timed(name):
+    """
+    Decorator timing every call of the decorated function as stage `name`.
+
+    :param name: Name of the stage
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            started = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram(name).record(time.perf_counter_ns() - started)
+        return wrapper
+    return decorate
+
+
+def record(name, seconds):
+    """
+    Record a duration measured elsewhere, e.g. the duration of a sensor poll.
+
+    :param name: Name of the stage
+    :param seconds: Duration in seconds
+    """
+    if enabled:
+        histogram(name).record(int(seconds * 1e9))
+
+
+def snapshot():
+    """
+    Return the statistics of all stages.
+
+    :return: Dict stage name -> dict with count, min_ms, mean_ms, p50_ms, p95_ms, p99_ms and max_ms
+    """
+    with _registry_lock:
+        histograms = list(_histograms.values())
+    return {item.name: item.stats() for item in sorted(histograms, key=lambda item: item.name)}
+
+
+def format_snapshot(stats):
+    """Format a snapshot as a text table."""
+    lines = [f"{'stage':<34}{'count':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+    for name, values in stats.items():
+        lines.append(f"{name:<34}{values['count']:>9}{values['p50_ms']:>10.3f}{values['p95_ms']:>10.3f}"
+                     f"{values['p99_ms']:>10.3f}{values['max_ms']:>10.3f}")
+    return "\n".join(lines)
+
+
+def dump(path=DUMP_FILE):
+    """
+    Write a snapshot of all stages to a JSON file.
+
+    :param path: Output file
+    :return: The snapshot that was written
+    """
+    stats = snapshot()
+    with open(path, "w") as file:
+        json.dump({"created_at": datetime.now().isoformat(timespec="seconds"), "stages": stats}, file, indent=2)
+    return stats
+
+
+def reset():
+    """Clear all histograms."""
+    with _registry_lock:
+        _histograms.clear()
+
+
+def show_window(tk, root):
+    """
+    Open a debug window showing the statistics of all stages, refreshed every second.
+    Recording is switched on while the window is open, unless it was already on.
+
+    :param tk: tkinter module
+    :param root: Parent window
+    """
+    was_enabled = enabled
+    enable()
+
+    window = tk.Toplevel(root)
+    window.title("Instrumentation")
+    text = tk.Text(window, font=("Courier", 9), width=84, height=20)
+    text.pack(fill="both", expand=True)
+    buttons = tk.Frame(window)
+    buttons.pack(fill="x")
+    tk.Button(buttons, text="Reset", command=reset).pack(side="left")
+    tk.Button(buttons, text=f"Save to {DUMP_FILE}", command=dump).pack(side="left")
+
+    def refresh():
+        if not window.winfo_exists():
+            return
+        text.delete("1.0", "end")
+        text.insert("1.0", format_snapshot(snapshot()))
+        window.after(WINDOW_REFRESH_MS, refresh)
+
+    def on_close():
+        if not was_enabled:
+            disable()
+        window.destroy()
+
+    window.protocol("WM_DELETE_WINDOW", on_close)
+    refresh()
+    return window
@@ -0,0 +1,252 @@
+"""
+leak_detector.py
+
+This module contains the polling engine for the Inficon UL1000 leak detector. It replaces the
+fixed `time.sleep(0.1)` between `*read?` and `readline()` with a read that waits on the `\r`
+terminator under an adaptive deadline, and paces requests to an operator-selected sample rate.
+
+At most one `*read?` request is in flight at any time. When the next request is already due
+when a response arrives, it is sent immediately (pipelined), so the device works on the next
+sample while the caller processes the current one.
+
+When a response misses the deadline, the deadline is doubled (up to MAX_DEADLINE), so a device
+that slowed down is followed within a few samples. The late response still arrives; before the
+next request is sent it is read and discarded, so it is never taken for the next sample.
+
+Key Classes:
+- LeakRatePoller:
+  - set_port(self, port): Sets the serial port used for polling and drops any pending request.
+  - set_sample_rate(self, sample_rate): Changes the target sample rate in Hz.
+  - poll(self): Returns the next leak rate sample (blocking until it arrives).
+  - read_sample(self): Like poll, but with bounded retries; returns MISSING_SAMPLE on failure.
+  - cancel(self): Drops the outstanding request and clears the input buffer.
+  - achieved_rate: Sample rate actually achieved over the last samples, in Hz.
+  - request_pending: True while a `*read?` request is in flight.
+
+Dependencies:
+- time
+- collections
+- logging
+- serial
+
+Usage:
+An instance of `LeakRatePoller` is created by the `AcquisitionService` in `acquisition_service`. Its
+`read_sample` method is called by the acquisition worker; the port is assigned each time a measurement
+is started.
+"""
+import time
+import logging
+from collections import deque
+
+import serial
+
+READ_COMMAND = b"*read?\r"
+TERMINATOR = b"\r"
+
+SAMPLE_RATES = (5, 10, 20, 50)  # Rates the operator can choose from, in Hz
+DEFAULT_SAMPLE_RATE = 10
+
+MIN_DEADLINE = 0.02  # Lower bound for the response deadline, in seconds
+MAX_DEADLINE = 1.0  # Upper bound for the response deadline, in seconds
+DEADLINE_FACTOR = 4  # Deadline as multiple of the smoothed round trip time
+RTT_SMOOTHING = 0.125  # Weight of a new round trip time in the moving average
+RATE_WINDOW = 50  # Number of samples the achieved rate is computed over
+
+MISSING_SAMPLE = float("nan")  # Marker pushed into the data stream for a sample that could not be read
+MAX_ATTEMPTS = 5  # Read attempts per sample
+SAMPLE_DEADLINE = 2.0  # Time budget per sample including retries, in seconds
+INITIAL_BACKOFF = 0.01  # Delay before the first retry, in seconds
+MAX_BACKOFF = 0.2  # Upper bound for the delay between retries, in seconds
+
+
+class LeakRatePoller:
+    def __init__(self, port=None, sample_rate=DEFAULT_SAMPLE_RATE):
+        """
+        Initialize the poller.
+
+        :param port: Open serial port of the leak detector (optional, see set_port)
+        :param sample_rate: Target sample rate in Hz
+        """
+        self.port = None
+        self.sample_rate = DEFAULT_SAMPLE_RATE
+        self._smoothed_rtt = None
+        self._applied_timeout = None
+        self._pending_since = None  # Send time of the outstanding request, None if idle
+        self._late_responses = 0  # Timed-out requests whose response may still arrive
+        self._next_due = 0.0
+        self._sample_times = deque(maxlen=RATE_WINDOW)
+        self.set_sample_rate(sample_rate)
+        self.set_port(port)
+
+    def set_port(self, port):
+        """
+        Set the serial port used for polling.
+
+        :param port: Open serial port of the leak detector
+        """
+        if port is not self.port:
+            self.port = port
+            self._applied_timeout = None
+            self._pending_since = None
+            self._late_responses = 0
+            self._sample_times.clear()
+
+    def set_sample_rate(self, sample_rate):
+        """
+        Change the target sample rate.
+
+        :param sample_rate: Target sample rate in Hz, must be positive
+        """
+        sample_rate = float(sample_rate)
+        if sample_rate <= 0:
+            logging.error(f"Invalid sample rate: {sample_rate}. Keeping {self.sample_rate} Hz.")
+            return
+        self.sample_rate = sample_rate
+        self._sample_times.clear()
+
+    @property
+    def deadline(self):
+        """Current response deadline in seconds, derived from the smoothed round trip time."""
+        if self._smoothed_rtt is None:
+            return MAX_DEADLINE
+        return min(MAX_DEADLINE, max(MIN_DEADLINE, self._smoothed_rtt * DEADLINE_FACTOR))
+
+    @property
+    def request_pending(self):
+        """True while a `*read?` request is in flight (e.g. the pipelined request for the next sample)."""
+        return self._pending_since is not None
+
+    @property
+    def achieved_rate(self):
+        """Sample rate actually achieved over the last samples in Hz, 0 if unknown."""
+        if len(self._sample_times) < 2:
+            return 0.0
+        span = self._sample_times[-1] - self._sample_times[0]
+        if span <= 0:
+            return 0.0
+        return (len(self._sample_times) - 1) / span
+
+    def poll(self):
+        """
+        Return the next leak rate sample.
+
+        Waits until the next request is due, sends it unless one is already in flight, and
+        reads the response up to the `\r` terminator.
+
+        :return: Leak rate in mbar*l/s
+        :raises serial.SerialException: If the port fails or no complete response arrives
+        :raises ValueError: If the response is not a number
+        """
+        if self.port is None:
+            raise serial.SerialException("Leak detector port is not open")
+
+        if self._pending_since is None:
+            delay = self._next_due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._send_request()
+
+        sent_at = self._pending_since
+        self._pending_since = None
+        self._apply_timeout()
+        response = self.port.read_until(TERMINATOR)
+        received_at = time.monotonic()
+
+        if not response.endswith(TERMINATOR):
+            # Incomplete response; the late remainder is discarded before the next request
+            deadline = self.deadline
+            self.port.reset_input_buffer()
+            self._late_responses += 1
+            self._back_off()
+            raise serial.SerialException(f"No response to *read? within {deadline:.3f} s")
+
+        self._update_rtt(received_at - sent_at)
+        value = float(response.decode(errors="replace").strip())
+        self._sample_times.append(received_at)
+
+        # Pipeline the next request if it is already due
+        if self._next_due <= received_at:
+            self._send_request()
+        return value
+
+    def read_sample(self):
+        """
+        Return the next leak rate sample, retrying failed reads in a bounded loop.
+
+        Failed attempts (serial errors, garbage, non-positive values) are retried with
+        exponential backoff until MAX_ATTEMPTS or SAMPLE_DEADLINE is reached.
+
+        :return: Leak rate in mbar*l/s, or MISSING_SAMPLE if no valid value could be read
+        """
+        deadline = time.monotonic() + SAMPLE_DEADLINE
+        backoff = INITIAL_BACKOFF
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                value = self.poll()
+                if value > 0:
+                    return value
+                error = f"Invalid leak rate received: {value}"
+            except serial.SerialException as e:
+                error = f"Serial communication error occurred: {str(e)}"
+            except ValueError as v:
+                error = f"Invalid response received: {str(v)}"
+            logging.info(f"{error}, while reading leak rate (attempt {attempt}/{MAX_ATTEMPTS})")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(backoff, remaining))
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+        logging.warning(f"No valid leak rate received after {attempt} attempt(s), recording a missing sample")
+        return MISSING_SAMPLE
+
+    def cancel(self):
+        """Drop the outstanding request, e.g. before sending *stop, and clear the input buffer."""
+        self._pending_since = None
+        self._late_responses = 0
+        if self.port is not None:
+            try:
+                self.port.reset_input_buffer()
+            except serial.SerialException as e:
+                logging.info(f"Serial Exception occurred: {str(e)}, while cancelling leak rate request")
+
+    def _send_request(self):
+        self._discard_late_responses()
+        now = time.monotonic()
+        self.port.write(READ_COMMAND)
+        self._pending_since = now
+        # Schedule on a fixed grid; if we fell behind, restart the grid instead of bursting
+        self._next_due += 1.0 / self.sample_rate
+        if self._next_due < now:
+            self._next_due = now + 1.0 / self.sample_rate
+
+    def _apply_timeout(self):
+        # Reconfiguring the port is not free, so only do it when the deadline moved noticeably
+        deadline = self.deadline
+        if self._applied_timeout is None or abs(deadline - self._applied_timeout) > 0.2 * self._applied_timeout:
+            self.port.timeout = deadline
+            self._applied_timeout = deadline
+
+    def _discard_late_responses(self):
+        # A response to a timed-out request may still be on its way; wait for it (at most one deadline
+        # each) so it is not read as the response to the request sent next
+        if self._late_responses:
+            self._apply_timeout()
+            while self._late_responses:
+                self._late_responses -= 1
+                if not self.port.read_until(TERMINATOR).endswith(TERMINATOR):
+                    self._late_responses = 0  # Lost, or the device stopped answering
+        if self.port.in_waiting:
+            self.port.reset_input_buffer()
+
+    def _back_off(self):
+        # Double the deadline after a timeout; the smoothed round trip time alone would only ever shrink it
+        rtt = self._smoothed_rtt if self._smoothed_rtt is not None else MAX_DEADLINE / DEADLINE_FACTOR
+        self._smoothed_rtt = min(MAX_DEADLINE / DEADLINE_FACTOR, max(rtt, MIN_DEADLINE / DEADLINE_FACTOR) * 2)
+
+    def _update_rtt(self, rtt):
+        if self._smoothed_rtt is None:
+            self._smoothed_rtt = rtt
+        else:
+            self._smoothed_rtt += RTT_SMOOTHING * (rtt - self._smoothed_rtt)
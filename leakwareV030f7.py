@@ -34,6 +34,7 @@ Dependencies:
 - repository
 - strings_en (and other language files)
 - check_serial
+- log_pipeline
 
 Usage:
 This is the main entry point for the Leakware application. It sets up the necessary components,
@@ -48,28 +49,21 @@ import os  # Operating system interactions (file paths, etc. )
 import time
 import tkinter as tk
 import logging
-from sqlalchemy import create_engine, orm
 from main_page import main_page, set_stop_flag
 from repository import Repository
 from datetime import datetime
-from db_model import Base
+from db_model import Base, engine
 
 import strings_en as strings
 from check_serial import check_serial_ports
+from log_pipeline import setup_logging
 
-# Connect to the database
-engine = create_engine("sqlite:///leak_ware_db.db")
+# Connect to the database (shared engine from db_model)
 Base.metadata.create_all(engine)
-session_pool = orm.sessionmaker(engine)
-session = session_pool()
-repository = Repository(session)
-
-# create log file
-logging.basicConfig(
-    filename="log.txt",
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s: in %(filename)s %(message)s"
-)
+repository = Repository()  # Hands out one session per thread
+
+# create log file (rotated; written by a background thread, so logging never blocks the measurement)
+setup_logging("log.txt", level=logging.INFO)
 
 
 def on_closing():
@@ -108,8 +102,8 @@ check_serial_ports(root, repository)
 
 on_off = 0
 
-leakDetector_available = repository.get_device_info_by("Leak Detector").is_available
-massFlowController_available = repository.get_device_info_by("Mass Flow Controller").is_available
+leakDetector_available = repository.get_device_config("Leak Detector").is_available
+massFlowController_available = repository.get_device_config("Mass Flow Controller").is_available
 tb_clicked = False
 
 
@@ -0,0 +1,161 @@
+"""
+live_plot.py
+
+This module contains the live leak rate plot of the main window. Instead of clearing and
+rebuilding the axes on every frame, it keeps one persistent `Line2D` artist and redraws only
+that line on top of a cached background (blitting). The trace is reduced to min/max buckets of
+about one pixel column each, so a frame costs the same for a long test as for a short one.
+The axes (grid, symlog scale, labels, tick formatter) are set up once; a full redraw only
+happens when the data leaves the current limits, after the graph was cleared, or when the
+window is resized.
+
+Frames are scheduled with the Tk `after` mechanism at a capped, configurable frame rate that is
+independent of the acquisition sample rate.
+
+Key Classes:
+- LivePlot:
+  - start(self, widget): Starts drawing frames using the Tk event loop of `widget`.
+  - stop(self): Stops drawing frames.
+  - reset(self): Requests new axes limits on the next frame, e.g. after the graph was cleared.
+
+Dependencies:
+- logging
+- numpy
+- matplotlib
+- downsample
+- instrumentation
+
+Usage:
+An instance of `LivePlot` is created in `main_page` with the figure, axes and canvas of the
+live graph and a function returning the current trace (x and y arrays).
+"""
+import logging
+
+import numpy as np
+from matplotlib.ticker import FormatStrFormatter
+
+from downsample import minmax_downsample, axes_pixel_width
+import instrumentation
+
+DEFAULT_FRAME_RATE = 10  # Frames per second
+X_HEADROOM = 1.5  # New x range as multiple of the data range, so rescales stay rare
+Y_HEADROOM = 0.5  # Extra y range above the data as fraction of the data span
+
+
+class LivePlot:
+    def __init__(self, figure, axes, canvas, trace_function, frame_rate=DEFAULT_FRAME_RATE):
+        """
+        Initialize the live plot.
+
+        :param figure: Matplotlib figure of the graph
+        :param axes: Axes the leak rate is plotted on
+        :param canvas: FigureCanvasTkAgg the figure is drawn on
+        :param trace_function: Callable returning the current trace as (x, y) numpy arrays
+        :param frame_rate: Maximum number of frames per second
+        """
+        self.figure = figure
+        self.axes = axes
+        self.canvas = canvas
+        self.trace_function = trace_function
+        self.frame_interval = max(1, int(1000 / frame_rate))
+        self._widget = None
+        self._after_id = None
+        self._background = None
+        self._needs_rescale = True
+        self._last_trace_key = None
+
+        axes.clear()
+        axes.grid()
+        axes.set_yscale("symlog")
+        axes.set_xlabel("Time [s]")
+        axes.set_ylabel("Leakrate [mbarl/s]")
+        axes.yaxis.set_major_formatter(FormatStrFormatter("%2.1e"))
+        self.line, = axes.plot([], [], animated=True)
+
+        # Every full draw (first draw, resize, rescale) refreshes the cached background
+        canvas.mpl_connect("draw_event", self._on_draw)
+
+    def start(self, widget):
+        """
+        Start drawing frames.
+
+        :param widget: Tk widget whose event loop schedules the frames
+        """
+        self._widget = widget
+        if self._after_id is None:
+            self._after_id = widget.after(self.frame_interval, self._frame)
+
+    def stop(self):
+        """Stop drawing frames."""
+        if self._after_id is not None and self._widget is not None:
+            try:
+                self._widget.after_cancel(self._after_id)
+            except Exception as e:
+                logging.info(f"Live plot frame could not be cancelled: {str(e)}")
+        self._after_id = None
+
+    def reset(self):
+        """Fit the axes to the data again on the next frame."""
+        self._needs_rescale = True
+        self._last_trace_key = None
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.axes.bbox)
+        self.axes.draw_artist(self.line)
+
+    def _frame(self):
+        self._after_id = None
+        try:
+            with instrumentation.stage("gui.live_plot_frame"):
+                self._update()
+        except Exception as e:
+            logging.error(f"Error occurred while drawing the live plot: {str(e)}")
+        if self._widget is not None and self._widget.winfo_exists():
+            self._after_id = self._widget.after(self.frame_interval, self._frame)
+
+    def _update(self):
+        xs, ys = self.trace_function()
+        trace_key = (len(xs), xs[-1] if len(xs) else None)
+        if trace_key == self._last_trace_key:
+            return  # Nothing new since the last frame
+        self._last_trace_key = trace_key
+        xs, ys = minmax_downsample(xs, ys, axes_pixel_width(self.axes))
+        self.line.set_data(xs, ys)
+
+        if self._needs_rescale or self._outside_limits(xs, ys):
+            self._rescale(xs, ys)
+            self.canvas.draw()  # Full draw; the draw_event callback caches the new background
+            return
+
+        if self._background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self._background)
+        self.axes.draw_artist(self.line)
+        self.canvas.blit(self.axes.bbox)
+
+    def _outside_limits(self, xs, ys):
+        if len(xs) == 0:
+            return False
+        x_low, x_high = self.axes.get_xlim()
+        if xs[0] < x_low or xs[-1] > x_high:
+            return True
+        y_low, y_high = self.axes.get_ylim()
+        valid = ys[~np.isnan(ys)]
+        return valid.size > 0 and (valid.min() < y_low or valid.max() > y_high)
+
+    def _rescale(self, xs, ys):
+        if len(xs) == 0:
+            self._needs_rescale = True
+            return
+        self._needs_rescale = False
+        x_min = xs[0]
+        x_span = max(xs[-1] - x_min, 1.0)
+        self.axes.set_xlim(x_min, x_min + x_span * X_HEADROOM)
+
+        valid = ys[~np.isnan(ys)]
+        if valid.size == 0:
+            return
+        y_min, y_max = float(valid.min()), float(valid.max())
+        y_span = max(y_max - y_min, abs(y_max) * 0.1, 1e-12)
+        self.axes.set_ylim(y_min - 0.05 * y_span, y_max + Y_HEADROOM * y_span)
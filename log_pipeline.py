@@ -0,0 +1,174 @@
+"""
+log_pipeline.py
+
+This module sets up non-blocking logging for the Leakware application. The threads that log
+(acquisition worker, sensor tasks, telemetry writer, Tk thread) only put the record into a bounded
+in-memory queue; a single `QueueListener` thread writes it to the rotating log file and the console.
+A slow disk or console therefore never delays a leak rate sample.
+
+Messages that are meant for the console as well (what used to be a `print` next to the logging
+call) are logged with `extra=CONSOLE`. The console shows these and all warnings and errors; the
+log file gets everything.
+
+Call sites that log on every poll (sensor loops, retries of the leak detector) are rate limited by
+`RepeatFilter`: a call site may log `burst` records below WARNING per `interval` seconds, further
+records are dropped and counted, and the next record of that call site after the interval notes how
+many were suppressed. Warnings and errors are never rate limited. If the queue is full, records
+are dropped instead of blocking the caller; the number of dropped records is logged as soon as
+there is room again.
+
+Key Functions:
+- setup_logging(filename, level, max_bytes, backup_count, burst, interval): Installs the pipeline on the root logger.
+- stop_logging(): Writes the queued records and stops the listener thread.
+
+Key Classes:
+- RepeatFilter: Rate limits the records below WARNING per call site.
+- DroppingQueueHandler: QueueHandler that drops records instead of blocking when the queue is full.
+
+Dependencies:
+- sys
+- queue
+- atexit
+- logging
+- logging.handlers
+- threading
+- time
+
+Usage:
+`leakwareV030f7` calls `setup_logging("log.txt")` at startup. Modules keep using the standard
+`logging` functions:
+    logging.info(f"Pressure: {pressure:.2f} bar", extra=CONSOLE)
+"""
+import sys
+import queue
+import atexit
+import logging
+import logging.handlers
+import threading
+import time
+
+LOG_FORMAT = "%(asctime)s %(levelname)s: in %(filename)s %(message)s"
+QUEUE_SIZE = 10000  # Records; further records are dropped until the listener caught up
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+DEFAULT_BURST = 5  # Records per call site and interval
+DEFAULT_INTERVAL = 60  # Seconds
+
+# Pass as extra= to show a message on the console as well
+CONSOLE = {"console": True}
+
+_listener = None
+_queue_handler = None
+
+
+class RepeatFilter(logging.Filter):
+    def __init__(self, burst=DEFAULT_BURST, interval=DEFAULT_INTERVAL, clock=time.monotonic):
+        """
+        Initialize the filter.
+
+        :param burst: Records a call site may log per interval
+        :param interval: Length of the interval in seconds
+        :param clock: Monotonic clock
+        """
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.clock = clock
+        self._sites = {}  # (pathname, lineno) -> [window start, records in window, suppressed records]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True  # Warnings and errors are always logged
+        now = self.clock()
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None:
+                self._sites[key] = [now, 1, 0]
+                return True
+            suppressed = 0
+            if now - site[0] >= self.interval:
+                suppressed = site[2]
+                site[:] = [now, 0, 0]
+            if site[1] >= self.burst:
+                site[2] += 1
+                return False
+            site[1] += 1
+        if suppressed:
+            record.msg = f"{record.getMessage()} ({suppressed} similar message(s) suppressed)"
+            record.args = None
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks: records are dropped and counted while the queue is full."""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            if self.dropped:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    "name": __name__, "levelno": logging.WARNING, "levelname": "WARNING",
+                    "msg": f"{self.dropped} log record(s) dropped, the log queue was full",
+                }))
+                self.dropped = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def console_filter(record):
+    return record.levelno >= logging.WARNING or getattr(record, "console", False)
+
+
+def setup_logging(filename="log.txt", level=logging.INFO, max_bytes=DEFAULT_MAX_BYTES,
+                  backup_count=DEFAULT_BACKUP_COUNT, burst=DEFAULT_BURST, interval=DEFAULT_INTERVAL):
+    """
+    Route all logging of the process through a queue to a rotating log file and the console.
+
+    :param filename: Log file
+    :param level: Level of the root logger
+    :param max_bytes: Size at which the log file is rotated
+    :param backup_count: Number of rotated log files kept (log.txt.1 ... log.txt.N)
+    :param burst: Records a call site may log per interval
+    :param interval: Rate limit interval in seconds
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    file_handler = logging.handlers.RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count,
+                                                        encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(logging.Formatter("%(message)s"))
+    console_handler.addFilter(console_filter)
+
+    _queue_handler = DroppingQueueHandler(queue.Queue(QUEUE_SIZE))
+    _queue_handler.addFilter(RepeatFilter(burst, interval))
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, file_handler, console_handler,
+                                               respect_handler_level=True)
+
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(_queue_handler)
+    root_logger.setLevel(level)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Write the records still in the queue and stop the listener thread."""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    _queue_handler = None
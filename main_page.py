@@ -10,8 +10,8 @@ Key Functions:
             is_mass_flow_controller_available, repository, measurement_type):
   Main function to create the primary user interface and handle various functionalities.
 
-- display_label(value_label): Function to update the leak rate display and plot in real-time.
-- read(): Function to read the leak rate measurement from the leak detector.
+- display_label(value_label): Function to update the leak rate display from the acquisition buffer.
+- change_sample_rate(sample_rate): Function to change and store the leak rate sample rate.
 - start(): Function to start a new leak test measurement.
 - stop(): Function to stop the current leak test measurement.
 - reconnect(): Function to reconnect to the leak detector and mass flow controller.
@@ -19,31 +19,33 @@ Key Functions:
 - delete_last(): Function to delete the last measurement entry.
 - load_data_from_database(): Function to load measurement data from the database.
 - create_table(): Function to create a table with measurement data.
-- load_tree_view(): Function to load and display measurement data in a tree view.
-- edit_cell(event, measurements_list): Function to handle editing of measurement data cells.
-- update_cell(entry, item, col_index, measurements_list): Function to update a measurement data cell.
-- get_measurement_id(selected_item, measurements_list): Function to get the measurement ID from a selected item.
+- load_tree_view(): Function to load and display measurement data in a tree view, page by page.
+- append_tree_row(measurement_id, values): Function to add one measurement to the tree view.
+- remove_tree_row(measurement_id): Function to remove one measurement from the tree view.
+- edit_cell(event): Function to handle editing of measurement data cells.
+- update_cell(entry, item, col_index): Function to update a measurement data cell.
+- get_measurement_id(selected_item): Function to get the measurement ID from a selected item.
 - highest_value(): Function to display the highest leak rate value.
 - get_mass_flow_data(): Function to get data from the mass flow controller.
 - adjust_flow_rate(sccm_increment): Function to adjust the flow rate of the mass flow controller.
-- update_sensor_data(): Function to continuously update sensor data.
+- poll_mass_flow(), poll_pressure_gauge(), poll_helium(): Functions polling one sensor each (sensor_scheduler).
+- sensor_refresh(): Function to show the latest sensor readings in the main window.
 - clear_highest(): Function to clear the highest leak rate value.
 - graph_clear(): Function to clear the measurement graph.
+- graph_trace(): Function to copy the current graph trace out of the acquisition buffer.
 - clear_both(): Function to clear both the measurement graph and highest value.
 - auto_stop(): Function to handle automatic stopping of measurements based on conditions.
 - auto_button(): Function to start the auto-stop process.
 - close(): Function to close the application and handle cleanup tasks.
-- animate(i): Function to animate the measurement graph.
 
 Dependencies:
 - tkinter
 - matplotlib
 - numpy
-- pandas
 - threading
 - time
+- math
 - datetime
-- json
 - logging
 - serial
 - db_model
@@ -54,6 +56,17 @@ Dependencies:
 - helium
 - pressure_gauge
 - denkovi_relay
+- acquisition_service
+- leak_detector
+- trace_archive
+- live_plot
+- sensor_scheduler
+- instrumentation
+- log_pipeline
+
+The leak rate is acquired by the acquisition service, a separate process (see `acquisition_service`).
+`main_page` is its client: it sends start/stop/vent/calibration commands and reads the streamed samples
+from a local buffer, so drawing and reports in the GUI cannot delay a sample.
 
 Usage:
 This module is typically imported and used as the main application logic for the Leakware software.
@@ -63,32 +76,57 @@ handle device connections, control measurements, and interact with the database.
 import serial
 import serial.tools.list_ports
 from tkinter import messagebox
-from numpy import random
+import numpy as np
 import threading
-import pandas as pd
-import matplotlib.animation as animation
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.ticker import (FormatStrFormatter)
 
 from Pem_mode import pem_mode_config
 from profil_specification import profil_specification
 
 import time
+import math
 from datetime import datetime
-from db_model import Measurements, Specimens
+from db_model import Measurements, Specimens, format_leak_rate
 from compare_graph import compare
-import json
 import logging
 from Settings import settings
 from create_report import create_report
-from helium import read_data_from_helium
-from pressure_gauge import check_pressure_gauge
+from helium import HeliumAnalyzerReader
+from pressure_gauge import check_pressure_gauge, PressureGauge
 from denkovi_relay import RelaySwitch
+from trace_archive import read_trace
+from acquisition_service import connect_or_spawn, AcquisitionServiceError
+from leak_detector import SAMPLE_RATES, DEFAULT_SAMPLE_RATE
+from live_plot import LivePlot
+from sensor_scheduler import SensorScheduler
+import instrumentation
+from log_pipeline import CONSOLE
+
+# Interval at which the GUI picks up the latest sample from the acquisition buffer
+DISPLAY_REFRESH_MS = 50
+# Maximum redraw rate of the live graph, independent of the sample rate
+LIVE_PLOT_FRAME_RATE = 10
+# Number of measurements added to the results table per Tk event loop turn when it is loaded
+TREE_PAGE_SIZE = 100
+# Interval at which the GUI picks up the latest sensor readings
+SENSOR_REFRESH_MS = 500
+# Poll period and timeout in seconds per auxiliary sensor
+MASS_FLOW_PERIOD = 1
+MASS_FLOW_TIMEOUT = 1
+PRESSURE_GAUGE_PERIOD = 1
+PRESSURE_GAUGE_TIMEOUT = 2
+HELIUM_PERIOD = 1
+HELIUM_TIMEOUT = 1
+# Serial read/write timeout of the mass flow controller; get_mass_flow_data makes two round trips per poll
+MASS_FLOW_SERIAL_TIMEOUT = MASS_FLOW_TIMEOUT / 2
+MASS_FLOW_MAX_TEMPERATURE = 45  # °C, mass flow controller and solenoid valve are switched off above
+HELIUM_THRESHOLD = 95.0  # %, the flow rate is increased below
 
 def set_stop_flag():
-    global stop_flag
-    stop_flag = True
+    # Only signals the sensor tasks; close() waits for them
+    if sensor_scheduler is not None:
+        sensor_scheduler.stop(timeout=0)
 
 
 def main_page(
@@ -105,12 +143,14 @@ def main_page(
     global tree
     global measerment_Id
 
-    global stop_flag
-    stop_flag = False
+    global sensor_scheduler
 
     global show_popup
     show_popup = 1
 
+    global helium_alarm
+    helium_alarm = False
+
     def call_Pem_mode():
         main_root = tk.Toplevel(root)
         pem_mode_config(tk, main_root, mode_of_measurement, leakware_id,tb_clicked, repository)
@@ -157,31 +197,55 @@ def main_page(
             logging.error("An error occured while updating device info in load_cfg method in main_page.py", e)
     load_cfg()
 
+    # The leak detector is read by the acquisition service process; leak_rate_buffer mirrors its samples
+    try:
+        acquisition_client = connect_or_spawn()
+    except AcquisitionServiceError as e:
+        logging.error(f"Acquisition service not available: {str(e)}")
+        messagebox.showerror("Error", f"The acquisition service is not available: {str(e)}", parent=root)
+        root.destroy()
+        return
+    leak_rate_buffer = acquisition_client.buffer
+    sample_rate = leakware_config.sample_rate or DEFAULT_SAMPLE_RATE
+
+    def change_sample_rate(sample_rate):
+        leakware_config.sample_rate = float(sample_rate)
+        try:
+            acquisition_client.set_sample_rate(sample_rate)
+            repository.update_device_info()
+            logging.info(f"Leak rate sample rate set to {sample_rate} Hz")
+        except Exception as e:
+            print("An error occurred while saving the sample rate:", e)
+            logging.error(f"An error occurred while saving the sample rate in change_sample_rate: {str(e)}")
+
     def display_label(value_label):
         def display_refresh():
             global measurement
-            global start_time
             global seconds_elapsed
             global auto_onoff
-            global xs, ys, ys2
+            global last_sample_count
 
-            end_time = time.time()
-            seconds_elapsed = end_time - start_time
+            if on_off == 0:
+                print("Process finished.\n")
+                return
+
+            latest = leak_rate_buffer.latest()
+            if latest is not None and latest[0] != last_sample_count:
+                last_sample_count, timestamp, value = latest
+                seconds_elapsed = timestamp - start_time
+                if math.isnan(value):
+                    # Missing sample: keep the last valid measurement for auto-stop and create_table
+                    value_label.config(text="-", fg="black", font=("arial", 14, "bold"))
+                    value_label.after(DISPLAY_REFRESH_MS, display_refresh)
+                    return
+                measurement = value
 
-            if on_off != 0:
-                measurement = read()
                 if measurement >= 0.005:
                     value_label.config(text="{:10.4e}".format(measurement), fg="red", font=("arial", 14, "bold"))
                 else:
                     value_label.config(text="{:10.4e}".format(measurement), fg="green", font=("arial", 14, "bold"))
 
-                if len(xs) > 0:
-                    if seconds_elapsed != 0:
-                        xs.append(seconds_elapsed)
-                        ys.append(measurement)
-                else:
-                    xs.append(seconds_elapsed)
-                    ys.append(measurement)
+                achieved_rate_label.config(text="{:.1f} Hz".format(acquisition_client.achieved_rate))
 
                 if auto_onoff == 1:
                     auto_stop()
@@ -189,53 +253,21 @@ def main_page(
                     clear_both()
                 if 6 <= seconds_elapsed:
                     highest_value()
-                ys2.append(measurement)
-
-                time.sleep(0.01)
-                tr = threading.Thread(target=display_refresh)
-                tr.start()
 
-            else:
-                print("Process finished.\n")
+            if on_off != 0:
+                value_label.after(DISPLAY_REFRESH_MS, display_refresh)
 
         display_refresh()
 
-    def read():
-        measure_val = 0
-
-        try:
-            serialPort_leakDetector.flushInput()
-            serialPort_leakDetector.write('*read?\r'.encode())  # Send the command to retrieve the leak rate
-            time.sleep(0.1)  # Wait for a short delay to ensure the command is processed
-            measure_val = float(serialPort_leakDetector.readline())
-
-            #measure_val = float(random.choice([1, 2, 3, 4, 5, 6, 7, 8, 9]))  # Enable this for Mock Testing
-
-            if measure_val > 0 and type(measure_val) is float:
-
-                return measure_val
-            else:
-                return read()  # Retry reading if the value is not valid
-
-        except serial.SerialException as e:
-            print(f"Serial communication error occurred: {str(e)}, while reading leak rate. Retrying...")
-            logging.info(f"Serial communication error occurred: {str(e)}, while reading leak rate. Retrying...")
-            read()  # Retry reading if a serial communication error occurs
-        except ValueError as v:
-            print(f"Invalid response received: {str(v)}, while reading leak rate. Retrying...")
-            logging.info(f"Invalid response received: {str(v)}, while reading leak rate. Retrying...")
-            read()  # Retry reading if an invalid response is received
-
     def start():
         global on_off
         global start_time
         global element_no
-        global serialPort_leakDetector
         global serial_port_mass_flow_controller
         global directory_path
         global temperature_array
         nonlocal leakDetector_available
-        global settings_onoff
+        global last_sample_count
 
         temperature_array = []
 
@@ -243,27 +275,19 @@ def main_page(
 
         if leakDetector_available:
             try:
-                serialPort_leakDetector.flushInput()  # Flush the input buffer of the serial port for the leak detector
-
-                # Send the '*start\r' command to the leak detector to start the measurement
-                serialPort_leakDetector.write("*start\r".encode())
-
-                time.sleep(0.05)
-
-                # Flush the output buffer of the serial port for the leak detector
-                serialPort_leakDetector.flushOutput()
-            except serial.SerialException as e:
-                print(f"Serial Exception occurred: {str(e)}, while starting the measurement. Retrying...")
-                logging.info(f"Serial Exception occurred: {str(e)}, while starting the measurement. Retrying...")
-                settings_onoff = False
-                start()  # Recursively call the start() function to retry starting the measurement
+                # Sends *start and starts sampling; start_time is t = 0 of the archived trace
+                start_time = acquisition_client.start(leakware_id, leakware_config.sample_rate or DEFAULT_SAMPLE_RATE)
+            except AcquisitionServiceError as e:
+                print(f"Error occurred while starting the measurement: {str(e)}")
+                logging.error(f"Error occurred while starting the measurement: {str(e)}")
+                messagebox.showerror("Error", f"The measurement could not be started: {str(e)}", parent=root)
+                return
 
             on_off = 1
             auto_onoff = 0
-            start_time = 0
-            start_time = time.time()
-            display_label(value_label)
+            last_sample_count = leak_rate_buffer.mark()
             clear_both()
+            display_label(value_label)
             return on_off
 
     def stop():
@@ -272,37 +296,30 @@ def main_page(
         global element_no
         global xs
         global ys
+        global trace_offset
+        global trace_length
         global element_listx
         global element_listy
         global temperature_array
-        global serialPort_leakDetector
-        nonlocal leakDetector_available
 
         on_off = 0
+        try:
+            # Stops sampling, sends *stop and vents; returns once all samples are in leak_rate_buffer
+            archive_count = acquisition_client.stop()
+        except AcquisitionServiceError as e:
+            print(f"Error occurred while stopping the measurement: {str(e)}")
+            logging.error(f"Error occurred while stopping the measurement: {str(e)}")
+            archive_count = 0
+        # The specimen is the part of the archive recorded since the graph was last cleared
+        trace_offset = max(acquisition_client.archive_index(graph_start), 0)
+        trace_length = max(archive_count - trace_offset, 0)
+        if trace_length > 0:
+            xs, ys = read_trace(leakware_id, trace_offset, trace_length)
+        else:
+            xs, ys = np.empty(0), np.empty(0)
         element_listx.append(xs)
         element_listy.append(ys)
 
-        print(temperature_array)
-
-        if leakDetector_available:
-            try:
-                serialPort_leakDetector.write("*stop\r".encode())
-                time.sleep(0.75)
-
-                serialPort_leakDetector.write("*vent\r".encode())
-                time.sleep(0.05)
-
-                serialPort_leakDetector.flushOutput()
-                time.sleep(0.5)
-
-                serialPort_leakDetector.write("*vent\r".encode())
-                time.sleep(0.05)
-
-                serialPort_leakDetector.flushOutput()
-            except serial.SerialException as e:
-                print(f"Serial communication error occurred during the stop sequence: {str(e)}")
-                logging.info(f"Serial communication error occurred during the stop sequence: {str(e)}")
-
         element_no += 1
 
         if auto_onoff == 1:
@@ -315,7 +332,6 @@ def main_page(
         load_data_from_database()
 
     def reconnect():
-        global serialPort_leakDetector
         global serial_port_mass_flow_controller
         global settingsdict_leakDetector
         global settingsdict_massFlowController
@@ -326,7 +342,6 @@ def main_page(
         global mass_flow_config
         nonlocal leakDetector_available
         nonlocal is_mass_flow_controller_available
-        global settings_onoff
         global settings_onoff2
 
         ports = serial.tools.list_ports.comports()
@@ -342,26 +357,22 @@ def main_page(
                                                  'stopbits': int(leakware_config.stopbits), 'xonxoff': False,
                                                  'dsrdtr': False, 'rtscts': False, 'timeout': 1,
                                                  'write_timeout': None, 'inter_byte_timeout': None}
-                    if not settings_onoff:
-                        serialPort_leakDetector = serial.Serial(port=leakware_config.port)
-                        serialPort_leakDetector.apply_settings(settingsdict_leakDetector)
-                        settings_onoff = True
-                    else:
-                        serialPort_leakDetector = serial.Serial(port=leakware_config.port)
-                        serialPort_leakDetector.apply_settings(settingsdict_leakDetector)
-                except serial.SerialException as e:
+                    # The leak detector port is owned by the acquisition service
+                    acquisition_client.open_port(leakware_config.port, settingsdict_leakDetector)
+                except AcquisitionServiceError as e:
                     logging.error("reconnect serial exception:" + str(e))
                     print("reconnect serial exception:" + str(e))
                     if element_no == 0:
-                        if not settings_onoff:
-                            print("No Leak Detector connected.")
+                        print("No Leak Detector connected.")
                 try:
                     settingsdict_massFlowController = {'baudrate': mass_flow_config.baudrate,
                                                        'bytesize': int(mass_flow_config.bytesize),
                                                        'parity': mass_flow_config.parity,
                                                        'stopbits': int(mass_flow_config.stopbits), 'xonxoff': False,
                                                        'dsrdtr': False, 'rtscts': False,
-                                                       'timeout': 1, 'write_timeout': None, 'inter_byte_timeout': None}
+                                                       'timeout': MASS_FLOW_SERIAL_TIMEOUT,
+                                                       'write_timeout': MASS_FLOW_SERIAL_TIMEOUT,
+                                                       'inter_byte_timeout': None}
                     if not settings_onoff2:
                         serial_port_mass_flow_controller = serial.Serial(port=mass_flow_config.port)
                         serial_port_mass_flow_controller.apply_settings(settingsdict_massFlowController)
@@ -383,19 +394,17 @@ def main_page(
             messagebox.showerror(title="COM Port Check", message="Check COM port and ensure devices are powered on - none detected", parent=root)
 
     def calibration():
-        global serialPort_leakDetector
         nonlocal leakDetector_available
 
         reconnect()
 
         if leakDetector_available:
-            serialPort_leakDetector.flushInput()
-            serialPort_leakDetector.write("*hour:pow?\r".encode())
-            time.sleep(0.05)
-            time_pwon = int(serialPort_leakDetector.readline().decode())
-            time.sleep(0.05)
-            serialPort_leakDetector.flushOutput()
-            time.sleep(1)
+            try:
+                time_pwon = acquisition_client.power_on_time()
+            except AcquisitionServiceError as e:
+                print(f"Error occurred while reading the power on time: {str(e)}")
+                logging.error(f"Error occurred while reading the power on time: {str(e)}")
+                return
             print(time_pwon)
 
             if time_pwon >= 21:
@@ -403,21 +412,22 @@ def main_page(
                 def lbl3():
                     value_label.config(text="-", fg="black")
                 def lbl2():
-                    serialPort_leakDetector.flushInput()
-                    serialPort_leakDetector.write("*stat:calh 1?\r".encode())
-                    time.sleep(0.05)
-                    serialPort_leakDetector.flushOutput()
-                    time.sleep(1)
-                    cal = serialPort_leakDetector.readline().decode()
-                    cal = cal.split()[-1]
+                    try:
+                        cal = acquisition_client.calibration_factor()
+                    except AcquisitionServiceError as e:
+                        logging.error(f"Error occurred while reading the calibration factor: {str(e)}")
+                        cal = "-"
                     print(f"Calibration factor: {cal}")
                     value_label.config(text=(f"Calibration factor:\n {cal}"), fg="blue") #11
                     value_label.after(15000, lbl3)
                 def lbl1():
                     value_label.config(text="Calibrating...", fg="blue") #16
-                    serialPort_leakDetector.write("*cal\r".encode())
-                    time.sleep(0.05)
-                    serialPort_leakDetector.flushOutput()
+                    try:
+                        acquisition_client.calibrate()
+                    except AcquisitionServiceError as e:
+                        logging.error(f"Error occurred while starting the calibration: {str(e)}")
+                        value_label.config(text="-", fg="black")
+                        return
                     value_label.after(40000, lbl2)
                 lbl1()
 
@@ -433,8 +443,9 @@ def main_page(
 
     def delete_last():
         global tree
-        repository.delete_last_measurement(leakware_id)
-        load_tree_view()
+        measurement_id = repository.delete_last_measurement(leakware_id)
+        if measurement_id is not None:
+            remove_tree_row(measurement_id)
         print("last measurement deleted")
 
     def load_data_from_database():
@@ -446,10 +457,9 @@ def main_page(
 
         try:
 
-            specimens = repository.get_all_specimens(leakware_id)
-            for specimen in specimens:
-                element_listx.append(json.loads(specimen.x_value))
-                element_listy.append(json.loads(specimen.y_value))
+            for x_values, y_values in repository.get_specimen_traces(leakware_id):
+                element_listx.append(x_values)
+                element_listy.append(y_values)
         except Exception as e:
             # Log the error for debugging purposes
             logging.error(f"Error occurred while loading data from database: {str(e)}")
@@ -460,33 +470,16 @@ def main_page(
         global measurement
         global xs
         global ys
-        global ys2
+        global trace_offset
+        global trace_length
         global seconds_elapsed
-        global row_elemno
-        global row_time
-        global row_measurement
-        global row_highest
         global tree
-        global df
         global measerment_Id
         global data_information_id
         global auto_onoff
         global temperature_array
 
-        row_elemno.append(element_no)
-        row_time.append(round(seconds_elapsed, 1))
-        row_measurement.append("{:10.2e}".format(measurement))
-        row_highest.append("{:10.2e}".format(max(ys2, default=0)))
-
-        data = {
-            "no.": row_elemno,
-            "time [s]": row_time,
-            "value [mbarˑl/s]": row_measurement,
-            "max [mbarˑl/s]": row_highest
-        }
-        df = pd.DataFrame(data)
-        pd.set_option("display.max_rows", None)
-        print(df)
+        highest = leak_rate_buffer.max_since(highest_start)
 
         if 'data_information_id' not in globals():
             data_information_id = None
@@ -504,67 +497,86 @@ def main_page(
             logging.info("Measurement Creation")
 
             try:
-                if ys2:
-                    max_value = "{:10.2e}".format(max(ys2))
-                else:
-                    max_value = "0.00e+00"  # Set a default value when ys2 is empty
-
-                measurement_db = Measurements(
-                    leakware_id=leakware_id,
-                    data_information_id=data_information_id,
-                    serial_number=element_no,
-                    time_in_seconds=round(seconds_elapsed, 1),
-                    value_mbarl_second="{:10.2e}".format(measurement),
-                    max_value="{:10.2e}".format(max(ys2, default=0)),
-                    autostop=auto_onoff,
-                    panel_no=panel_no,
-                    location_no=location_no,
-                    average_temperature=average_temperature,
-                    he_pressure="Testing",
-                    he_percentage="Testing",
-                    he_massflow_value="Testing",
-                    active=True
-                )
-                measurement_db.average_temperature = average_temperature
-                measurement_id = repository.insert_measurement(measurement_db).measerment_Id
-                measurement = 0
-                logging.info(f"Measurement Id is : {measurement_id}")
-
-                if len(xs) > 0 and len(ys) > 0:
-                    specimen = Specimens(
-                        measerment_Id=measurement_id,
-                        x_value=json.dumps(xs),
-                        y_value=json.dumps(ys),
+                # Measurement and specimen are committed together, or not at all
+                with instrumentation.stage("db.create_table_commit"), repository.unit_of_work():
+                    measurement_db = Measurements(
                         leakware_id=leakware_id,
-                        created_at=datetime.now(),
-                        updated_at=datetime.now()
+                        data_information_id=data_information_id,
+                        serial_number=element_no,
+                        time_in_seconds=round(seconds_elapsed, 1),
+                        value_mbarl_second=float(measurement),
+                        max_value=float(highest),
+                        autostop=auto_onoff,
+                        panel_no=panel_no,
+                        location_no=location_no,
+                        average_temperature=average_temperature,
+                        he_pressure="Testing",
+                        he_percentage="Testing",
+                        he_massflow_value="Testing",
+                        active=True
                     )
-                    repository.insert_specimens(specimen)
-
-                try:
-                    repository.commit()  # Commit the session changes
-                except Exception as e:
-                    logging.error(f"Error occurred while committing the session: {str(e)}")
-                    repository.session.rollback()
-                    raise # Re-raise the exception for proper error handling
-                load_tree_view()
+                    measurement_db.average_temperature = average_temperature
+                    measurement_id = repository.insert_measurement(measurement_db).measerment_Id
+                    logging.info(f"Measurement Id is : {measurement_id}")
+                    row_values = tree_row_values(measurement_db)
+
+                    if trace_length > 0:
+                        specimen = Specimens(
+                            measerment_Id=measurement_id,
+                            trace_offset=trace_offset,
+                            trace_length=trace_length,
+                            leakware_id=leakware_id,
+                            created_at=datetime.now(),
+                            updated_at=datetime.now()
+                        )
+                        repository.insert_specimens(specimen)
+                measurement = 0
+                append_tree_row(measurement_id, row_values)
             except Exception as e:
                 logging.error(f"Error occurred while creating measurement: {str(e)}")
-                repository.session.rollback()  # Rollback the transaction if an error occurs
                 raise  # Re-raise the exception for proper error handling
 
+    # Results table rows: tree item -> measurement id and measurement id -> tree item
+    tree_measurement_ids = {}
+    tree_items = {}
+
+    def tree_row_values(measurement):
+        return (measurement.panel_no, measurement.location_no, measurement.time_in_seconds,
+                format_leak_rate(measurement.value_mbarl_second), format_leak_rate(measurement.max_value))
+
+    @instrumentation.timed("gui.load_tree_view")
     def load_tree_view():
+        # Rebuild the table; pages are inserted from the Tk event loop so large sessions do not block the GUI
         tree.delete(*tree.get_children())
-
-        row_lst = []
-        measurements_list = repository.get_all_measurements_data(leakware_id)
-        for numbr, measurement in enumerate(measurements_list, start=1):
-            row_lst.append((measurement.panel_no, measurement.location_no, measurement.time_in_seconds, "{:10.1e}".format(float(measurement.value_mbarl_second)), "{:10.1e}".format(float(measurement.max_value))))
-            tree.insert("", "end", values=row_lst[numbr-1])
-        tree.bind('<Double-1>',lambda event: edit_cell(event, measurements_list))
+        tree_measurement_ids.clear()
+        tree_items.clear()
+        load_tree_page(0)
+
+    @instrumentation.timed("gui.load_tree_page")
+    def load_tree_page(after_id):
+        measurements_page = repository.get_measurements_page(leakware_id, after_id, TREE_PAGE_SIZE)
+        for measurement in measurements_page:
+            append_tree_row(measurement.measerment_Id, tree_row_values(measurement))
+        if len(measurements_page) == TREE_PAGE_SIZE:
+            root.after(1, load_tree_page, measurements_page[-1].measerment_Id)
+
+    def append_tree_row(measurement_id, values):
+        if measurement_id in tree_items:
+            return
+        item = tree.insert("", "end", values=values)
+        tree_measurement_ids[item] = measurement_id
+        tree_items[measurement_id] = item
         tree.yview_moveto(1)
 
-    def edit_cell(event, measurements_list):
+    def remove_tree_row(measurement_id):
+        item = tree_items.pop(measurement_id, None)
+        if item is not None:
+            del tree_measurement_ids[item]
+            tree.delete(item)
+
+    def edit_cell(event):
+        if not tree.selection():
+            return
         item = tree.selection()[0]
         column = tree.identify_column(event.x)
         row = tree.identify_row(event.y)
@@ -579,18 +591,20 @@ def main_page(
             entry = tk.Entry(tree, bd=0)
             entry.place(x=x, y=y, width=width, height=height)
             entry.insert(0, tree.item(item)['values'][col_index])
-            entry.bind('<FocusOut>', lambda event: update_cell(entry, item, col_index, measurements_list))
-            entry.bind('<Return>', lambda event: update_cell(entry, item, col_index, measurements_list))
+            entry.bind('<FocusOut>', lambda event: update_cell(entry, item, col_index))
+            entry.bind('<Return>', lambda event: update_cell(entry, item, col_index))
             entry.bind('<Escape>', lambda event: entry.destroy())
 
             # Focus and select entry widget
             entry.focus_set()
             entry.selection_range(0, 'end')
 
-    def update_cell(entry, item, col_index, measurements_list):
+    def update_cell(entry, item, col_index):
+        if not entry.winfo_exists():
+            return  # <Return> already applied the edit and destroyed the entry before <FocusOut>
         new_value = entry.get()
         tree.set(item, column='#{}'.format(col_index+1), value=new_value)
-        measurement_id = get_measurement_id(item, measurements_list)
+        measurement_id = get_measurement_id(item)
         column_name = "panel_no" if col_index == 0  else "location_no"
         try:
             repository.update_measurement_by_id(measurement_id, column_name, new_value)
@@ -599,28 +613,19 @@ def main_page(
             logging.error("An error occurred while updating measurement in update cell method in main page", e)
         entry.destroy()
 
-    def get_measurement_id(selected_item, measurements_list):
-        # Get the index of the selected item in the Treeview
-        index = tree.index(selected_item)
-        # Get the measurement ID from the measurements_list using the index
-        return measurements_list[index].measerment_Id
+    def get_measurement_id(selected_item):
+        return tree_measurement_ids[selected_item]
 
     def highest_value():
-        global measurement
-        global ys2
-        value = measurement
+        highest = leak_rate_buffer.max_since(highest_start)
 
-        if max(ys2, default=0) >= 0.005:
-            highest_label.config(text="{:10.4e}".format(max(ys2, default=0)), fg="red", font=("arial", 14, "bold"))
+        if highest >= 0.005:
+            highest_label.config(text="{:10.4e}".format(highest), fg="red", font=("arial", 14, "bold"))
         else:
-            highest_label.config(text="{:10.4e}".format(max(ys2, default=0)), fg="green", font=("arial", 14, "bold"))
+            highest_label.config(text="{:10.4e}".format(highest), fg="green", font=("arial", 14, "bold"))
 
-        if value > max(ys2, default=0):
-            value = measurement
-            if measurement >= 0.005:
-                highest_label.config(text="{:10.4e}".format(value), fg="red")
-            else:
-                highest_label.config(text="{:10.4e}".format(value), fg="green")
+    # The mass flow sensor task and adjust_flow_rate share the serial port
+    mass_flow_lock = threading.Lock()
 
     def get_mass_flow_data():
         global serial_port_mass_flow_controller
@@ -629,21 +634,20 @@ def main_page(
 
         try:
             if is_mass_flow_controller_available:
-                for i in range(0, 2):
-                    i += 1
-                    serial_port_mass_flow_controller.flushInput()
-                    serial_port_mass_flow_controller.write("*@=A\r".encode())
-                    serial_port_mass_flow_controller.flushInput()
-                    value_sens = serial_port_mass_flow_controller.read_until('\r').decode()
-                    value_sens_list = value_sens.split(" ")
-                    temp_v = value_sens_list[2]
-                    sccm_val = value_sens_list[4]
+                with mass_flow_lock:
+                    for i in range(0, 2):
+                        i += 1
+                        serial_port_mass_flow_controller.flushInput()
+                        serial_port_mass_flow_controller.write("*@=A\r".encode())
+                        serial_port_mass_flow_controller.flushInput()
+                        value_sens = serial_port_mass_flow_controller.read_until(b'\r').decode()
+                        value_sens_list = value_sens.split(" ")
+                        temp_v = value_sens_list[2]
+                        sccm_val = value_sens_list[4]
         except serial.SerialException as e:
-            print(f"Serial communication error occurred: {str(e)}, in get_mass_flow_data")
-            logging.info(f"Serial communication error occurred: {str(e)}, in get_mass_flow_data")
+            logging.info(f"Serial communication error occurred: {str(e)}, in get_mass_flow_data", extra=CONSOLE)
         except Exception as e:
-            print("An error occurred while getting mass flow data:", e)
-            logging.info("An error occurred while getting mass flow data:", e)
+            logging.info(f"An error occurred while getting mass flow data: {str(e)}", extra=CONSOLE)
             # You might want to handle the error in a specific way or log it.
             return [sccm_val, temp_v]
 
@@ -660,12 +664,13 @@ def main_page(
 
             # Send the revised flow rate to Mass flow controller
             try:
-                serial_port_mass_flow_controller.flushInput()
-                serial_port_mass_flow_controller.write("*@=A\r".encode())
-                time.sleep(0.2)
-                serial_port_mass_flow_controller.flushInput()
-                serial_port_mass_flow_controller.write(("*" + flowrate + "\r").encode())
-                serial_port_mass_flow_controller.flushOutput()
+                with mass_flow_lock:
+                    serial_port_mass_flow_controller.flushInput()
+                    serial_port_mass_flow_controller.write("*@=A\r".encode())
+                    time.sleep(0.2)
+                    serial_port_mass_flow_controller.flushInput()
+                    serial_port_mass_flow_controller.write(("*" + flowrate + "\r").encode())
+                    serial_port_mass_flow_controller.flushOutput()
 
                 # Update the revised flow rate to the Mass Flow Controller Table
                 mass_flow_config.sccm_value = flowrate
@@ -674,81 +679,134 @@ def main_page(
                 print(f"Serial Exception occurred: {str(e)}. Revised Flow Rate {flowrate} not applied")
                 logging.info(f"Serial Exception occurred: {str(e)}. Revised Flow Rate {flowrate} not applied")
 
-    def update_sensor_data():
-        global on_off
-        global temperature_array
+    relay_switch = RelaySwitch(repository)
+    pressure_gauge = PressureGauge()  # Opened once, kept across polls
+    helium_reader = None  # Started once the Helium Analyzer is available, keeps its port open
+    helium_reconfigure = threading.Event()  # Set when the Helium Analyzer configuration changed
+
+    # The poll_* functions and their on_*_reading callbacks run in the sensor scheduler threads
+    # and must not touch Tk widgets; sensor_refresh shows the readings in the Tk thread.
+    def poll_mass_flow():
+        if not is_mass_flow_controller_available:
+            return None
+        sccm_val, mass_flow_temperature = get_mass_flow_data()
+        logging.info(f"SCCM Value is: {sccm_val}", extra=CONSOLE)
+        repository.update_latest_reading("Mass Flow Controller", sccm_value=float(sccm_val),
+                                         temperature=float(mass_flow_temperature))
+        return sccm_val, float(mass_flow_temperature)
+
+    def on_mass_flow_reading(reading):
+        sccm_val, mass_flow_temperature = reading.value
+        if mass_flow_temperature > MASS_FLOW_MAX_TEMPERATURE:
+            if repository.get_device_config("Relay Switch").is_available:
+
+                # Turn off Mass Flow Controller
+                mass_flow_relay_channel = relay_switch.set_relay_state("Mass Flow Controller", 0)
+                if mass_flow_relay_channel:
+                    logging.info(f"Turning OFF Mass Flow Controller, as it is nearing it's max operating temperature: {mass_flow_temperature}",
+                                 extra=CONSOLE)
+
+                # Turn off Helium Solenoid Valve
+                solenoid_valve_relay_channel = relay_switch.set_relay_state("Helium Solenoid Valve", 0)
+                if solenoid_valve_relay_channel:
+                    logging.info(
+                        f"Turning OFF Solenoid Valve as Mass Flow Controller is nearing it's max operating temperature: {mass_flow_temperature}",
+                        extra=CONSOLE)
+
+    def poll_pressure_gauge():
+        pressure, temperature = check_pressure_gauge(repository, pressure_gauge)
+        if pressure is None or temperature is None:
+            return None
+        return pressure, temperature
+
+    def on_pressure_gauge_reading(reading):
+        if on_off == 1:
+            temperature_array.append(reading.value[1])
+
+    def poll_helium():
+        nonlocal helium_reader
+        if helium_reconfigure.is_set() and helium_reader is not None:
+            helium_reconfigure.clear()
+            helium_reader.close()  # Reopened below with the new port and baudrate
+            helium_reader = None
+        helium_analyser_config = repository.get_device_config("Helium Analyzer")
+        if not helium_analyser_config.is_available:
+            return None
+        if helium_reader is None:
+            helium_reader = HeliumAnalyzerReader(helium_analyser_config.port, helium_analyser_config.baudrate)
+            helium_reader.start()
+        helium_reading = helium_reader.latest()
+        if helium_reading is None:
+            return None
+        logging.info(f"helium value is : {helium_reading.helium}")
+        repository.update_latest_reading("Helium Analyzer", helium=helium_reading.helium)
+        return helium_reading.helium
+
+    def on_helium_reading(reading):
         global show_popup
-        global stop_flag
-        relay_switch = RelaySwitch(repository)
-        while not stop_flag:
-            logging.info("=============================mass flow temperature=============================")
-            if is_mass_flow_controller_available:
-                sccm_val, mass_flow_temperature = get_mass_flow_data()
-                if mass_flow_temperature > 45:
-                    button_start.config(state="disabled")
-
-                    if repository.get_device_serial_info_by("Relay Switch").is_available:
-
-                        # Turn off Mass Flow Controller
-                        mass_flow_relay_channel = relay_switch.set_relay_state("Mass Flow Controller", 0)
-                        if mass_flow_relay_channel:
-                            logging.info(f"Turning OFF Mass Flow Controller, as it is nearing it's max operating temperature: {mass_flow_temperature}")
-                            print(f"Turning OFF Mass Flow Controller, as it is nearing it's max operating temperature: {mass_flow_temperature}")
-
-                        # Turn off Helium Solenoid Valve
-                        solenoid_valve_relay_channel = relay_switch.set_relay_state("Helium Solenoid Valve", 0)
-                        if solenoid_valve_relay_channel:
-                            logging.info(
-                                f"Turning OFF Solenoid Valve as Mass Flow Controller is nearing it's max operating temperature: {mass_flow_temperature}")
-                            print(
-                                f"Turning OFF Solenoid Valve as Mass Flow Controller is nearing it's max operating temperature: {mass_flow_temperature}")
-                else:
-                    button_start.config(state="normal")
-                helium_massflow_value.config(text=sccm_val)
-                print(f"SCCM Value is: {sccm_val}")
-
-            pressure, temperature = check_pressure_gauge(repository)
-            if pressure is not None and temperature is not None:
-                if on_off == 1:
-                    temperature_array.append(temperature)
-                if root.winfo_exists():  # check if the root window exists
-                    if room_temp_value.winfo_exists():
-                        room_temp_value.config(text=f"{temperature:.2f}")
-                    # check if the pressure is 30 bar or below and change the color to red
-                    if helium_pressure_value.winfo_exists():
-                        if pressure <= 30:
-                            helium_pressure_value.config(text=f"{pressure:.2f}", fg="red")
-                        else:
-                            helium_pressure_value.config(text=f"{pressure:.2f}", fg="green")
-
-            helium_analyser_config = repository.get_device_info_by("Helium Analyzer")
-            if helium_analyser_config.is_available:
-                helium_value = read_data_from_helium(repository, root)
-                logging.info(f"helium value is : {helium_value}")
-
-                if helium_value is not None:
-                    if helium_value < 95.0:
-                        if show_popup == 1:
-                            messagebox.showerror("Error", "Helium Value is below threshold", parent=root)
-                            messagebox.showwarning("Warning", "Increasing the sccm value by 1, Please wait for a moment", parent=root)
-                            adjust_flow_rate(1)  # Increase the SCCM by 1
-                            time.sleep(60)  # To allow the increased SCCM take effect
-                            show_popup = 0
-                    else:
-                        show_popup = 1
-                    helium_concentration_value.config(text=helium_value)
-            print("updated sensor data")
-            time.sleep(1)
+        global helium_alarm
+        if reading.value < HELIUM_THRESHOLD:
+            if show_popup == 1:
+                show_popup = 0
+                helium_alarm = True  # Reported by sensor_refresh
+                adjust_flow_rate(1)  # Increase the SCCM by 1
+        else:
+            show_popup = 1
+
+    def on_device_change(name, _old, _new):
+        if name == "Helium Analyzer":
+            helium_reconfigure.set()  # Applied by poll_helium in the Helium Analyzer thread
+
+    def close_helium():
+        if helium_reader is not None:
+            helium_reader.close()
+
+    def sensor_refresh():
+        global helium_alarm
+        mass_flow_reading = sensor_scheduler.latest("Mass Flow Controller")
+        if mass_flow_reading is not None:
+            sccm_val, mass_flow_temperature = mass_flow_reading.value
+            if mass_flow_temperature > MASS_FLOW_MAX_TEMPERATURE:
+                button_start.config(state="disabled")
+            else:
+                button_start.config(state="normal")
+            helium_massflow_value.config(text=sccm_val)
+
+        pressure_reading = sensor_scheduler.latest("Pressure Gauge")
+        if pressure_reading is not None:
+            pressure, temperature = pressure_reading.value
+            room_temp_value.config(text=f"{temperature:.2f}")
+            # check if the pressure is 30 bar or below and change the color to red
+            if pressure <= 30:
+                helium_pressure_value.config(text=f"{pressure:.2f}", fg="red")
+            else:
+                helium_pressure_value.config(text=f"{pressure:.2f}", fg="green")
+
+        helium_reading = sensor_scheduler.latest("Helium Analyzer")
+        if helium_reading is not None:
+            helium_concentration_value.config(text=helium_reading.value)
+
+        if helium_alarm:
+            helium_alarm = False
+            messagebox.showerror("Error", "Helium Value is below threshold", parent=root)
+            messagebox.showwarning("Warning", "Increasing the sccm value by 1, Please wait for a moment", parent=root)
+
+        root.after(SENSOR_REFRESH_MS, sensor_refresh)
 
     def clear_highest():
-        global ys2
-        ys2 = []
+        global highest_start
+        highest_start = leak_rate_buffer.mark()
         highest_label.config(text="-")
 
     def graph_clear():
-        global xs
-        global ys
-        xs, ys = [], []
+        global graph_start
+        graph_start = leak_rate_buffer.mark()
+        live_plot.reset()
+
+    def graph_trace():
+        # Copy the samples recorded since the graph was last cleared, in seconds since start
+        timestamps, values = leak_rate_buffer.snapshot(graph_start)
+        return timestamps - start_time, values
 
     def clear_both():
         graph_clear()
@@ -786,16 +844,15 @@ def main_page(
 
     def close():
         global on_off
-        global stop_flag
-        stop_flag = True
 
         if on_off == 1:
             stop()
-        try:
-            if serialPort_leakDetector is not None:
-                serialPort_leakDetector.close()
-        except serial.SerialException as e:
-            print(f"Serial Exception Occurred: {str(e)}. Unable to close Serial Connection")
+        acquisition_client.close()  # Shuts down the acquisition service and closes the leak detector port
+        live_plot.stop()
+        if instrumentation.enabled:
+            instrumentation.dump()
+        sensor_scheduler.stop()  # Wait for the sensor tasks before their ports are closed
+        repository.unsubscribe_device_changes(on_device_change)
 
         try:
             if serial_port_mass_flow_controller in globals() and serial_port_mass_flow_controller is not None:
@@ -806,8 +863,6 @@ def main_page(
         except serial.SerialException as e:
             print(f"Serial Exception Occurred: {str(e)}. Unable to close Serial Connection")
 
-        thread1.join()  # wait for the update_sensor_data thread to complete
-
         repository.close_session()
 
         try:
@@ -823,24 +878,6 @@ def main_page(
 
         exit()
 
-    def animate(i):
-        global measurement
-        global xs
-        global ys
-        global ys2
-
-        ax1.clear()
-        ax1.grid()
-        ax1.set_yscale("symlog")
-        ax1.set_xlabel("Time [s]")
-        ax1.set_ylabel("Leakrate [mbarl/s]")
-        ax1.yaxis.set_major_formatter(FormatStrFormatter("%2.1e"))
-        if len(ys) > 0:
-            ax1.plot(xs[:-1], ys[:-1])
-        else:
-            ax1.plot(xs, ys)
-
-    graph_clear()
     # root = tk.Tk()
 
     # color1 = "#c4e4ff"
@@ -866,14 +903,15 @@ def main_page(
     # Graph
     fig = plt.figure()
     ax1 = fig.add_subplot(1, 1, 1)
-    ax1.yaxis.set_major_formatter(FormatStrFormatter("%2.1e"))
 
     graph_frame = tk.Frame(root, bg="black")
     graph_frame.place(relx=0.35, rely=0.275, relwidth=0.7, relheight=0.65, anchor="nw")
     graph = FigureCanvasTkAgg(fig, master=graph_frame)
     graph.get_tk_widget().pack(fill='both', expand=True)
-    ani = animation.FuncAnimation(fig, animate, interval=0.01)
+    live_plot = LivePlot(fig, ax1, graph, graph_trace, frame_rate=LIVE_PLOT_FRAME_RATE)
     graph.draw()
+    live_plot.start(root)
+    graph_clear()
 
     ### direction images
     rb_direction_variable = tk.IntVar()
@@ -919,6 +957,17 @@ def main_page(
     auto_save_unit = tk.Label(root, text="Sec", bg=colorF, font=("Arial", 10))
     auto_save_unit.place(relx=0.210, rely=0.485, anchor="nw")
 
+    ### Sample Rate
+    sample_rate_label = tk.Label(root, text="Sample rate [Hz]", bg=colorF, font=("Arial", 10))
+    sample_rate_label.place(relx=0.375, rely=0.03, relwidth=0.1, anchor="n")
+    sample_rate_variable = tk.IntVar()
+    sample_rate_variable.set(int(sample_rate))
+    sample_rate_menu = tk.OptionMenu(root, sample_rate_variable, *SAMPLE_RATES, command=change_sample_rate)
+    sample_rate_menu.config(bg=color1, fg=colorF, font=("Arial", 10), highlightthickness=0)
+    sample_rate_menu.place(relx=0.375, rely=0.08, relheight=0.05, relwidth=0.08, anchor="n")
+    achieved_rate_label = tk.Label(root, text="- Hz", bg=colorF, font=("Arial", 9))
+    achieved_rate_label.place(relx=0.375, rely=0.14, relwidth=0.1, anchor="n")
+
     # Element Spec
     if measurement_type != "Quick Test":
         button_element_spec = tk.Button(root, text="Element Spec", font=("arial", 12, "bold"), bg=color1,  fg=colorF, command=custom_command)
@@ -950,11 +999,13 @@ def main_page(
 
     tree.tag_configure("even", background="#c4cfff")
     tree.tag_configure("odd", background=color3)
+    tree.bind('<Double-1>', edit_cell)
     relx = 0.0115
     rely = 0.6
     relwidth = 0.225
     relheight = 0.3
     tree.place(relx=0.122, rely=0.6, relheight=0.3, relwidth=0.225,anchor="n")
+    load_tree_view()  # Shows the measurements of a session that is opened again
     for col in range(0, 6):
         separator = ttk.Separator(root, orient="vertical")
         separator.place(relx=relx + (col * relwidth / 5), rely=rely, relheight=relheight, width=2, anchor="ne")
@@ -1049,28 +1100,37 @@ def main_page(
     helium_massflow_unit = tk.Label(root, text="SCCM", bg=colorF, font=("Arial", 9))
     helium_massflow_unit.place(relx=0.975, rely=0.24, anchor="n")
 
-    thread1 = threading.Thread(target=update_sensor_data)
-    thread1.start()
+    sensor_scheduler = SensorScheduler(thread_exit=repository.release_session)
+    sensor_scheduler.add("Mass Flow Controller", poll_mass_flow, MASS_FLOW_PERIOD, MASS_FLOW_TIMEOUT,
+                         on_mass_flow_reading)
+    sensor_scheduler.add("Pressure Gauge", poll_pressure_gauge, PRESSURE_GAUGE_PERIOD, PRESSURE_GAUGE_TIMEOUT,
+                         on_pressure_gauge_reading, pressure_gauge.close)
+    sensor_scheduler.add("Helium Analyzer", poll_helium, HELIUM_PERIOD, HELIUM_TIMEOUT,
+                         on_helium_reading, close_helium)
+    repository.subscribe_device_changes(on_device_change)
+    sensor_scheduler.start()
+    sensor_refresh()
+    root.bind("<F12>", lambda event: instrumentation.show_window(tk, root))  # Latency statistics
     root.mainloop()
-    thread1.join()
+    sensor_scheduler.stop()
 
 element_no = 0
 measurement = 0
+sensor_scheduler = None
+helium_alarm = False
 on_off = 0
 auto_onoff = 0
 start_time = 0
 seconds_elapsed = 0
 xs = []
 ys = []
-ys2 = []
+trace_offset = 0
+trace_length = 0
+graph_start = 0
+highest_start = 0
+last_sample_count = 0
 tb_clicked = False
-row_elemno = []
-row_time = []
-row_measurement = []
-row_highest = []
 measure_val = 0
 element_listx = []
 element_listy = []
-serialPort_leakDetector = None
-settings_onoff = False
 settings_onoff2 = False
@@ -4,63 +4,94 @@ pressure_gauge.py
 This module provides functionality to interact with the ESI-USB-API library for the GD4200 USB pressure gauge.
 It allows reading pressure and temperature values from the pressure gauge and storing the data in the database.
 
+The library is loaded and the sensor is opened once per `PressureGauge` instance. The handle is kept
+across reads and the sensor is only re-enumerated when a read fails.
+
+Key Classes:
+- PressureGauge:
+  - __init__(self, sensor_index=0, library=None): Creates the gauge session (opened lazily).
+  - open(self): Loads the library, finds the sensors and opens the sensor.
+  - read(self, n=1): Reads n pressure/temperature pairs, reconnecting once on failure.
+  - close(self): Releases the sensor and cleans up the library.
+
 Key Functions:
-- check_pressure_gauge(repository): Main function to read and process data from the pressure gauge.
+- check_pressure_gauge(repository, gauge=None): Reads one value pair and stores it in the database.
 
 Dependencies:
 - ctypes (to interface with the ESI-USB-API library)
-- time
 - platform
-- numpy (for random data generation, used for testing/mock purposes)
+- os
 - logging
+- log_pipeline
 - db_model (for interacting with the database models)
 
+Setting the environment variable LEAKWARE_SIMULATE_ESI=1 loads the simulated library of
+`device_simulator` instead of the DLL, for running without the gauge.
+
 Usage:
-This module is typically imported, and the `check_pressure_gauge` function is called when the application
-needs to read and process data from the pressure gauge. The function takes the Repository object as an
-argument for database interaction and returns the pressure and temperature values read from the gauge.
+`main_page` creates one `PressureGauge` and passes it to `check_pressure_gauge` on every poll of the
+sensor loop. The function returns the pressure and temperature values read from the gauge.
 """
 import ctypes # Import the ctypes module to interface with the ESI-USB-API library
-import time # Import the time module for adding delays in the example usage
 import platform # Import the platform module to identify whether it is 32bit or 64 bit system
-from db_model import PressureGaugeData, Base
-from numpy import random
+import os
+import threading
 import logging
-# Detect the system architecture
-def check_pressure_gauge(repository):
-    logging.info("Entered into check pressure gauge")
-    is_64bit = platform.architecture()[0] == '64bit' 
-    # Load the appropriate DLL file based on the system architecture
-    if is_64bit:
-        esi_api = ctypes.CDLL("./esi_dll/ESI-USB-API.dll") # This library provides functions to interact with GD4200 USB pressure gauge
-    else:
-        esi_api = ctypes.CDLL("./esi_dll/ESI_USB_API_COM.dll") # This library provides functions to interact with GD4200 USB pressure gauge
-    # Define constants
-    # These constants are used as return values from the API functions
-    OK = 0
-    FAIL = -1
-    INVALID_INDEX = -2
-    INVALID_PARAMETER = -3
-    INVALID_STATE = -4
-    # Define enums
-    # These enums represent the available pressure and temperature units
-    class PressureUnits(ctypes.c_int):
-        bar = 0
-        mbar = 1
-        psi = 2
-        MPa = 3
-        Pa = 4
-        mmH2O = 5
-        mmHg = 6
-        atm = 7
-        kgcm2 = 8
-        kPa = 9
-    
-    class TemperatureUnits(ctypes.c_int):
-        C = 0
-        K = 1
-        F = 2 
-    # Define function prototypes
+from log_pipeline import CONSOLE
+from db_model import PressureGaugeData
+
+LIBRARY_PATH_64BIT = "./esi_dll/ESI-USB-API.dll"
+LIBRARY_PATH_32BIT = "./esi_dll/ESI_USB_API_COM.dll"
+SIMULATOR_ENV = "LEAKWARE_SIMULATE_ESI"
+
+# Define constants
+# These constants are used as return values from the API functions
+OK = 0
+FAIL = -1
+INVALID_INDEX = -2
+INVALID_PARAMETER = -3
+INVALID_STATE = -4
+
+
+# Define enums
+# These enums represent the available pressure and temperature units
+class PressureUnits(ctypes.c_int):
+    bar = 0
+    mbar = 1
+    psi = 2
+    MPa = 3
+    Pa = 4
+    mmH2O = 5
+    mmHg = 6
+    atm = 7
+    kgcm2 = 8
+    kPa = 9
+
+
+class TemperatureUnits(ctypes.c_int):
+    C = 0
+    K = 1
+    F = 2
+
+
+class PressureGaugeError(Exception):
+    """Raised when the ESI-USB-API reports an error."""
+
+
+def load_library():
+    """
+    Load the ESI-USB-API library matching the system architecture and declare its function prototypes.
+
+    :return: The loaded ctypes library
+    """
+    if os.environ.get(SIMULATOR_ENV):
+        from device_simulator import SimulatedEsiLibrary
+        logging.info("Using the simulated ESI-USB-API library")
+        return SimulatedEsiLibrary()
+
+    is_64bit = platform.architecture()[0] == '64bit'
+    esi_api = ctypes.CDLL(LIBRARY_PATH_64BIT if is_64bit else LIBRARY_PATH_32BIT)
+
     # These declarations specify the argument types and return types of the API functions
     esi_api.FindSensors.argtypes = [ctypes.POINTER(ctypes.c_int)]
     esi_api.FindSensors.restype = ctypes.c_int
@@ -76,92 +107,127 @@ def check_pressure_gauge(repository):
     esi_api.ReleaseSensor.restype = ctypes.c_int
     esi_api.CleanUp.argtypes = []
     esi_api.CleanUp.restype = ctypes.c_int
-    # Function to find connected sensors
-    def find_sensors():
+    return esi_api
+
+
+class PressureGauge:
+    def __init__(self, sensor_index=0, library=None):
+        """
+        Initialize the pressure gauge session. The sensor is opened on the first read.
+
+        :param sensor_index: Index of the sensor to use, as enumerated by FindSensors
+        :param library: Already loaded ESI-USB-API library (optional, loaded on first open)
+        """
+        self.sensor_index = sensor_index
+        self.esi_api = library
+        self.is_open = False
+        self._lock = threading.Lock()  # The library handle is not shared between concurrent calls
+
+    def open(self):
+        """
+        Load the library (once), find the connected sensors and open the configured sensor.
+
+        :raises PressureGaugeError: If no sensor can be opened
+        """
+        if self.esi_api is None:
+            self.esi_api = load_library()
+
         sensor_count = ctypes.c_int()
-        result = esi_api.FindSensors(ctypes.byref(sensor_count))
-        if result != OK:
-            raise Exception("Failed to find sensors")
-        return sensor_count.value
-
-    # Function to get sensor information
-    def get_sensor_info(sensor_index):
-        port_number = ctypes.c_int()
-        serial_number = ctypes.create_string_buffer(100)
-        result = esi_api.GetSensorInfo(sensor_index, ctypes.byref(port_number), serial_number, 100)
-        if result != OK:
-            raise Exception("Failed to get sensor info")
-        return port_number.value, serial_number.value.decode()
-
-    # Function to use a sensor
-    def use_sensor(sensor_index):
-        result = esi_api.UseSensor(sensor_index)
-        if result != OK:
-            print("Failed to use sensor")
-
-    # Function to read pressure
-    def read_pressure(sensor_index, units, absolute, temperature):
+        if self.esi_api.FindSensors(ctypes.byref(sensor_count)) != OK:
+            raise PressureGaugeError("Failed to find sensors")
+        if sensor_count.value <= self.sensor_index:
+            raise PressureGaugeError(f"Found {sensor_count.value} sensor(s), sensor {self.sensor_index} not available")
+
+        for i in range(sensor_count.value):
+            port_number = ctypes.c_int()
+            serial_number = ctypes.create_string_buffer(100)
+            if self.esi_api.GetSensorInfo(i, ctypes.byref(port_number), serial_number, 100) == OK:
+                logging.info(f"Sensor {i}: Port={port_number.value}, Serial={serial_number.value.decode()}")
+
+        if self.esi_api.UseSensor(self.sensor_index) != OK:
+            raise PressureGaugeError("Failed to use sensor")
+        self.is_open = True
+        logging.info(f"Pressure gauge sensor {self.sensor_index} opened")
+
+    def read(self, n=1):
+        """
+        Read pressure (bar) and temperature (°C) n times in one call.
+
+        If a read fails, the sensor is released and opened again once before giving up.
+
+        :param n: Number of value pairs to read
+        :return: List of (pressure, temperature) tuples
+        :raises PressureGaugeError: If the gauge cannot be read after reconnecting
+        """
+        with self._lock:
+            try:
+                if not self.is_open:
+                    self.open()
+                return self._read_values(n)
+            except PressureGaugeError as e:
+                logging.info(f"Pressure gauge read failed: {str(e)}. Reconnecting...")
+                self._release()
+                self.open()
+                return self._read_values(n)
+
+    def close(self):
+        """Release the sensor and clean up the library."""
+        with self._lock:
+            self._release()
+
+    def _read_values(self, n):
+        values = []
         pressure = ctypes.c_float()
-        result = esi_api.Read(sensor_index, units, absolute, temperature, ctypes.byref(pressure))
-        if result != OK:
-            print("Failed to read pressure")
-        return pressure.value
-
-    # Function to read temperature
-    def read_temperature(sensor_index, units):
         temperature = ctypes.c_float()
-        result = esi_api.ReadTemperature(sensor_index, units, ctypes.byref(temperature))
-        if result != OK:
-            print("Failed to read temperature")
-        return temperature.value
-    
-    # Function to release a sensor
-    def release_sensor(sensor_index):
-        result = esi_api.ReleaseSensor(sensor_index)
-        if result != OK:
-            print("Failed to release sensor")
-    
-    # Function to clean up resources
-    def clean_up():
-        result = esi_api.CleanUp()
-        if result != OK:
-            print("Failed to clean up")
-
-    print("Usage area")
+        for _ in range(n):
+            if self.esi_api.Read(self.sensor_index, PressureUnits.bar, 0, 20.0, ctypes.byref(pressure)) != OK:
+                raise PressureGaugeError("Failed to read pressure")
+            if self.esi_api.ReadTemperature(self.sensor_index, TemperatureUnits.C, ctypes.byref(temperature)) != OK:
+                raise PressureGaugeError("Failed to read temperature")
+            values.append((pressure.value, temperature.value))
+        return values
+
+    def _release(self):
+        if self.esi_api is None or not self.is_open:
+            return
+        self.is_open = False
+        if self.esi_api.ReleaseSensor(self.sensor_index) != OK:
+            logging.info("Failed to release sensor")
+        if self.esi_api.CleanUp() != OK:
+            logging.info("Failed to clean up")
+
+
+_default_gauge = None
+
+
+def check_pressure_gauge(repository, gauge=None):
+    """
+    Read one pressure/temperature pair and store it in the database.
+
+    :param repository: Repository used to store the reading
+    :param gauge: Open PressureGauge session (optional, a module-wide session is used otherwise)
+    :return: [pressure, temperature], or (None, None) if the gauge could not be read
+    """
+    global _default_gauge
+    logging.info("Entered into check pressure gauge")
+    if gauge is None:
+        if _default_gauge is None:
+            _default_gauge = PressureGauge()
+        gauge = _default_gauge
+
     try:
-        # Find connected sensors
-        sensor_count = find_sensors()
-        print(f"Found {sensor_count} sensor(s)")
-        # Get sensor information
-        for i in range(sensor_count):
-            port, serial = get_sensor_info(i)
-            print(f"Sensor {i}: Port={port}, Serial={serial}")
-        # Use the first sensor
-        sensor_index = 0
-        use_sensor(sensor_index)
-
-        # Read pressure in bar and temperature in Celsius
-        pressure = read_pressure(sensor_index, PressureUnits.bar, 0, 20.0)
-        temperature = read_temperature(sensor_index, TemperatureUnits.C)
+        pressure, temperature = gauge.read()[0]
 
         # pressure = round(float(random.choice([29.9897, 30.09897667, 40.982937433, 50.9897987])), 2)
         # temperature = round(float(random.choice([30.930039, 40.98363343, 50.786767])), 2)
 
-        print(f"Pressure: {pressure:.2f} bar, Temperature: {temperature:.2f} °C")
-
         pressure_gauge_data = PressureGaugeData(pressure=pressure, temperature=temperature)
         repository.create_pressure_gauge_data(pressure_gauge_data)
 
-        print(f"Pressure: {pressure:.2f} bar, Temperature: {temperature:.2f} °C")
-        logging.info(f"Pressure: {pressure:.2f} bar, Temperature: {temperature:.2f} °C")
+        logging.info(f"Pressure: {pressure:.2f} bar, Temperature: {temperature:.2f} °C", extra=CONSOLE)
 
         return [pressure, temperature]
 
     except Exception as e:
-        print(f"Error: {str(e)}")
         logging.error(f"Error occurred in check_pressure_gauge: {str(e)}")
         return None, None  # Return None for both pressure and temperature
-    finally:
-        # Release the sensor and clean up
-        release_sensor(sensor_index)
-        clean_up()
@@ -7,7 +7,10 @@ inserting measurements, retrieving data, updating device information, and commit
 
 Key Class:
 - Repository:
-  - __init__(self, session): Initializes the Repository with a SQLAlchemy session object.
+  - __init__(self, session=None): Initializes the Repository (sessions are handed out per thread).
+  - session: The SQLAlchemy session of the calling thread.
+  - unit_of_work(self): Context manager committing (or rolling back) the calling thread's session.
+  - release_session(self): Closes and discards the calling thread's session, e.g. when a worker thread ends.
   - create_leakware(self, time, mode_of_measurement, measurement_type): Creates a new Leakware entry.
   - insert_data_information(self, data_information): Adds a DataInformation record.
   - insert_penn_specific_elements(self, data_penn_specific): Adds a PemSpecificElements record.
@@ -15,22 +18,31 @@ Key Class:
   - insert_specimens(self, specimens): Adds a Specimens record.
   - save_devices(self, devices): Saves the session devices.
   - get_all_specimens(self, leakware_id): Retrieves all Specimen records for a leak test.
+- get_specimen_traces(self, leakware_id): Retrieves the decoded x/y traces of all specimens of a leak test.
   - get_all_data_information(self, leakware_id, data_information_id): Retrieves a specific DataInformation record.
   - get_all_measurements_data(self, leakware_id): Retrieves all measurement data for a leak test session.
+- get_measurements_page(self, leakware_id, after_id, limit): Retrieves the next page of measurements of a leak test session.
   - update_measurement_by_id(self, measurement_id, column_name, column_value): Updates a measurement record by ID.
 - get_panel_and_location_number(self, leakware_id): Retrieves the panel and location number for a leak test session.
 - get_specification(self, leakware_id, mode_of_measurement): Retrieves the specification data for a leak test session.
 - save_report_data(self, report): Saves the report data for a leak test session.
-- delete_last_measurement(self, leakware_id): Deletes the last measurement entry for a leak test session.
-- get_device_info_by(self, name): Retrieves device information by name.
+- delete_last_measurement(self, leakware_id): Deletes the last measurement entry and returns its id.
+- get_device_info_by(self, name): Retrieves the Devices record by name (for changing it).
+- get_device_config(self, name): Returns the cached, read-only configuration of a device.
+- subscribe_device_changes(self, callback): Registers callback(name, old, new) for device configuration changes.
 - commit(self): Commits the session changes to the database.
 - close_session(self): Closes the database session.
-- update_device_info(self): Updates the device information in the database.
-- get_device_serial_info_by(self, name): Retrieves serial device information by name.
-- create_mass_flow_sensor_data(self, mass_flow_sensor_data): Creates a MassFlowSensorData record.
-- create_helium_analyzer_data(self, helium_analyzer_data): Creates a HeliumAnalyzerData record.
-- create_pressure_gauge_data(self, pressure_gauge_data): Creates a PressureGaugeData record.
-- get_sensor_data(self): Retrieves sensor data from the database.
+- update_device_info(self): Updates the device information in the database and refreshes the device cache.
+- get_device_serial_info_by(self, name): Retrieves cached serial device information by name.
+- create_mass_flow_sensor_data(self, mass_flow_sensor_data): Queues a MassFlowSensorData record.
+- create_helium_analyzer_data(self, helium_analyzer_data): Queues a HeliumAnalyzerData record.
+- create_pressure_gauge_data(self, pressure_gauge_data): Queues a PressureGaugeData record.
+- update_latest_reading(self, name, **values): Stores the latest reading of a sensor in memory.
+- get_sensor_data(self): Retrieves the latest sensor data (in-memory, O(1)).
+
+Telemetry records are written behind by a shared `TelemetryWriter` (see telemetry_writer.py), so
+they reach the database in batches, at the latest after its flush interval. `close_session` flushes
+the pending records.
 
 Dependencies:
 - logging
@@ -38,47 +50,98 @@ Dependencies:
 - sqlalchemy
 - sqlalchemy.exc
 - db_model
+- trace_archive
+- telemetry_writer
+- device_config
+- telemetry_store
+- telemetry_retention
 
 Usage:
-This module is typically imported and an instance of the Repository class is created, passing in
-a SQLAlchemy session object. The Repository instance provides a centralized interface for interacting
-with the database, abstracting away the underlying database operations and promoting code organization
-and maintainability.
+This module is typically imported and an instance of the Repository class is created. The Repository
+instance provides a centralized interface for interacting with the database, abstracting away the
+underlying database operations and promoting code organization and maintainability.
+
+Sessions are thread-local: the same Repository object can be used from the Tk main thread and from
+worker threads, and each thread works in its own session and transaction. ORM objects belong to the
+session of the thread that loaded them and should not be handed to other threads. Worker threads
+call `release_session` when they end.
 """
 # -------------------------------
 # repository.py: Data Access Layer for Leakware
 # -------------------------------
 import logging
+from contextlib import contextmanager
 
 # This file implements the Repository pattern, providing a centralized interface for 
 # interacting with the Leakware database. It encapsulates database operations, promoting
 # separation of concerns and making the rest of the application code cleaner.
 
-from sqlalchemy.orm import Session, sessionmaker, scoped_session
+from sqlalchemy.orm import Session, scoped_session
 from sqlalchemy import select, and_, desc
 from sqlalchemy.exc import NoResultFound, SQLAlchemyError
 
 from db_model import Leakware, DataInformation, Measurements, Specimens, Devices, PemSpecificElements, Report
-from db_model import PressureGaugeData, MassFlowSensorData, HeliumAnalyzerData, engine
-
-# Create a session factory
-session_factory = sessionmaker(bind=engine)
+from db_model import PressureGaugeData, MassFlowSensorData, HeliumAnalyzerData, engine, Session as session_factory
+from trace_codec import encode_trace, decode_trace, is_encoded
+from trace_archive import TraceArchiveReader, archive_path
+from telemetry_writer import TelemetryWriter
+from device_config import DeviceConfigCache
+from telemetry_store import LatestReadings
+from telemetry_retention import TelemetryRetention
+
+# Thread-local sessions from the shared session factory of db_model
 Session = scoped_session(session_factory)
 
+# Shared write-behind writer for the sensor telemetry tables
+telemetry_writer = TelemetryWriter(engine)
+
+# Keeps the telemetry tables at a bounded size (raw -> 1-minute -> 1-hour aggregates)
+telemetry_retention = TelemetryRetention(engine)
+
+# Shared in-memory copy of the devices table, refreshed by update_device_info
+device_config_cache = DeviceConfigCache(session_factory)
+
+# Shared latest reading per sensor, with one persisted snapshot row per device
+latest_readings = LatestReadings(engine)
+
 class Repository:
     # Acts as the primary interaction point with the Leakware database. 
     
-    def __init__(self, session: Session):
+    def __init__(self, session: Session = None):
         """
-        Initializes the Repository with a SQLAlchemy session object. This session 
-        manages the connection and transactions with the database.
+        Initializes the Repository. Sessions are not shared between threads: every thread
+        gets its own session from the thread-local `Session` registry on first use.
 
         Args:
-            session (Session): A SQLAlchemy session object.
-
-        self.session: Session = session
+            session (Session): Unused, kept for compatibility with older callers.
         """
-        self.session = Session()
+        self.telemetry_writer = telemetry_writer
+        self.device_config = device_config_cache
+        self.latest_readings = latest_readings
+        self._history_checked = False  # get_sensor_data falls back to the telemetry tables only once
+        if telemetry_writer.ident is None:  # Started by the first repository
+            telemetry_writer.start()
+            telemetry_retention.start()
+
+    # The session of the calling thread (created on first use).
+    @property
+    def session(self) -> Session:
+        return Session()
+
+    # Runs a block as one transaction: commits on success, rolls back and re-raises on error.
+    @contextmanager
+    def unit_of_work(self):
+        session = self.session
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+    # Closes and discards the calling thread's session; worker threads call this when they end.
+    def release_session(self):
+        Session.remove()
 
     # Creates a new Leakware entry representing a test session.
     def create_leakware(self, time, mode_of_measurement, measurement_type):
@@ -101,7 +164,7 @@ class Repository:
     # Adds a Measurements record (tied to a leak test session).
     def insert_measurement(self, measurements: Measurements):
         self.session.add(measurements)
-        #self.session.commit()
+        self.session.flush()  # Assigns measerment_Id; committed by the caller's unit of work
         return measurements
     
     # Adds a specimen record (tied to a leak test session)
@@ -114,6 +177,7 @@ class Repository:
     def save_devices(self, devices: Devices):
         self.session.add(devices)
         self.session.commit()
+        self.device_config.reload()
         return devices
     
     # Retrieves all Specimen records associated with a leak test.
@@ -132,6 +196,39 @@ class Repository:
             # Re-raise the exception for proper error handling
             raise
     
+    # Retrieves the x/y traces of all specimens of a leak test as numpy arrays.
+    # Traces in the trace archive are returned as memory-mapped views (no copy).
+    # Rows still stored as JSON are rewritten as binary blobs on the way (read-side migration).
+    def get_specimen_traces(self, leakware_id):
+        traces = []
+        upgraded = False
+        archive = None
+        for specimen in self.get_all_specimens(leakware_id):
+            if specimen.trace_length is not None:
+                if archive is None:  # Mapped once per call, it includes all records written so far
+                    archive = TraceArchiveReader(archive_path(leakware_id))
+                traces.append(archive.trace(specimen.trace_offset, specimen.trace_length))
+                continue
+            x_stored = specimen.x_data if specimen.x_data is not None else specimen.x_value
+            y_stored = specimen.y_data if specimen.y_data is not None else specimen.y_value
+            x_values = decode_trace(x_stored)
+            y_values = decode_trace(y_stored)
+            traces.append((x_values, y_values))
+
+            if not is_encoded(specimen.x_data) and specimen.x_value is not None:
+                specimen.x_data = encode_trace(x_values, delta=True)
+                specimen.y_data = encode_trace(y_values)
+                specimen.x_value = None
+                specimen.y_value = None
+                upgraded = True
+        if upgraded:
+            try:
+                self.session.commit()
+            except SQLAlchemyError as e:
+                logging.error(f"Error occurred while converting specimen traces to binary: {str(e)}")
+                self.session.rollback()
+        return traces
+
     # Retrieves a specific DataInformation record using filters.
     def get_all_data_information(self, leakware_id, data_information_id) -> DataInformation:
         stmt =\
@@ -149,21 +246,31 @@ class Repository:
         measurements_data = self.session.scalars(stmt).all()
         return measurements_data
 
-    # update measurement by id
+    # Retrieves up to `limit` measurements with an id above `after_id`, in id order (keyset paging).
+    def get_measurements_page(self, leakware_id, after_id=0, limit=100):
+        stmt = select(Measurements).filter_by(
+            leakware_id=leakware_id, active=True
+        ).where(
+            Measurements.measerment_Id > after_id
+        ).order_by(
+            Measurements.measerment_Id
+        ).limit(limit)
+        return self.session.scalars(stmt).all()
+
+    # update measurement by id (committed at once, so the edit neither holds the write lock nor gets lost)
     def update_measurement_by_id(self, measurement_id, column_name, column_value):
         try:
-            measurement = self.session.query(Measurements).filter_by(measerment_Id=measurement_id).first()
-            if measurement:
+            with self.unit_of_work() as session:
+                measurement = session.query(Measurements).filter_by(measerment_Id=measurement_id).first()
+                if measurement is None:
+                    print("Measurement with ID {} not found.".format(measurement_id))
+                    logging.error("Measurement with ID {} not found. in update_measurement_by_id in repository".format(measurement_id))
+                    return False
                 setattr(measurement, column_name, column_value)
-                #self.session.commit()
-                return True
-            else:
-                print("Measurement with ID {} not found.".format(measurement_id))
-                logging.error("Measurement with ID {} not found. in update_measurement_by_id in repository".format(measurement_id))
-                return False
+            return True
         except Exception as e:
             print("An error occurred while updating measurement:", e)
-            logging.error("An error occurred while updating measurement in update_measurement_by_id", e)
+            logging.error(f"An error occurred while updating measurement in update_measurement_by_id: {e}")
             return False
 
     # Retrieves all measurement data for a leak test session.
@@ -234,7 +341,9 @@ class Repository:
                 specimen = self.session.execute(specimen_select).scalar()
                 if specimen:
                     setattr(specimen, "active", False)
+                measurement_id = measurement.measerment_Id
                 self.session.commit()
+                return measurement_id
             else:
                 print("Measurement not found.")
         except SQLAlchemyError as e:
@@ -257,14 +366,26 @@ class Repository:
             raise
 
     def close_session(self):
+        self.telemetry_writer.flush()
+        self.latest_readings.persist()
         self.session.close()
 
     def update_device_info(self):
         self.session.commit()
+        self.device_config.reload()  # Notifies subscribers about changed devices
+
+    # Cached, read-only device configuration (no SQL query); use get_device_info_by to change a device.
+    def get_device_config(self, name):
+        return self.device_config.get(name)
+
+    def subscribe_device_changes(self, callback):
+        self.device_config.subscribe(callback)
+
+    def unsubscribe_device_changes(self, callback):
+        self.device_config.unsubscribe(callback)
 
     def get_device_serial_info_by(self, name):
-        stmt = select(Devices).filter_by(name=name)
-        device = self.session.execute(stmt).scalar()
+        device = self.get_device_config(name)
         return {
             'baudrate': device.baudrate,
             'bytesize': device.bytesize,
@@ -274,48 +395,75 @@ class Repository:
         }
 
     def create_mass_flow_sensor_data(self, mass_flow_sensor_data: MassFlowSensorData):
-        self.session.add(mass_flow_sensor_data)
-        self.session.commit()
+        self.telemetry_writer.submit(mass_flow_sensor_data)
+        self.update_latest_reading("Mass Flow Controller", sccm_value=mass_flow_sensor_data.sccm_val,
+                                   temperature=mass_flow_sensor_data.temp_v)
         return mass_flow_sensor_data
 
     def create_helium_analyzer_data(self, helium_analyzer_data: HeliumAnalyzerData):
-        self.session.add(helium_analyzer_data)
-        self.session.commit()
+        self.telemetry_writer.submit(helium_analyzer_data)
+        self.update_latest_reading("Helium Analyzer", helium=helium_analyzer_data.helium_value)
         return helium_analyzer_data
 
     def create_pressure_gauge_data(self, pressure_gauge_data: PressureGaugeData):
-        self.session.add(pressure_gauge_data)
-        self.session.commit()
+        self.telemetry_writer.submit(pressure_gauge_data)
+        self.update_latest_reading("Pressure Gauge", pressure=pressure_gauge_data.pressure,
+                                   temperature=pressure_gauge_data.temperature)
         return pressure_gauge_data
 
+    # Stores the latest reading of a device in the in-memory store (see telemetry_store.py).
+    def update_latest_reading(self, name, **values):
+        self.latest_readings.update(name, **values)
+
+    # Latest sensor values for the main window, from the in-memory store. The telemetry tables
+    # are only queried for a device that has neither a reading nor a snapshot yet.
     def get_sensor_data(self):
-        stmt = select(PressureGaugeData).order_by(desc(PressureGaugeData.pressure_gauge_data_id))
-        stmt2 = select(HeliumAnalyzerData).order_by(desc(HeliumAnalyzerData.helium_analyzer_data_id))
-        stmt3 = select(MassFlowSensorData).order_by(desc(MassFlowSensorData.mass_flow_sensor_data_id))
+        pressure_gauge = self.latest_readings.get("Pressure Gauge")
+        helium_analyzer = self.latest_readings.get("Helium Analyzer")
+        mass_flow_controller = self.latest_readings.get("Mass Flow Controller")
+        if not self._history_checked and (pressure_gauge is None or helium_analyzer is None or mass_flow_controller is None):
+            self._history_checked = True
+            self._load_latest_readings_from_history()
+            pressure_gauge = self.latest_readings.get("Pressure Gauge")
+            helium_analyzer = self.latest_readings.get("Helium Analyzer")
+            mass_flow_controller = self.latest_readings.get("Mass Flow Controller")
+
         # Initialize default values
         temperature = 0
         pressure = 0
         helium = 0
         sccm_value = 0
-        try:
-            # Executing query
-            pressure_gauge = self.session.execute(stmt).scalar()
-            helium_analyzer = self.session.execute(stmt2).scalar()
-            mass_flow_controller = self.session.execute(stmt3).scalar()
-            # Accessing data if available
-            if pressure_gauge:
-                temperature = pressure_gauge.temperature
-                pressure = pressure_gauge.pressure
-            if helium_analyzer:
-                helium = helium_analyzer.helium_value
-            if mass_flow_controller:
-                sccm_value = mass_flow_controller.sccm_val
-        except NoResultFound:
-            # Handle the case when there is no data found
-            print("No data found in the tables")
+        if pressure_gauge:
+            temperature = pressure_gauge.values.get("temperature", 0)
+            pressure = pressure_gauge.values.get("pressure", 0)
+        if helium_analyzer:
+            helium = helium_analyzer.values.get("helium", 0)
+        if mass_flow_controller:
+            sccm_value = mass_flow_controller.values.get("sccm_value", 0)
         return {
             'temperature': temperature,
             'pressure': pressure,
             'helium': helium,
             'sccm_value': sccm_value
         }
+
+    # Seeds the store from the newest telemetry rows (databases written before the snapshots existed).
+    def _load_latest_readings_from_history(self):
+        stmt = select(PressureGaugeData).order_by(desc(PressureGaugeData.pressure_gauge_data_id)).limit(1)
+        stmt2 = select(HeliumAnalyzerData).order_by(desc(HeliumAnalyzerData.helium_analyzer_data_id)).limit(1)
+        stmt3 = select(MassFlowSensorData).order_by(desc(MassFlowSensorData.mass_flow_sensor_data_id)).limit(1)
+        try:
+            pressure_gauge = self.session.execute(stmt).scalar()
+            helium_analyzer = self.session.execute(stmt2).scalar()
+            mass_flow_controller = self.session.execute(stmt3).scalar()
+        except SQLAlchemyError as e:
+            logging.error(f"Error occurred while reading the latest sensor data: {str(e)}")
+            return
+        if pressure_gauge and self.latest_readings.get("Pressure Gauge") is None:
+            self.update_latest_reading("Pressure Gauge", pressure=pressure_gauge.pressure,
+                                       temperature=pressure_gauge.temperature)
+        if helium_analyzer and self.latest_readings.get("Helium Analyzer") is None:
+            self.update_latest_reading("Helium Analyzer", helium=helium_analyzer.helium_value)
+        if mass_flow_controller and self.latest_readings.get("Mass Flow Controller") is None:
+            self.update_latest_reading("Mass Flow Controller", sccm_value=mass_flow_controller.sccm_val,
+                                       temperature=mass_flow_controller.temp_v)
@@ -0,0 +1,191 @@
+"""
+sensor_scheduler.py
+
+This module polls the auxiliary sensors of the Leakware application (mass flow controller,
+pressure gauge, Helium Analyzer) concurrently. Every device gets its own worker thread with
+its own period and timeout, so a slow or unplugged device no longer delays the others.
+
+The scheduler cannot interrupt a poll: the timeout only bounds a poll if the poll function
+passes it down to its transport. `main_page` does this for the serial devices (read and write
+timeouts of the mass flow controller port; the Helium Analyzer is read by its own reader thread,
+so its poll only reads a cache). The pressure gauge is read through the ESI DLL, whose calls
+cannot be bounded; a hung call blocks the pressure gauge thread, while the other devices keep
+polling and its reading is reported as stale.
+
+All readings are timestamped with one shared monotonic clock. A task polls on a fixed grid
+(start + k * period); if a poll overruns, the missed ticks are skipped instead of being
+caught up in a burst. A poll that takes longer than the device timeout is logged when it
+returns, and a reading older than period + timeout is reported as stale (None) by `latest`.
+
+Tk widgets must not be touched from the worker threads. The GUI reads `latest` from a Tk
+`after` loop; callbacks passed to `add` run in the worker thread and are meant for device-side
+logic (relays, flow corrections, storing telemetry).
+
+Key Classes:
+- SensorReading: Named tuple with name, value, timestamp (shared monotonic clock) and duration.
+- SensorTask: Worker thread polling one device.
+- SensorScheduler:
+  - __init__(self, clock=time.monotonic, thread_exit=None): Initializes the scheduler.
+  - add(self, name, poll_function, period, timeout, callback=None, close_function=None): Adds a device.
+  - start(self): Starts all device threads.
+  - latest(self, name): Returns the latest fresh reading of a device, or None.
+  - stop(self, timeout=None): Stops all device threads.
+
+Dependencies:
+- threading
+- time
+- logging
+- collections
+- instrumentation
+
+Usage:
+`main_page` creates one `SensorScheduler`, adds a task per available device and starts it
+together with the main window. `close()` stops the scheduler.
+"""
+import threading
+import time
+import logging
+from collections import namedtuple
+
+import instrumentation
+
+SensorReading = namedtuple("SensorReading", ["name", "value", "timestamp", "duration"])
+
+
+class SensorTask(threading.Thread):
+    def __init__(self, name, poll_function, period, timeout, clock, callback=None, close_function=None,
+                 thread_exit=None):
+        """
+        Initialize the worker thread of one device.
+
+        :param name: Device name, used for lookups and logging
+        :param poll_function: Callable returning the current value, or None if nothing was read
+        :param period: Seconds between the start of two polls
+        :param timeout: Seconds a poll may take; longer polls are logged when they return.
+            The poll function is expected to bound its transport calls with this timeout
+        :param clock: Shared monotonic clock
+        :param callback: Called with each SensorReading in the worker thread (optional)
+        :param close_function: Called in the worker thread when the task stops (optional)
+        :param thread_exit: Called last in the worker thread, e.g. to release its database session (optional)
+        """
+        super().__init__(name=f"SensorTask-{name}", daemon=True)
+        self.device_name = name
+        self.poll_function = poll_function
+        self.period = float(period)
+        self.timeout = float(timeout)
+        self.clock = clock
+        self.callback = callback
+        self.close_function = close_function
+        self.thread_exit = thread_exit
+        self._latest = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def run(self):
+        next_due = self.clock()
+        try:
+            while not self._stopped.is_set():
+                started = self.clock()
+                try:
+                    value = self.poll_function()
+                except Exception as e:
+                    logging.error(f"Error occurred while polling {self.device_name}: {str(e)}")
+                    value = None
+                finished = self.clock()
+                duration = finished - started
+                instrumentation.record(f"sensor.{self.device_name}", duration)
+                if duration > self.timeout:
+                    logging.warning(f"Polling {self.device_name} took {duration:.3f} s (timeout {self.timeout} s)")
+
+                if value is not None:
+                    reading = SensorReading(self.device_name, value, finished, duration)
+                    with self._lock:
+                        self._latest = reading
+                    if self.callback is not None:
+                        try:
+                            self.callback(reading)
+                        except Exception as e:
+                            logging.error(f"Error occurred while handling {self.device_name} reading: {str(e)}")
+
+                next_due += self.period
+                if next_due < finished:
+                    next_due = finished  # Skip missed ticks instead of polling in a burst
+                self._stopped.wait(max(0.0, next_due - self.clock()))
+        finally:
+            if self.close_function is not None:
+                try:
+                    self.close_function()
+                except Exception as e:
+                    logging.error(f"Error occurred while closing {self.device_name}: {str(e)}")
+            if self.thread_exit is not None:
+                self.thread_exit()
+
+    def latest(self):
+        """Return the latest reading, or None if there is none or it is stale."""
+        with self._lock:
+            reading = self._latest
+        if reading is None or self.clock() - reading.timestamp > self.period + self.timeout:
+            return None
+        return reading
+
+    def stop(self):
+        """Ask the task to stop after the current poll."""
+        self._stopped.set()
+
+
+class SensorScheduler:
+    def __init__(self, clock=time.monotonic, thread_exit=None):
+        """
+        Initialize the scheduler.
+
+        :param clock: Monotonic clock shared by all device tasks
+        :param thread_exit: Called at the end of every device thread (optional)
+        """
+        self.clock = clock
+        self.thread_exit = thread_exit
+        self.tasks = {}
+        self._started = False
+
+    def add(self, name, poll_function, period, timeout, callback=None, close_function=None):
+        """
+        Add a device to poll. Devices added after `start` are started immediately.
+
+        :return: The SensorTask of the device
+        """
+        if name in self.tasks:
+            raise ValueError(f"Sensor {name} is already scheduled")
+        task = SensorTask(name, poll_function, period, timeout, self.clock, callback, close_function,
+                          self.thread_exit)
+        self.tasks[name] = task
+        if self._started:
+            task.start()
+        return task
+
+    def start(self):
+        """Start polling all devices."""
+        self._started = True
+        for task in self.tasks.values():
+            if not task.is_alive():
+                task.start()
+
+    def latest(self, name):
+        """
+        Return the latest fresh reading of a device.
+
+        :param name: Device name
+        :return: SensorReading, or None if the device is unknown, has no reading or it is stale
+        """
+        task = self.tasks.get(name)
+        return task.latest() if task is not None else None
+
+    def stop(self, timeout=None):
+        """
+        Stop all device tasks and wait for them to finish.
+
+        :param timeout: Maximum seconds to wait per task (None waits until the current poll returns)
+        """
+        for task in self.tasks.values():
+            task.stop()
+        for task in self.tasks.values():
+            if task.is_alive():
+                task.join(timeout)
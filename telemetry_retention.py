@@ -0,0 +1,226 @@
+"""
+telemetry_retention.py
+
+This module keeps the telemetry history (pressure gauge, Helium Analyzer and mass flow controller
+tables) at a bounded size. A background thread periodically:
+1. rolls raw readings older than the raw retention window into 1-minute min/mean/max aggregates
+   (`telemetry_1m`) and deletes them,
+2. rolls 1-minute aggregates older than the minute retention window into 1-hour aggregates
+   (`telemetry_1h`) and deletes them,
+3. returns freed pages to the file system with `PRAGMA incremental_vacuum`, a few pages at a time.
+
+Aggregates are merged with an upsert (counts add up, the mean is weighted by the count), so rolling
+up the same bucket twice is harmless. The work is split into chunks of one day per transaction, so
+the first run on a large database does not lock it for long. Times are compared in UTC, like the
+`created_at` column of the telemetry tables.
+
+Incremental vacuum needs `auto_vacuum=INCREMENTAL`. New databases get it from `db_model.SQLITE_PRAGMAS`.
+Converting an existing database takes a full VACUUM, which rewrites the whole file and locks it, so it is
+never done by the background thread: it is an explicit offline step (`enable_incremental_vacuum`, see
+Usage). Until then, step 3 is skipped.
+
+Key Classes:
+- TelemetryRetention:
+  - __init__(self, engine, raw_retention, minute_retention, interval, vacuum_pages): Initializes the engine.
+  - run_once(self, now=None): Applies the retention policy once and returns the number of rolled-up rows.
+  - close(self, timeout=None): Stops the background thread.
+
+Key Functions:
+- enable_incremental_vacuum(engine): Converts an existing database to auto_vacuum=INCREMENTAL (full VACUUM).
+
+Dependencies:
+- argparse
+- threading
+- logging
+- datetime
+- sqlalchemy
+
+Usage:
+`repository` creates one shared `TelemetryRetention` on the database engine and starts it together
+with the telemetry writer. To convert an existing database, close the application and run in its directory:
+    python telemetry_retention.py --enable-incremental-vacuum
+"""
+import argparse
+import threading
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.exc import SQLAlchemyError
+
+DEFAULT_RAW_RETENTION = timedelta(days=7)
+DEFAULT_MINUTE_RETENTION = timedelta(days=90)
+DEFAULT_INTERVAL = 3600  # Seconds between two retention runs
+INITIAL_DELAY = 60  # Seconds after start before the first run, so it does not slow down startup
+DEFAULT_VACUUM_PAGES = 500  # Pages returned to the file system per run
+CHUNK = timedelta(days=1)  # Time span rolled up per transaction
+
+# Telemetry tables and the columns that are aggregated
+SOURCES = {
+    "pressure_gauge_data": ("pressure", "temperature"),
+    "helium_analyzer_data": ("helium_value",),
+    "mass_flow_sensor_data": ("psi_v", "temp_v", "ccm_v", "sccm_val"),
+}
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+MINUTE_BUCKET = "%Y-%m-%d %H:%M:00"
+HOUR_BUCKET = "%Y-%m-%d %H:00:00"
+
+MERGE_AGGREGATE = """
+ON CONFLICT (source, metric, bucket_start) DO UPDATE SET
+    mean_value = (mean_value * sample_count + excluded.mean_value * excluded.sample_count)
+                 / (sample_count + excluded.sample_count),
+    sample_count = sample_count + excluded.sample_count,
+    min_value = MIN(min_value, excluded.min_value),
+    max_value = MAX(max_value, excluded.max_value)
+"""
+
+
+class TelemetryRetention(threading.Thread):
+    def __init__(self, engine, raw_retention=DEFAULT_RAW_RETENTION, minute_retention=DEFAULT_MINUTE_RETENTION,
+                 interval=DEFAULT_INTERVAL, vacuum_pages=DEFAULT_VACUUM_PAGES):
+        """
+        Initialize the retention engine. Call start() to run it in the background.
+
+        :param engine: SQLAlchemy engine of the database
+        :param raw_retention: How long raw readings are kept (timedelta)
+        :param minute_retention: How long 1-minute aggregates are kept (timedelta)
+        :param interval: Seconds between two runs
+        :param vacuum_pages: Maximum number of free pages returned to the file system per run
+        """
+        super().__init__(name="TelemetryRetention", daemon=True)
+        self.engine = engine
+        self.raw_retention = raw_retention
+        self.minute_retention = minute_retention
+        self.interval = interval
+        self.vacuum_pages = vacuum_pages
+        self._closed = threading.Event()
+        self._vacuum_skipped = False
+
+    def run(self):
+        if self._closed.wait(INITIAL_DELAY):
+            return
+        while True:
+            try:
+                self.run_once()
+            except SQLAlchemyError as e:
+                logging.error(f"Error occurred while applying telemetry retention: {str(e)}")
+            if self._closed.wait(self.interval):
+                return
+
+    def close(self, timeout=None):
+        """Stop the background thread (a running chunk is finished first)."""
+        self._closed.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def run_once(self, now=None):
+        """
+        Apply the retention policy once.
+
+        :param now: Current UTC time (naive datetime), defaults to the current time
+        :return: Number of raw rows and 1-minute aggregates that were rolled up
+        """
+        now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+        raw_cutoff = floor_hour(now - self.raw_retention)
+        minute_cutoff = floor_hour(now - self.minute_retention)
+
+        rolled = 0
+        for table, metrics in SOURCES.items():
+            rolled += self._roll_up(table, "created_at", raw_cutoff,
+                                    lambda connection, start, end: self._raw_to_minutes(connection, table, metrics, start, end))
+        rolled += self._roll_up("telemetry_1m", "bucket_start", minute_cutoff, self._minutes_to_hours)
+        if rolled:
+            logging.info(f"Telemetry retention rolled up {rolled} row(s)")
+        self._vacuum()
+        return rolled
+
+    def _roll_up(self, table, time_column, cutoff, roll_chunk):
+        with self.engine.connect() as connection:
+            oldest = connection.exec_driver_sql(f"SELECT MIN({time_column}) FROM {table}").scalar()
+        if oldest is None:
+            return 0
+        start = floor_hour(datetime.fromisoformat(str(oldest)))
+        rolled = 0
+        while start < cutoff and not self._closed.is_set():
+            end = min(start + CHUNK, cutoff)
+            with self.engine.begin() as connection:
+                rolled += roll_chunk(connection, start.strftime(TIME_FORMAT), end.strftime(TIME_FORMAT))
+            start = end
+        return rolled
+
+    def _raw_to_minutes(self, connection, table, metrics, start, end):
+        for metric in metrics:
+            connection.exec_driver_sql(
+                f"INSERT INTO telemetry_1m (source, metric, bucket_start, sample_count, min_value, mean_value, max_value) "
+                f"SELECT ?, ?, strftime('{MINUTE_BUCKET}', created_at), COUNT({metric}), MIN({metric}), AVG({metric}), MAX({metric}) "
+                f"FROM {table} WHERE created_at >= ? AND created_at < ? "
+                f"GROUP BY 3 HAVING COUNT({metric}) > 0 " + MERGE_AGGREGATE,
+                (table, metric, start, end)
+            )
+        return connection.exec_driver_sql(
+            f"DELETE FROM {table} WHERE created_at >= ? AND created_at < ?", (start, end)
+        ).rowcount
+
+    def _minutes_to_hours(self, connection, start, end):
+        connection.exec_driver_sql(
+            f"INSERT INTO telemetry_1h (source, metric, bucket_start, sample_count, min_value, mean_value, max_value) "
+            f"SELECT source, metric, strftime('{HOUR_BUCKET}', bucket_start), SUM(sample_count), MIN(min_value), "
+            f"SUM(mean_value * sample_count) / SUM(sample_count), MAX(max_value) "
+            f"FROM telemetry_1m WHERE bucket_start >= ? AND bucket_start < ? "
+            f"GROUP BY source, metric, 3 " + MERGE_AGGREGATE,
+            (start, end)
+        )
+        return connection.exec_driver_sql(
+            "DELETE FROM telemetry_1m WHERE bucket_start >= ? AND bucket_start < ?", (start, end)
+        ).rowcount
+
+    def _vacuum(self):
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:  # 2 = INCREMENTAL
+                if not self._vacuum_skipped:
+                    logging.info("Database without incremental auto vacuum, freed pages are not returned to the file "
+                                 "system. Run 'python telemetry_retention.py --enable-incremental-vacuum' offline.")
+                    self._vacuum_skipped = True
+                return
+            if connection.exec_driver_sql("PRAGMA freelist_count").scalar():
+                # The pragma frees one page per step; executescript runs it to the end
+                connection.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)});")
+
+
+def floor_hour(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def enable_incremental_vacuum(engine):
+    """
+    Convert an existing database to auto_vacuum=INCREMENTAL. This runs a full VACUUM, which rewrites
+    the whole database file; only call it while no other process or thread uses the database.
+
+    :param engine: SQLAlchemy engine of the database
+    :return: True if the database was converted, False if it already used incremental auto vacuum
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+            return False
+        connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        connection.exec_driver_sql("VACUUM")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leakware telemetry retention maintenance")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="Convert the database to incremental auto vacuum (full VACUUM; close the application first)")
+    args = parser.parse_args()
+    if not args.enable_incremental_vacuum:
+        parser.print_help()
+        return
+    from db_model import engine
+    if enable_incremental_vacuum(engine):
+        print("The database now uses incremental auto vacuum.")
+    else:
+        print("The database already uses incremental auto vacuum.")
+
+
+if __name__ == "__main__":
+    main()
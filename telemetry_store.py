@@ -0,0 +1,130 @@
+"""
+telemetry_store.py
+
+This module keeps the latest reading of every sensor (pressure gauge, Helium Analyzer, mass flow
+controller) in memory. The pollers update it directly, and `Repository.get_sensor_data` reads it
+in O(1) instead of querying the ever-growing telemetry tables.
+
+Persistence is optional: with an engine, the store writes a single-row snapshot per device into
+the `sensor_snapshots` table (upsert), at most every `persist_interval` seconds and on `persist()`.
+On startup the snapshots are loaded back, so the main window shows the last known values.
+
+Key Classes:
+- LatestReading: Named tuple with the values (dict) and the wall-clock time of a reading.
+- LatestReadings:
+  - __init__(self, engine=None, persist_interval): Initializes the store.
+  - update(self, name, **values): Stores the latest reading of a device.
+  - get(self, name): Returns the LatestReading of a device, or None.
+  - load(self): Loads the persisted snapshots (once).
+  - persist(self): Writes the snapshots of the devices updated since the last write.
+
+Dependencies:
+- threading
+- time
+- logging
+- datetime
+- collections
+- sqlalchemy
+- db_model
+
+Usage:
+`repository` creates one shared `LatestReadings` store on the database engine. The
+`Repository.create_*_data` methods and the sensor pollers in `main_page` update it through
+`Repository.update_latest_reading`.
+"""
+import threading
+import time
+import logging
+from datetime import datetime
+from collections import namedtuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from db_model import SensorSnapshot
+
+DEFAULT_PERSIST_INTERVAL = 30  # Seconds between two snapshot writes
+
+LatestReading = namedtuple("LatestReading", ["values", "updated_at"])
+
+
+class LatestReadings:
+    def __init__(self, engine=None, persist_interval=DEFAULT_PERSIST_INTERVAL):
+        """
+        Initialize the store.
+
+        :param engine: SQLAlchemy engine for the snapshots, None to keep the readings in memory only
+        :param persist_interval: Minimum seconds between two snapshot writes triggered by update()
+        """
+        self.engine = engine
+        self.persist_interval = persist_interval
+        self._readings = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._persist_lock = threading.Lock()
+        self._loaded = engine is None
+        self._next_persist = time.monotonic() + persist_interval
+
+    def update(self, name, **values):
+        """
+        Store the latest reading of a device.
+
+        :param name: Device name, e.g. "Pressure Gauge"
+        :param values: Values of the reading, e.g. pressure=30.1, temperature=21.5
+        """
+        with self._lock:
+            self._readings[name] = LatestReading(values, datetime.now())
+            self._dirty.add(name)
+        if self.engine is not None and time.monotonic() >= self._next_persist:
+            self.persist()
+
+    def get(self, name):
+        """
+        Return the latest reading of a device.
+
+        :param name: Device name
+        :return: LatestReading, or None if the device was never read
+        """
+        if not self._loaded:
+            self.load()
+        return self._readings.get(name)
+
+    def load(self):
+        """Load the persisted snapshots once; readings updated since then are kept."""
+        if self._loaded:
+            return
+        try:
+            with self.engine.connect() as connection:
+                rows = connection.execute(select(SensorSnapshot.name, SensorSnapshot.data, SensorSnapshot.updated_at)).all()
+        except SQLAlchemyError as e:
+            logging.error(f"Error occurred while loading sensor snapshots: {str(e)}")
+            return
+        with self._lock:
+            for name, data, updated_at in rows:
+                self._readings.setdefault(name, LatestReading(data or {}, updated_at))
+            self._loaded = True
+
+    def persist(self):
+        """Write the snapshots of all devices updated since the last write."""
+        if self.engine is None or not self._persist_lock.acquire(blocking=False):
+            return  # Another thread is writing the snapshots already
+        try:
+            with self._lock:
+                rows = [{"name": name, "data": self._readings[name].values, "updated_at": self._readings[name].updated_at}
+                        for name in self._dirty]
+                self._dirty.clear()
+                self._next_persist = time.monotonic() + self.persist_interval
+            if not rows:
+                return
+            stmt = sqlite_insert(SensorSnapshot.__table__)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["name"],
+                set_={"data": stmt.excluded.data, "updated_at": stmt.excluded.updated_at}
+            )
+            with self.engine.begin() as connection:
+                connection.execute(stmt, rows)
+        except SQLAlchemyError as e:
+            logging.error(f"Error occurred while writing sensor snapshots: {str(e)}")
+        finally:
+            self._persist_lock.release()
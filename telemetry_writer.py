@@ -0,0 +1,202 @@
+"""
+telemetry_writer.py
+
+This module persists sensor telemetry (pressure gauge, Helium Analyzer and mass flow controller
+readings) write-behind. Instead of one `session.add()` + `session.commit()` (and one SQLite fsync)
+per reading, rows are queued in memory and a background thread inserts them in batches with a
+single executemany per table and transaction.
+
+Flush policy:
+- A batch is written as soon as `flush_rows` rows are pending, or `flush_interval_ms` after the
+  first pending row arrived, whichever comes first.
+- The queue is bounded by `max_queue` rows. When it is full (e.g. the database is locked for a
+  long time), new rows are dropped and counted instead of blocking the sensor threads.
+- `flush()` writes everything queued so far and waits for it; `close()` writes the remaining rows
+  and stops the thread, so nothing is lost on shutdown.
+
+Timestamps (`created_at`, `updated_at`) are taken when a row is queued, not when it is written,
+so batching does not shift the time of a reading. They are stored in UTC like the `func.now()`
+server default of the telemetry tables.
+
+Key Classes:
+- TelemetryWriter:
+  - __init__(self, engine, flush_rows, flush_interval_ms, max_queue): Initializes the writer.
+  - submit(self, row): Queues an ORM telemetry object (MassFlowSensorData, ...) for insertion.
+  - flush(self, timeout=None): Writes all queued rows and waits until they are committed.
+  - close(self, timeout=None): Writes the remaining rows and stops the writer thread.
+
+Dependencies:
+- threading
+- queue
+- time
+- logging
+- datetime
+- sqlalchemy
+
+Usage:
+`repository` creates one shared `TelemetryWriter` on the database engine. The
+`Repository.create_*_data` methods submit rows to it, and `Repository.close_session` flushes it.
+"""
+import threading
+import queue
+import time
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect
+from sqlalchemy.exc import SQLAlchemyError
+
+DEFAULT_FLUSH_ROWS = 100
+DEFAULT_FLUSH_INTERVAL_MS = 2000
+DEFAULT_MAX_QUEUE = 10000
+
+_FLUSH = object()  # Control item: write pending rows, then set the attached event
+_STOP = object()  # Control item: write pending rows, then stop the thread
+
+
+class TelemetryWriter(threading.Thread):
+    def __init__(self, engine, flush_rows=DEFAULT_FLUSH_ROWS, flush_interval_ms=DEFAULT_FLUSH_INTERVAL_MS,
+                 max_queue=DEFAULT_MAX_QUEUE):
+        """
+        Initialize the telemetry writer. Call start() to begin writing in the background.
+
+        :param engine: SQLAlchemy engine the rows are inserted with
+        :param flush_rows: Number of pending rows that triggers a write
+        :param flush_interval_ms: Maximum time a row stays pending before it is written
+        :param max_queue: Maximum number of queued rows; further rows are dropped
+        """
+        super().__init__(name="TelemetryWriter", daemon=True)
+        self.engine = engine
+        self.flush_rows = max(1, int(flush_rows))
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+
+    def submit(self, row):
+        """
+        Queue a telemetry row for insertion. Never blocks the caller.
+
+        :param row: Unsaved ORM object of a telemetry table (e.g. PressureGaugeData)
+        :return: True if the row was queued, False if it was dropped
+        """
+        if self._closed:
+            logging.error(f"Telemetry writer is closed, {type(row).__name__} row dropped")
+            return False
+        table, values = row_values(row)
+        try:
+            self._queue.put_nowait((table, values))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logging.error(f"Telemetry queue full, {self.dropped} row(s) dropped so far")
+            return False
+
+    def flush(self, timeout=None):
+        """
+        Write all rows queued so far and wait until they are committed.
+
+        :param timeout: Maximum seconds to wait (None waits until done)
+        :return: True if the rows were written within the timeout
+        """
+        if not self.is_alive():
+            self._write(self._drain())
+            return True
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        """
+        Write the remaining rows and stop the writer thread.
+
+        :param timeout: Maximum seconds to wait for the thread (None waits until done)
+        """
+        self._closed = True
+        if self.is_alive():
+            self._queue.put((_STOP, None))
+            self.join(timeout)
+        if not self.is_alive():
+            self._write(self._drain())  # Rows left if the thread never ran or died
+
+    def run(self):
+        pending = []
+        deadline = None
+        while True:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                item = None
+
+            if item is not None and item[0] is _STOP:
+                self._write(pending)
+                return
+            if item is not None and item[0] is _FLUSH:
+                self._write(pending)
+                pending, deadline = [], None
+                item[1].set()
+                continue
+            if item is not None:
+                pending.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if len(pending) >= self.flush_rows or (deadline is not None and time.monotonic() >= deadline):
+                self._write(pending)
+                pending, deadline = [], None
+
+    def _drain(self):
+        rows = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return rows
+            if item[0] is _FLUSH:
+                item[1].set()
+            elif item[0] is not _STOP:
+                rows.append(item)
+
+    def _write(self, rows):
+        if not rows:
+            return
+        by_table = {}
+        for table, values in rows:
+            by_table.setdefault(table, []).append(values)
+        try:
+            with self.engine.begin() as connection:
+                for table, table_rows in by_table.items():
+                    connection.execute(table.insert(), table_rows)  # executemany
+            self.written += len(rows)
+        except SQLAlchemyError as e:
+            self.dropped += len(rows)
+            logging.error(f"Error occurred while writing {len(rows)} telemetry row(s): {str(e)}")
+
+
+def row_values(row):
+    """
+    Convert an unsaved ORM object into its table and a complete column/value dict.
+
+    Every row of a table gets the same keys, as executemany requires. Unset columns fall back to
+    their scalar default, and the timestamps are set to the current UTC time.
+
+    :param row: Unsaved ORM object
+    :return: Tuple (table, values)
+    """
+    mapper = inspect(type(row))
+    table = mapper.local_table
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    values = {}
+    for column in table.columns:
+        if column.primary_key:
+            continue
+        value = getattr(row, mapper.get_property_by_column(column).key, None)
+        if value is None and column.key in ("created_at", "updated_at"):
+            value = now
+        elif value is None and column.default is not None and column.default.is_scalar:
+            value = column.default.arg
+        values[column.key] = value
+    return table, values
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# The application modules live in the repository root and are imported as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# db_model creates leak_ware_db.db in the working directory when it is imported; keep it out of the tree
+os.chdir(tempfile.mkdtemp(prefix="leakware-tests-"))
@@ -0,0 +1,48 @@
+import pytest
+import pyarrow.dataset as ds
+
+from db_model import Base, Leakware, Measurements, Specimens, make_engine
+from data_export import export_data
+from trace_codec import encode_trace
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'export.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for leakware_id in (1, 2):
+            connection.execute(Leakware.__table__.insert().values(leakware_id=leakware_id))
+            connection.execute(Measurements.__table__.insert().values(
+                measerment_Id=leakware_id, leakware_id=leakware_id, value_mbarl_second=1e-9))
+            connection.execute(Specimens.__table__.insert().values(
+                specimen_id=leakware_id, leakware_id=leakware_id, measerment_Id=leakware_id,
+                x_data=encode_trace([0.0, 0.5, 1.0]), y_data=encode_trace([1e-9, 2e-9, 3e-9])))
+    yield engine
+    engine.dispose()
+
+
+def test_session_exports_stay_out_of_the_datasets(engine, tmp_path):
+    directory = tmp_path / "out"
+    export_data(engine, directory)
+    export_data(engine, directory, full=True)
+    export_data(engine, directory, leakware_ids=[1], file_format="feather")
+    export_data(engine, directory, leakware_ids=[1], file_format="feather")
+    export_data(engine, directory, full=True)
+
+    assert ds.dataset(directory / "traces").to_table().num_rows == 6
+    assert ds.dataset(directory / "measurements").to_table().num_rows == 2
+    sessions = ds.dataset(directory / "sessions-1" / "traces", format="feather").to_table()
+    assert sessions.num_rows == 3
+    assert set(sessions.column("leakware_id").to_pylist()) == {1}
+
+
+def test_incremental_export_keeps_the_format(engine, tmp_path):
+    directory = tmp_path / "out"
+    export_data(engine, directory)
+    with pytest.raises(ValueError):
+        export_data(engine, directory, file_format="feather")
+
+    export_data(engine, directory, file_format="feather", full=True)
+    export_data(engine, directory, file_format="feather")
+    assert ds.dataset(directory / "traces", format="feather").to_table().num_rows == 6
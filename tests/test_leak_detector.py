@@ -0,0 +1,65 @@
+import math
+
+from device_simulator import UL1000Emulator, SimulationProfile, make_transport
+from leak_detector import LeakRatePoller, TERMINATOR, MAX_DEADLINE
+
+
+class NumberingUL1000(UL1000Emulator):
+    """Answers the n-th *read? with n, so a response that belongs to an earlier request is recognised."""
+    def handle(self, command):
+        if command.lower() == b"*read?":
+            return str(self.commands).encode() + TERMINATOR
+        return super().handle(command)
+
+
+class CountingPort:
+    """Wraps a LoopbackSerial and counts the *read? requests written to it."""
+    def __init__(self, port):
+        self._port = port
+        self.requests = 0
+
+    def write(self, data):
+        self.requests += data.count(b"*read?")
+        return self._port.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._port, name)
+
+    def __setattr__(self, name, value):
+        if name in ("_port", "requests"):
+            super().__setattr__(name, value)
+        else:
+            setattr(self._port, name, value)
+
+
+def read_checked(poller, port, samples):
+    """Read samples and check that each one answers the latest request; returns the valid values."""
+    values = []
+    for _ in range(samples):
+        value = poller.read_sample()
+        if math.isnan(value):
+            continue
+        pipelined = 1 if poller.request_pending else 0
+        assert value == port.requests - pipelined, "response of an earlier request returned as sample"
+        values.append(value)
+    return values
+
+
+def test_slow_device_widens_deadline_and_discards_late_responses():
+    profile = SimulationProfile(latency=0.001, jitter=0.0, seed=1)
+    emulator = NumberingUL1000(make_transport("loopback"), profile)
+    emulator.start()
+    port = CountingPort(emulator.transport.host)
+    poller = LeakRatePoller(port, sample_rate=20)
+    try:
+        assert len(read_checked(poller, port, 20)) == 20
+        fast_deadline = poller.deadline
+        assert fast_deadline < 0.06
+
+        profile.latency = 0.06  # The device slows down during the measurement
+        values = read_checked(poller, port, 40)
+        assert poller.deadline > 0.06
+        assert poller.deadline <= MAX_DEADLINE
+        assert len(values) >= 30  # Only the samples up to the back-off are lost
+    finally:
+        emulator.close()
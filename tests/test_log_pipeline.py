@@ -0,0 +1,24 @@
+import logging
+
+from log_pipeline import RepeatFilter
+
+
+def make_record(level, lineno=10):
+    return logging.LogRecord("leakware", level, "sensor.py", lineno, "reading failed", None, None)
+
+
+def test_repeated_info_records_are_suppressed():
+    now = [0.0]
+    repeat_filter = RepeatFilter(burst=2, interval=60, clock=lambda: now[0])
+    assert [repeat_filter.filter(make_record(logging.INFO)) for _ in range(4)] == [True, True, False, False]
+
+    now[0] = 61.0
+    record = make_record(logging.INFO)
+    assert repeat_filter.filter(record)
+    assert "(2 similar message(s) suppressed)" in record.getMessage()
+
+
+def test_warnings_and_errors_are_never_suppressed():
+    repeat_filter = RepeatFilter(burst=1, interval=60, clock=lambda: 0.0)
+    for level in (logging.WARNING, logging.ERROR):
+        assert all(repeat_filter.filter(make_record(level, lineno=20)) for _ in range(5))
@@ -0,0 +1,64 @@
+import re
+
+import pytest
+from sqlalchemy import select, desc
+from sqlalchemy.schema import CreateTable
+
+from db_model import Base, Measurements, Specimens, PressureGaugeData, MIGRATIONS, make_engine, run_migrations
+
+LEAKWARE_ID = 1
+MEASUREMENT_ID = 1
+INDEX_MIGRATION = 3  # migration_3_query_indexes
+
+# The hot repository queries (mirroring repository.py) and the index each one must use
+QUERIES = [
+    ("get_all_measurements_data", "ix_measurements_leakware_active_id",
+     select(Measurements).filter_by(leakware_id=LEAKWARE_ID, active=True)),
+    ("get_panel_and_location_number", "ix_measurements_leakware_active_id",
+     select(Measurements).filter_by(leakware_id=LEAKWARE_ID, active=True).order_by(desc(Measurements.measerment_Id))),
+    ("get_measurements_page", "ix_measurements_leakware_active_id",
+     select(Measurements).filter_by(leakware_id=LEAKWARE_ID, active=True)
+     .where(Measurements.measerment_Id > 0).order_by(Measurements.measerment_Id).limit(100)),
+    ("get_all_specimens", "ix_specimens_leakware_measurement",
+     select(Specimens).filter_by(leakware_id=LEAKWARE_ID, active=True)),
+    ("delete_last_measurement", "ix_specimens_leakware_measurement",
+     select(Specimens).filter_by(leakware_id=LEAKWARE_ID, measerment_Id=MEASUREMENT_ID, active=True)),
+    ("telemetry_time_range", "ix_pressure_gauge_data_created_at",
+     select(PressureGaugeData).where(PressureGaugeData.created_at >= "2024-01-01")),
+]
+
+FULL_SCAN = re.compile(r"^SCAN \w+$")  # SQLite reports a table scan without index as "SCAN <table>"
+
+
+def query_plan(connection, statement):
+    sql = str(statement.compile(connection.engine, compile_kwargs={"literal_binds": True}))
+    return [row[-1] for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + sql)]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # Schema as it was before the indexes were added: the tables without any index, at user_version 2
+    engine = make_engine(f"sqlite:///{tmp_path / 'plans.db'}")
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            connection.execute(CreateTable(table))
+        connection.exec_driver_sql(f"PRAGMA user_version = {INDEX_MIGRATION - 1}")
+    yield engine
+    engine.dispose()
+
+
+def test_fixture_has_no_indexes_before_migration(engine):
+    with engine.connect() as connection:
+        plans = {index: query_plan(connection, statement) for _, index, statement in QUERIES}
+    assert not [plan for index, plan in plans.items() if any(index in detail for detail in plan)]
+    assert any(FULL_SCAN.match(detail) for plan in plans.values() for detail in plan)
+
+
+@pytest.mark.parametrize("name, index, statement", QUERIES, ids=[query[0] for query in QUERIES])
+def test_migrated_queries_use_index(engine, name, index, statement):
+    run_migrations(engine)
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA user_version").scalar() == MIGRATIONS[-1][0]
+        plan = query_plan(connection, statement)
+    assert not [detail for detail in plan if FULL_SCAN.match(detail)], f"{name} scans a table: {plan}"
+    assert any(index in detail for detail in plan), f"{name} does not use {index}: {plan}"
@@ -0,0 +1,187 @@
+"""
+trace_archive.py
+
+This module stores the raw leak rate samples of a leak test session in an append-only,
+memory-mapped file, one file per session (`trace_archive/leakware_<id>.lwta`). The acquisition
+worker appends every sample as it arrives, so a running measurement no longer has to be kept
+in Python lists and saving it does not copy the trace into the database. A `Specimens` row only
+references its part of the file by record offset and length.
+
+File layout (little-endian):
+- 64 bytes header:
+  - 4 bytes  magic b"LWTA"
+  - 2 bytes  format version
+  - 2 bytes  record size (16)
+  - 8 bytes  leakware id
+  - 8 bytes  number of valid records
+  - padding
+- records: (t, value) pairs of float64; t is in seconds since the origin set with `start_segment`
+
+The file grows in chunks of `grow_records` records; the record count in the header tells how
+many records are valid. A record is written before the count is advanced, so a reader never
+sees a partially written record (same single-writer contract as `acquisition.LeakRateBuffer`).
+
+Readers slice traces out of the file with `numpy.memmap`; the returned arrays are views of the
+mapped file, not copies.
+
+Key Functions:
+- archive_path(leakware_id, directory): Returns the path of the trace archive of a session.
+- read_trace(leakware_id, offset, length, directory): Returns one trace of an archive as (t, value) views.
+
+Key Classes:
+- TraceArchiveWriter:
+  - __init__(self, leakware_id, directory, grow_records): Opens (or creates) the archive of a session.
+  - start_segment(self, origin): Sets the time origin of the following samples.
+  - append(self, timestamp, value): Appends a sample (acquisition worker only).
+  - count: Number of records written so far.
+  - trace(self, offset, length): Returns a slice of the archive as (t, value) views.
+  - flush(self): Writes the mapped pages to disk.
+- TraceArchiveReader:
+  - __init__(self, path): Maps the valid records of an archive read-only.
+  - trace(self, offset, length): Returns a slice of the archive as (t, value) views.
+
+Dependencies:
+- os
+- struct
+- numpy
+
+Usage:
+`main_page` creates a `TraceArchiveWriter` for its session and hands it to the acquisition worker.
+`Repository.get_specimen_traces` reads the referenced traces with a `TraceArchiveReader`, so the
+comparison window and the PDF report get memory-mapped arrays.
+"""
+import os
+import struct
+
+import numpy as np
+
+TRACE_ARCHIVE_DIR = "trace_archive"
+MAGIC = b"LWTA"
+VERSION = 1
+HEADER = struct.Struct("<4sHHqQ")
+HEADER_SIZE = 64
+COUNT_OFFSET = 16  # Byte offset of the record count in the header
+RECORD = np.dtype([("t", "<f8"), ("value", "<f8")])
+DEFAULT_GROW_RECORDS = 2 ** 16  # 1 MiB per growth step
+
+
+def archive_path(leakware_id, directory=TRACE_ARCHIVE_DIR):
+    return os.path.join(directory, f"leakware_{leakware_id}.lwta")
+
+
+def read_header(path):
+    with open(path, "rb") as file:
+        magic, version, record_size, leakware_id, count = HEADER.unpack(file.read(HEADER.size))
+    if magic != MAGIC or version != VERSION or record_size != RECORD.itemsize:
+        raise ValueError(f"Unsupported trace archive: {path}")
+    return leakware_id, count
+
+
+def slice_records(records, offset, length):
+    window = records[offset:offset + length]
+    return window["t"], window["value"]
+
+
+class TraceArchiveWriter:
+    def __init__(self, leakware_id, directory=TRACE_ARCHIVE_DIR, grow_records=DEFAULT_GROW_RECORDS):
+        """
+        Open the trace archive of a session, or create it if it does not exist yet.
+
+        :param leakware_id: Id of the leak test session
+        :param directory: Directory of the archive files
+        :param grow_records: Number of records the file is extended by when it is full
+        """
+        self.leakware_id = leakware_id
+        self.path = archive_path(leakware_id, directory)
+        self.grow_records = int(grow_records)
+        self.origin = 0.0
+
+        if os.path.exists(self.path):
+            _, self._count = read_header(self.path)
+            capacity = max((os.path.getsize(self.path) - HEADER_SIZE) // RECORD.itemsize, self._count)
+        else:
+            os.makedirs(directory, exist_ok=True)
+            with open(self.path, "wb") as file:
+                file.write(HEADER.pack(MAGIC, VERSION, RECORD.itemsize, leakware_id, 0).ljust(HEADER_SIZE, b"\0"))
+            self._count = 0
+            capacity = self.grow_records
+        self._map(capacity)
+
+    def _map(self, capacity):
+        # numpy extends the file when the requested map is larger; earlier views stay valid
+        self._raw = np.memmap(self.path, dtype=np.uint8, mode="r+", shape=(HEADER_SIZE + capacity * RECORD.itemsize,))
+        self._header_count = self._raw[COUNT_OFFSET:COUNT_OFFSET + 8].view("<u8")
+        self._records = self._raw[HEADER_SIZE:].view(RECORD)
+        self.capacity = capacity
+
+    def start_segment(self, origin):
+        """
+        Set the time origin of the following samples, e.g. the start time of a measurement.
+
+        :param origin: Monotonic timestamp that becomes t = 0
+        """
+        self.origin = origin
+
+    @property
+    def count(self):
+        return self._count
+
+    def append(self, timestamp, value):
+        """
+        Append a sample. Must only be called from the single writer thread.
+
+        :param timestamp: Monotonic timestamp of the sample (time.monotonic())
+        :param value: Leak rate in mbar*l/s
+        """
+        if self._count == self.capacity:
+            self._raw.flush()
+            self._map(self.capacity + self.grow_records)
+        self._records[self._count] = (timestamp - self.origin, value)
+        self._count += 1
+        self._header_count[0] = self._count  # Publish the record only after it is written
+
+    def trace(self, offset, length):
+        """
+        Return records [offset, offset + length) as (t, value) arrays without copying.
+
+        :param offset: Index of the first record
+        :param length: Number of records
+        """
+        return slice_records(self._records[:self._count], offset, length)
+
+    def flush(self):
+        """Write the mapped pages to disk, e.g. before a specimen referencing them is committed."""
+        self._raw.flush()
+
+
+class TraceArchiveReader:
+    def __init__(self, path):
+        """
+        Map the records of an archive that were valid when it was opened, read-only.
+
+        :param path: Path of the archive file
+        """
+        self.path = path
+        self.leakware_id, self.count = read_header(path)
+        if self.count:
+            self._records = np.memmap(path, dtype=RECORD, mode="r", offset=HEADER_SIZE, shape=(self.count,))
+        else:
+            self._records = np.empty(0, dtype=RECORD)
+
+    def trace(self, offset, length):
+        """
+        Return records [offset, offset + length) as (t, value) arrays without copying.
+
+        :param offset: Index of the first record
+        :param length: Number of records
+        """
+        return slice_records(self._records, offset, length)
+
+
+def read_trace(leakware_id, offset, length, directory=TRACE_ARCHIVE_DIR):
+    """
+    Read one trace of a session archive.
+
+    :return: Tuple of numpy arrays (t, value), views of the mapped file
+    """
+    return TraceArchiveReader(archive_path(leakware_id, directory)).trace(offset, length)
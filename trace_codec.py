@@ -0,0 +1,136 @@
+"""
+trace_codec.py
+
+This module encodes specimen traces (the x/y values of a measurement) as compact binary BLOBs
+instead of JSON text. A trace is stored as a little-endian float32 or float64 array behind a
+small header, optionally delta-encoded and compressed, and decoded with `numpy.frombuffer`.
+
+Delta encoding works on the integer bit patterns of the floats, so it is lossless (including
+NaN for missing samples). It pays off for the time axis, whose consecutive values are close.
+
+Blob layout (little-endian):
+- 4 bytes  magic b"LWTR"
+- 1 byte   format version
+- 1 byte   dtype code (4 = float32, 8 = float64)
+- 1 byte   flags (FLAG_DELTA, FLAG_ZLIB, FLAG_LZ4)
+- 1 byte   reserved
+- 4 bytes  number of values (uint32)
+- payload  the (optionally delta-encoded and compressed) array
+
+Key Functions:
+- encode_trace(values, dtype, delta, compression): Encodes a trace as a binary blob.
+- decode_trace(stored): Decodes a blob, or a legacy JSON value, into a numpy array.
+- is_encoded(stored): Returns True if `stored` is a blob written by `encode_trace`.
+
+Dependencies:
+- json
+- struct
+- zlib
+- numpy
+- lz4 (optional, zlib is used when it is not installed)
+
+Usage:
+New traces are written to the trace archive of the session (see trace_archive); blobs are the
+legacy format of rows written before that. `Repository.get_specimen_traces` and
+`data_export.export_traces` read them with `decode_trace`, which also reads rows written in the
+old JSON format; `get_specimen_traces` rewrites those JSON rows as blobs with `encode_trace`.
+"""
+import json
+import struct
+import zlib
+
+import numpy as np
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+MAGIC = b"LWTR"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBBI")
+
+FLAG_DELTA = 0x01
+FLAG_ZLIB = 0x02
+FLAG_LZ4 = 0x04
+
+FLOAT_TYPES = {4: ("<f4", "<i4"), 8: ("<f8", "<i8")}
+ZLIB_LEVEL = 6
+
+
+def encode_trace(values, dtype="float64", delta=False, compression="zlib"):
+    """
+    Encode a trace as a binary blob.
+
+    :param values: Sequence or numpy array of floats
+    :param dtype: "float32" or "float64"
+    :param delta: Store differences between consecutive values (lossless)
+    :param compression: "zlib", "lz4" (falls back to zlib if lz4 is not installed) or None
+    :return: Encoded blob (bytes)
+    """
+    item_size = np.dtype(dtype).itemsize
+    if item_size not in FLOAT_TYPES:
+        raise ValueError(f"Unsupported trace dtype: {dtype}")
+    float_type, int_type = FLOAT_TYPES[item_size]
+    array = np.ascontiguousarray(values, dtype=float_type)
+
+    flags = 0
+    if delta and array.size > 1:
+        bits = array.view(int_type)
+        array = np.concatenate((bits[:1], np.diff(bits)))  # Integer differences wrap, so this is exact
+        flags |= FLAG_DELTA
+    payload = array.tobytes()
+
+    if compression == "lz4" and lz4_frame is not None:
+        payload = lz4_frame.compress(payload)
+        flags |= FLAG_LZ4
+    elif compression in ("zlib", "lz4"):
+        payload = zlib.compress(payload, ZLIB_LEVEL)
+        flags |= FLAG_ZLIB
+
+    return HEADER.pack(MAGIC, VERSION, item_size, flags, 0, array.size) + payload
+
+
+def is_encoded(stored):
+    """Return True if `stored` is a blob written by `encode_trace`."""
+    return isinstance(stored, (bytes, bytearray, memoryview)) and bytes(stored[:4]) == MAGIC
+
+
+def decode_trace(stored):
+    """
+    Decode a stored trace into a float64 numpy array.
+
+    Accepts blobs written by `encode_trace` as well as the legacy JSON representation
+    (a JSON string or an already parsed list), so old rows keep working.
+
+    :param stored: Blob, JSON string, list or None
+    :return: numpy array (empty if nothing is stored)
+    """
+    if stored is None:
+        return np.empty(0, dtype=np.float64)
+    if not is_encoded(stored):
+        if isinstance(stored, (bytes, bytearray, memoryview)):
+            stored = bytes(stored).decode()
+        if isinstance(stored, str):
+            stored = json.loads(stored)
+        return np.asarray(stored, dtype=np.float64)
+
+    _, version, item_size, flags, _, count = HEADER.unpack_from(stored)  # is_encoded checked the magic
+    if version != VERSION or item_size not in FLOAT_TYPES:
+        raise ValueError(f"Unsupported trace blob (version {version}, item size {item_size})")
+    float_type, int_type = FLOAT_TYPES[item_size]
+
+    payload = memoryview(stored)[HEADER.size:]
+    if flags & FLAG_LZ4:
+        if lz4_frame is None:
+            raise ValueError("Trace is lz4-compressed but the lz4 package is not installed")
+        payload = lz4_frame.decompress(payload)
+    elif flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+
+    if flags & FLAG_DELTA:
+        bits = np.cumsum(np.frombuffer(payload, dtype=int_type, count=count), dtype=int_type)
+        array = bits.view(float_type)
+    else:
+        array = np.frombuffer(payload, dtype=float_type, count=count)
+    return array.astype(np.float64)